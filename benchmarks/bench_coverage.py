@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks of pass prediction and area coverage, using the bundled TLEs and area definitions.
+
+The polygon based coverage is slow, a merge of two pass polygons taking a
+minute or more, so the coverage is benchmarked once, on two overlapping
+partial passes merged and intersected with two areas.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+from pyresample import load_area
+
+from dr_schedule_and_coverage.pmw_data_coverage import get_sats_within_horizon
+from dr_schedule_and_coverage.pmw_data_coverage import create_passes_inside_time_window
+from dr_schedule_and_coverage.pmw_data_coverage import derive_combined_coverage
+from dr_schedule_and_coverage.pmw_data_coverage import INSTRUMENTS
+
+SATS = ['NOAA-19', 'Metop-B', 'Metop-C', 'Suomi-NPP', 'NOAA-20']
+START_TIME = datetime(2020, 1, 10, 6, 0)
+END_TIME = datetime(2020, 1, 10, 9, 0)
+
+# The end of a Metop-C pass and the start of a Metop-B pass:
+COVERAGE_SATS = ['Metop-B', 'Metop-C']
+COVERAGE_START_TIME = datetime(2020, 1, 10, 8, 24)
+COVERAGE_END_TIME = datetime(2020, 1, 10, 8, 35)
+
+
+@pytest.fixture(scope='module')
+def nextpasses(tle_file):
+    """Passes over Norrkoping during three hours."""
+    return get_sats_within_horizon(SATS, START_TIME, forward=3, tle_filename=tle_file)
+
+
+def test_get_sats_within_horizon_one_day(benchmark, tle_file):
+    """Benchmark the pass prediction for one day."""
+    passes = benchmark.pedantic(get_sats_within_horizon, args=(SATS, START_TIME),
+                                kwargs={'forward': 24, 'tle_filename': tle_file}, rounds=3)
+    assert all(passes[satname] for satname in SATS)
+
+
+def test_create_passes_inside_time_window(benchmark, nextpasses, tle_file):
+    """Benchmark the creation of the passes clipped to the time window."""
+    passes = benchmark.pedantic(create_passes_inside_time_window,
+                                args=(nextpasses, INSTRUMENTS, START_TIME, END_TIME, tle_file), rounds=3)
+    assert len(passes) > 0
+
+
+def test_derive_combined_coverage_two_passes(benchmark, nextpasses, tle_file, area_def_file):
+    """Benchmark the coverage of two passes, merging their polygons once for two areas."""
+    areadefs = [load_area(area_def_file, areaid) for areaid in ['se_north', 'euron1']]
+    passes = create_passes_inside_time_window({satname: nextpasses[satname] for satname in COVERAGE_SATS},
+                                              INSTRUMENTS, COVERAGE_START_TIME, COVERAGE_END_TIME, tle_file)
+    assert len(passes) == 2
+
+    coverages = benchmark.pedantic(derive_combined_coverage, args=(passes, areadefs), rounds=1)
+    assert np.all((coverages >= 0) & (coverages <= 1))
+    assert coverages[1] > 0
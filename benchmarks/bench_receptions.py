@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks of the reception schedule conflict resolution and pass list utilities.
+"""
+
+from datetime import datetime
+
+from dr_schedule_and_coverage.sat_receptions import ReceptionsConflictResolution
+from dr_schedule_and_coverage.sat_receptions import CreateReceptionList
+from dr_schedule_and_coverage.sat_receptions import merge_passes_one_satellite
+from dr_schedule_and_coverage.sat_receptions import calculate_total_minutes_received
+from dr_schedule_and_coverage.sat_receptions import merge_intervals, get_total_minutes
+from dr_schedule_and_coverage.stations import NRK
+
+
+def test_check_for_conflicts(benchmark, sorted_passlist):
+    """Benchmark the conflict detection."""
+    def setup():
+        return (ReceptionsConflictResolution(sorted_passlist), ), {}
+
+    benchmark.pedantic(ReceptionsConflictResolution.check_for_conflicts, setup=setup, rounds=3)
+
+
+def test_resolve_conflicts(benchmark, sorted_passlist):
+    """Benchmark the conflict resolution."""
+    schedule_resolver = ReceptionsConflictResolution(sorted_passlist)
+    schedule_resolver.check_for_conflicts()
+
+    def setup():
+        schedule_resolver.receptions = []
+        schedule_resolver.rejections = []
+        return (schedule_resolver, ), {}
+
+    benchmark.pedantic(ReceptionsConflictResolution.resolve_conflicts, setup=setup, rounds=3)
+    assert len(schedule_resolver.receptions) + len(schedule_resolver.rejections) == len(sorted_passlist)
+
+
+def test_merge_passes_one_satellite(benchmark, one_satellite_passlist):
+    """Benchmark merging overlapping passes of one satellite."""
+    merged = benchmark.pedantic(merge_passes_one_satellite, args=(one_satellite_passlist, ), rounds=3)
+    assert len(merged) < len(one_satellite_passlist)
+
+
+def test_calculate_total_minutes_received(benchmark, one_satellite_passlist):
+    """Benchmark the total minutes received of one satellite."""
+    total_minutes = benchmark.pedantic(calculate_total_minutes_received,
+                                       args=(one_satellite_passlist, ), rounds=3)
+    assert total_minutes > 0
+
+
+def test_merge_intervals(benchmark, one_satellite_times):
+    """Benchmark merging overlapping passes of one satellite in epoch microseconds."""
+    starts, ends = benchmark(merge_intervals, *one_satellite_times)
+    assert len(starts) < len(one_satellite_times[0])
+
+
+def test_get_total_minutes(benchmark, one_satellite_times):
+    """Benchmark the total minutes of one satellite in epoch microseconds."""
+    assert benchmark(get_total_minutes, *one_satellite_times) > 0
+
+
+def test_generate_csv_file(benchmark, sorted_passlist, tmp_path):
+    """Benchmark writing the candidate pass list to csv."""
+    candidate_schedule = CreateReceptionList(['Metop-B'], (datetime(2022, 3, 21), datetime(2022, 3, 22)), NRK)
+    candidate_schedule.sorted_passlist = sorted_passlist
+    output_filename = str(tmp_path / 'candidate_pass_list.csv')
+
+    benchmark.pedantic(candidate_schedule.generate_csv_file, args=(output_filename, ), rounds=3)
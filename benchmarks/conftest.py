@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Synthetic pass lists and offline data for the benchmarks.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import dr_schedule_and_coverage  # noqa: E402
+from dr_schedule_and_coverage.sat_receptions import get_pass_times  # noqa: E402
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(dr_schedule_and_coverage.__file__), 'tests', 'data')
+TLE_FILE = os.path.join(TEST_DATA_DIR, 'tle-202001100000.txt')
+AREA_DEF_FILE = os.path.join(TEST_DATA_DIR, 'areas.yaml')
+
+PLATFORMS = ['NOAA-19', 'NOAA-20', 'Suomi-NPP', 'Metop-B', 'Metop-C', 'FY-3D', 'AWS-4']
+PASS_SIZES = [1000, 10000, 100000]
+
+
+def make_sorted_passlist(npasses, platforms=PLATFORMS, mean_gap_minutes=6., seed=1):
+    """Make a time sorted list of [start, end, platform name] passes.
+
+    Passes last 5 to 15 minutes and start on average *mean_gap_minutes* apart,
+    giving a conflict density similar to a high latitude station.
+    """
+    rng = np.random.default_rng(seed)
+    start = datetime(2022, 3, 21)
+    offsets = np.cumsum(rng.exponential(mean_gap_minutes * 60, npasses))
+    durations = rng.uniform(5 * 60, 15 * 60, npasses)
+    names = rng.choice(platforms, npasses)
+
+    return [[start + timedelta(seconds=offset), start + timedelta(seconds=offset + duration), str(name)]
+            for offset, duration, name in zip(offsets, durations, names)]
+
+
+def make_one_satellite_passlist(npasses, platform='AWS-4', seed=2):
+    """Make a time sorted list of passes of one satellite seen from several stations.
+
+    Consecutive passes overlap about half of the time, as when the passes
+    from several stations are combined.
+    """
+    rng = np.random.default_rng(seed)
+    start = datetime(2022, 3, 21)
+    offsets = np.cumsum(rng.uniform(2 * 60, 20 * 60, npasses))
+    durations = rng.uniform(8 * 60, 12 * 60, npasses)
+
+    return [[start + timedelta(seconds=offset), start + timedelta(seconds=offset + duration), platform]
+            for offset, duration in zip(offsets, durations)]
+
+
+@pytest.fixture(scope='session')
+def tle_file():
+    """The bundled offline TLE file."""
+    return TLE_FILE
+
+
+@pytest.fixture(scope='session')
+def area_def_file():
+    """The bundled area definitions."""
+    return AREA_DEF_FILE
+
+
+@pytest.fixture(scope='session', params=PASS_SIZES, ids=['1k', '10k', '100k'])
+def sorted_passlist(request):
+    """A synthetic time sorted multi-satellite pass list."""
+    return make_sorted_passlist(request.param)
+
+
+@pytest.fixture(scope='session', params=PASS_SIZES, ids=['1k', '10k', '100k'])
+def one_satellite_passlist(request):
+    """A synthetic time sorted pass list of one satellite."""
+    return make_one_satellite_passlist(request.param)
+
+
+@pytest.fixture(scope='session', params=[100000, 1000000], ids=['100k', '1M'])
+def one_satellite_times(request):
+    """Start and end times of a synthetic pass list of one satellite, in microseconds since 1970."""
+    return get_pass_times(make_one_satellite_passlist(request.param))
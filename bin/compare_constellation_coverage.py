@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compare the PMW data coverage of several satellite constellations over a period.
+
+Example, comparing two constellations at every hour in January 2020::
+
+    compare_constellation_coverage.py -s NOAA-19 Metop-B Metop-C Suomi-NPP NOAA-20 \\
+                                      -s Metop-B Metop-C Suomi-NPP NOAA-20 \\
+                                      --start-date 2020-01-01 --end-date 2020-01-31 \\
+                                      -o areacoverage_jan20.npz
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from dr_schedule_and_coverage.config import read_config
+from dr_schedule_and_coverage.progress import SweepProgress
+from dr_schedule_and_coverage.sweeps import derive_constellation_subset_coverage, save_subset_coverage
+from dr_schedule_and_coverage.sweeps import CycleSetting
+from dr_schedule_and_coverage.labels import get_satellite_set_label
+from dr_schedule_and_coverage.result_store import CoverageStore
+from dr_schedule_and_coverage.pmw_data_coverage import AREAID
+
+
+def get_arguments():
+    """Get the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--satellites', nargs='+', action='append', required=True,
+                        help='Satellites of one constellation, repeat for each constellation')
+    parser.add_argument('--start-date', required=True, help='First date, YYYY-MM-DD')
+    parser.add_argument('--end-date', required=True, help='Last date, YYYY-MM-DD')
+    parser.add_argument('-c', '--config', help='Scenario yaml file')
+    parser.add_argument('--scenario', help='Scenario name, if the file holds several')
+    parser.add_argument('--cycle-distance', type=float, default=1.0, help='Hours between cycles')
+    parser.add_argument('--time-window', type=int, default=60, help='Time window size in minutes')
+    parser.add_argument('--cutoff', type=int, default=0, help='Cut-off in minutes')
+    parser.add_argument('--latency', type=int, default=0, help='Latency in minutes')
+    parser.add_argument('-j', '--nprocs', type=int, default=1, help='Number of processes')
+    parser.add_argument('-o', '--output', required=True, help='Output npz file')
+    parser.add_argument('--store', help='Zarr result store, written date by date and resumed if it exists')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+
+    args = get_arguments()
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s: %(asctime)s : %(name)s] %(message)s')
+
+    config = read_config(args.config, args.scenario) if args.config else None
+    start_date = datetime.strptime(args.start_date, '%Y-%m-%d').date()
+    end_date = datetime.strptime(args.end_date, '%Y-%m-%d').date()
+    dates = [start_date + timedelta(days=idx) for idx in range((end_date - start_date).days + 1)]
+
+    setting = CycleSetting(args.cycle_distance, args.time_window, args.cutoff, args.latency)
+    starthours = setting.starthours
+
+    store = None
+    ndone = 0
+    if args.store:
+        satellite_sets = [get_satellite_set_label(subset) for subset in args.satellites]
+        areas = [config.area_id if config else AREAID]
+        store = CoverageStore.open_or_create(args.store, satellite_sets, areas, dates, starthours)
+        # Only the dates not in the store are computed, and counted by the progress:
+        ndone = store.count_done(dates, satellite_sets, areas)
+
+    coverages = derive_constellation_subset_coverage(args.satellites, dates, starthours, setting.length_minutes,
+                                                     config=config, nprocs=args.nprocs,
+                                                     progress=SweepProgress(len(dates) - ndone), store=store)
+    save_subset_coverage(args.output, coverages, args.satellites, dates, starthours)
+
+    for subset, subset_coverages in zip(args.satellites, coverages):
+        print("%s: mean coverage %5.3f" % (' '.join(subset), subset_coverages.mean()))
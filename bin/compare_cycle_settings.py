@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compare the PMW data coverage over a period for several assimilation cycle settings.
+
+Each setting is given as CYCLE_DISTANCE,TIME_WINDOW,CUTOFF,LATENCY (hours
+between cycles, and time window size, cut-off and latency in minutes). The
+passes are predicted once per date for all settings, and the coverage of
+every cycle is written as one row of a csv table. With --store-dir the
+coverages of each setting are also written, date by date, to a Zarr result
+store in that directory, and a rerun only computes the dates missing.
+
+Example, comparing a +-90 min window with 15 min cut-off to a +-30 min window::
+
+    compare_cycle_settings.py -s NOAA-19 Metop-B Metop-C Suomi-NPP NOAA-20 \\
+                              --setting 3,180,15,20 --setting 1,60,0,0 \\
+                              --start-date 2020-01-01 --end-date 2020-01-31 \\
+                              -o cycle_settings_jan20.csv
+"""
+
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+
+from dr_schedule_and_coverage.config import read_config
+from dr_schedule_and_coverage.pmw_data_coverage import AREAID
+from dr_schedule_and_coverage.progress import SweepProgress
+from dr_schedule_and_coverage.sweeps import CycleSetting, derive_cycle_setting_coverage, save_table
+from dr_schedule_and_coverage.sweeps import is_setting_row
+from dr_schedule_and_coverage.labels import get_satellite_set_label
+from dr_schedule_and_coverage.result_store import CoverageStore
+
+
+def get_cycle_setting(text):
+    """Get a cycle setting from a CYCLE_DISTANCE,TIME_WINDOW,CUTOFF,LATENCY string."""
+    cycle_distance, time_window, cutoff, latency = text.split(',')
+    return CycleSetting(float(cycle_distance), int(time_window), int(cutoff), int(latency))
+
+
+def get_arguments():
+    """Get the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--satellites', nargs='+', required=True, help='Satellites of the constellation')
+    parser.add_argument('--setting', type=get_cycle_setting, action='append', required=True,
+                        help='Cycle setting CYCLE_DISTANCE,TIME_WINDOW,CUTOFF,LATENCY, repeat for each setting')
+    parser.add_argument('--start-date', required=True, help='First date, YYYY-MM-DD')
+    parser.add_argument('--end-date', required=True, help='Last date, YYYY-MM-DD')
+    parser.add_argument('-c', '--config', help='Scenario yaml file')
+    parser.add_argument('--scenario', help='Scenario name, if the file holds several')
+    parser.add_argument('-j', '--nprocs', type=int, default=1, help='Number of processes')
+    parser.add_argument('-o', '--output', required=True, help='Output csv file')
+    parser.add_argument('--store-dir', help='Directory of Zarr result stores, one per setting, '
+                        'written date by date and resumed if they exist')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+
+    args = get_arguments()
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s: %(asctime)s : %(name)s] %(message)s')
+
+    config = read_config(args.config, args.scenario) if args.config else None
+    start_date = datetime.strptime(args.start_date, '%Y-%m-%d').date()
+    end_date = datetime.strptime(args.end_date, '%Y-%m-%d').date()
+    dates = [start_date + timedelta(days=idx) for idx in range((end_date - start_date).days + 1)]
+
+    stores = None
+    ndone = 0
+    if args.store_dir:
+        satellite_sets = [get_satellite_set_label(args.satellites)]
+        areas = [config.area_id if config else AREAID]
+        stores = [CoverageStore.open_or_create(os.path.join(args.store_dir, 'coverage_%s_%gh.zarr' %
+                                                            (setting.description, setting.cycle_distance)),
+                                               satellite_sets, areas, dates, setting.starthours)
+                  for setting in args.setting]
+        # Only the dates not in all the stores are computed, and counted by the progress:
+        ndone = sum(all(store.is_done(mydate, satellite_sets, areas) for store in stores) for mydate in dates)
+
+    rows = derive_cycle_setting_coverage(args.satellites, args.setting, dates, config=config,
+                                         nprocs=args.nprocs, progress=SweepProgress(len(dates) - ndone),
+                                         stores=stores)
+    save_table(args.output, rows)
+
+    for setting in args.setting:
+        coverages = [row['coverage'] for row in rows if is_setting_row(row, setting)]
+        print("%s every %3.1f h: mean coverage %5.3f" % (setting.description, setting.cycle_distance,
+                                                         sum(coverages) / len(coverages)))
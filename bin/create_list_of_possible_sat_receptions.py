@@ -23,59 +23,57 @@
 """Tools to generate lists of possible satellite receptions for a given station and time period.
 """
 
-import sys
+import os
 from datetime import datetime, timedelta
 from dr_schedule_and_coverage.sat_receptions import CreateReceptionList
-from dr_schedule_and_coverage.sat_receptions import ReceptionsConflictResolution
+from dr_schedule_and_coverage.sat_receptions import resolve_station_receptions
+from dr_schedule_and_coverage.sat_receptions import get_reception_statistics
 from dr_schedule_and_coverage.stations import NRK, SDK, BLACK_RIDGE
 from dr_schedule_and_coverage.sat_receptions import calculate_total_minutes_received
 from dr_schedule_and_coverage.sat_receptions import merge_passes_one_satellite
+from dr_schedule_and_coverage import instrumentation
 
 
-def get_aws_passes_at_station(platform_list, time_window, station_coord, antennas=1):
-    """Get list of received passes at a given station assuming *antennas* antennas."""
-    if antennas not in [1, 2]:
-        print("Only supports 1 or 2 antennas! %d antennas given." % antennas)
-        sys.exis(-9)
+def get_station_schedule(platform_list, time_window, station_coord, antennas=1, tle_file=None, config=None):
+    """Get the possible and the received passes at a given station assuming *antennas* antennas.
 
+    The station can be given as coordinates or by name if a scenario *config* is given.
+    """
     # Create a list of passes possible to receive
-    candidate_schedule = CreateReceptionList(platform_list, time_window, station_coord)
+    candidate_schedule = CreateReceptionList(platform_list, time_window, station_coord, config=config)
     candidate_schedule.get_passes(tle_file)
     # candidate_schedule.generate_csv_file('./candidate_pass_list.csv')
 
     mypasslist = candidate_schedule.sorted_passlist
-    awses_total = [apass for apass in mypasslist if apass[2] == 'AWS-4']
-
-    schedule_resolver = ReceptionsConflictResolution(mypasslist)
-    schedule_resolver.check_for_conflicts()
-    schedule_resolver.resolve_conflicts()
+    reception_passlist, _ = resolve_station_receptions(mypasslist, antennas=antennas, config=config)
+    return mypasslist, reception_passlist
 
-    reception_passlist = []
-    for pass_id in schedule_resolver.receptions:
-        apass = schedule_resolver.passlist[pass_id]
-        reception_passlist.append([apass['start'], apass['end'], apass['platform_name']])
 
-    if antennas == 1:
-        awses_received = [apass for apass in reception_passlist if apass[2] == 'AWS-4']
-        return awses_received, awses_total
+def get_aws_passes_at_station(platform_list, time_window, station_coord, antennas=1, tle_file=None, config=None):
+    """Get list of received passes at a given station assuming *antennas* antennas.
 
-    rejection_passlist = []
-    for pass_id in schedule_resolver.rejections:
-        apass = schedule_resolver.passlist[pass_id]
-        rejection_passlist.append([apass['start'], apass['end'], apass['platform_name']])
-
-    # Run again, assuming another antenna taking care of the passes not received by the first:
-    schedule_resolver = ReceptionsConflictResolution(rejection_passlist)
-    schedule_resolver.check_for_conflicts()
-    schedule_resolver.resolve_conflicts()
-    for pass_id in schedule_resolver.receptions:
-        apass = schedule_resolver.passlist[pass_id]
-        reception_passlist.append([apass['start'], apass['end'], apass['platform_name']])
+    The station can be given as coordinates or by name if a scenario *config* is given.
+    """
+    mypasslist, reception_passlist = get_station_schedule(platform_list, time_window, station_coord,
+                                                          antennas=antennas, tle_file=tle_file, config=config)
+    awses_total = [apass for apass in mypasslist if apass[2] == 'AWS-4']
+    awses_received = [apass[:3] for apass in reception_passlist if apass[2] == 'AWS-4']
+    return awses_received, awses_total
 
-    reception_passlist.sort()
 
-    awses_received_2antennas = [apass for apass in reception_passlist if apass[2] == 'AWS-4']
-    return awses_received_2antennas, awses_total
+def print_reception_statistics(station_name, stats):
+    """Print the reception statistics of a station, one line per platform and antenna."""
+    print("%s:" % station_name)
+    print("%-10s %8s %8s %10s %10s %11s" % ('Platform', 'Antenna', 'Passes', 'Received', 'Minutes', 'Efficiency'))
+    for idx, platform_name in enumerate(stats['platform_names']):
+        for antenna, received in enumerate(stats['received_passes'][idx]):
+            print("%-10s %8d %8d %10d %10.1f %10.1f%%" % (platform_name, antenna, stats['potential_passes'][idx],
+                                                          received, stats['received_minutes'][idx, antenna],
+                                                          100*stats['antenna_pass_efficiency'][idx, antenna]))
+        print("%-10s %8s %8d %10d %10.1f %10.1f%%" % (platform_name, 'all', stats['potential_passes'][idx],
+                                                      stats['received_passes'][idx].sum(),
+                                                      stats['received_minutes'][idx].sum(),
+                                                      100*stats['pass_efficiency'][idx]))
 
 
 if __name__ == "__main__":
@@ -90,32 +88,27 @@ if __name__ == "__main__":
 
     platform_name_list = ['NOAA-19', 'NOAA-20', 'Suomi-NPP', 'Metop-B', 'Metop-C', 'FY-3D', 'AWS-4']
 
-    aws_passes_kan, aws_total_kan = get_aws_passes_at_station(platform_name_list,
-                                                              (starttime, endtime), BLACK_RIDGE, antennas=2)
+    # Set DR_SCHEDULE_TIMING_REPORT to a json filename to get a timing report of the run:
+    timing_report = os.environ.get('DR_SCHEDULE_TIMING_REPORT')
+    if timing_report:
+        instrumentation.enable()
 
-    print("Kangerlussuaq:")
-    print("Total AWS passes: %d, received: %d" % (len(aws_total_kan), len(aws_passes_kan)))
-    print("Relative reception efficiency: %5.1f %%" % (100*len(aws_passes_kan)/len(aws_total_kan)))
+    aws_passes = {}
+    aws_total = {}
+    for station_name, station_coord in [('Kangerlussuaq', BLACK_RIDGE), ('Norrkoping', NRK), ('Sodankyla', SDK)]:
+        candidates, receptions = get_station_schedule(platform_name_list, (starttime, endtime), station_coord,
+                                                      antennas=2, tle_file=tle_file)
+        print_reception_statistics(station_name, get_reception_statistics(candidates, receptions,
+                                                                          platform_name_list, antennas=2))
 
-    aws_passes_nrk, aws_total_nrk = get_aws_passes_at_station(platform_name_list,
-                                                              (starttime, endtime), NRK, antennas=2)
+        aws_total[station_name] = [apass for apass in candidates if apass[2] == 'AWS-4']
+        aws_passes[station_name] = [apass[:3] for apass in receptions if apass[2] == 'AWS-4']
 
-    print("Norrkoping:")
-    print("Total AWS passes: %d, received: %d" % (len(aws_total_nrk), len(aws_passes_nrk)))
-    print("Relative reception efficiency: %5.1f %%" % (100*len(aws_passes_nrk)/len(aws_total_nrk)))
-
-    aws_passes_sdk, aws_total_sdk = get_aws_passes_at_station(platform_name_list,
-                                                              (starttime, endtime), SDK, antennas=2)
-
-    print("Sodankyla:")
-    print("Total AWS passes: %d, received: %d" % (len(aws_total_sdk), len(aws_passes_sdk)))
-    print("Relative reception efficiency: %5.1f %%" % (100*len(aws_passes_sdk)/len(aws_total_sdk)))
-
-    aws_passes_nrk_kan_sdk = aws_passes_kan + aws_passes_sdk + aws_passes_nrk
+    aws_passes_nrk_kan_sdk = aws_passes['Kangerlussuaq'] + aws_passes['Sodankyla'] + aws_passes['Norrkoping']
     aws_passes_nrk_kan_sdk.sort()
     total_min_actual = calculate_total_minutes_received(aws_passes_nrk_kan_sdk)
 
-    aws_passes_nrk_kan_sdk_total = aws_total_kan + aws_total_sdk + aws_total_nrk
+    aws_passes_nrk_kan_sdk_total = aws_total['Kangerlussuaq'] + aws_total['Sodankyla'] + aws_total['Norrkoping']
     aws_passes_nrk_kan_sdk_total.sort()
     total_min_potential = calculate_total_minutes_received(aws_passes_nrk_kan_sdk_total)
     print(total_min_potential, total_min_actual)
@@ -125,3 +118,6 @@ if __name__ == "__main__":
 
     print("Total number of possible AWS passes from all stations: %d" % len(total_merged))
     print("Number of scheduled AWS passes from all stations: %d" % len(merged))
+
+    if timing_report:
+        instrumentation.disable().write(timing_report)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Serve reception schedule and coverage queries from warm caches over a local socket.
+
+Example, serving a scenario on a Unix socket with four worker processes::
+
+    schedule_service.py -c scenario.yaml --scenario eumetsat --socket /tmp/schedules.sock -j 4
+
+and querying it::
+
+    curl --unix-socket /tmp/schedules.sock \\
+        'http://localhost/coverage?satellites=Metop-B,NOAA-19&start=2020-01-10T06:00&end=2020-01-10T07:00'
+"""
+
+import argparse
+import logging
+
+from dr_schedule_and_coverage.config import read_config
+from dr_schedule_and_coverage.service import serve
+
+
+def get_arguments():
+    """Get the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-c', '--config', help='Scenario yaml file')
+    parser.add_argument('--scenario', help='Scenario name, if the file holds several')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to listen on')
+    parser.add_argument('-p', '--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--socket', help='Unix socket to listen on, instead of the host and port')
+    parser.add_argument('-j', '--nprocs', type=int, default=1, help='Number of worker processes')
+    parser.add_argument('--cache-size', type=int, default=128, help='Number of entries in each cache')
+    parser.add_argument('--no-watch', action='store_true',
+                        help='Do not watch the realtime TLE archive for new files')
+    parser.add_argument('--poll-interval', type=float, default=60.,
+                        help='Seconds between listings of the TLE archive, if inotify is not available')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+
+    args = get_arguments()
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s: %(asctime)s : %(name)s] %(message)s')
+
+    config = read_config(args.config, args.scenario) if args.config else None
+    serve(config, host=args.host, port=args.port, socket_path=args.socket, nprocs=args.nprocs,
+          cache_size=args.cache_size, watch_tle=not args.no_watch, poll_interval=args.poll_interval)
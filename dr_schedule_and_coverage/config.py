@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Scenario configuration: stations, reception priorities, instruments and archive paths.
+
+A scenario file is parsed once into immutable :class:`ScenarioConfig` objects,
+which are then handed to the reception and coverage tools. A file may hold
+several scenarios sharing common settings::
+
+    area_def_file: /path/to/areas.yaml
+    area_id: se_north
+    stations:
+      nrk: [16.148649, 58.581844, 0.052765]
+    reception_priorities:
+      Metop-C: 1
+      Metop-B: 4
+    station_visibility:
+      nrk: {min_elevation: 5, min_duration: 3}
+    scenarios:
+      metop_first: {}
+      npp_first:
+        reception_priorities:
+          Suomi-NPP: 1
+          Metop-C: 2
+          Metop-B: 4
+
+Settings not given in the file are taken from :data:`DEFAULT_CONFIG`. The
+stations, instruments and station visibility of a scenario are added to
+the common ones, while its reception priorities replace them as a whole, as
+a ranking only makes sense complete. Tied priorities are refused, as the
+conflict resolution would keep both of two conflicting passes.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, fields, replace
+
+import yaml
+
+from .stations import STATIONS, StationVisibility, NO_LIMITS
+
+
+class FrozenMapping(Mapping):
+    """A read-only, hashable and picklable mapping."""
+
+    def __init__(self, *args, **kwargs):
+        self._data = dict(*args, **kwargs)
+        self._hash = None
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def __reduce__(self):
+        # The cached hash depends on the hash seed of the process, so it is not pickled:
+        return (FrozenMapping, (self._data, ))
+
+    def __repr__(self):
+        return 'FrozenMapping(%r)' % self._data
+
+
+@dataclass(frozen=True)
+class ScenarioConfig:
+    """Settings for one reception/coverage scenario."""
+
+    name: str
+    stations: Mapping
+    reception_priorities: Mapping
+    instruments: Mapping
+    tle_realtime_archive: str
+    tle_longtime_archive: str
+    area_def_file: str
+    area_id: str
+    station_visibility: Mapping = FrozenMapping()
+
+    def __post_init__(self):
+        stations = FrozenMapping((key, tuple(float(val) for val in coords))
+                                 for key, coords in self.stations.items())
+        object.__setattr__(self, 'stations', stations)
+        object.__setattr__(self, 'reception_priorities', FrozenMapping(self.reception_priorities))
+        ranks = {}
+        for platform_name, priority in self.reception_priorities.items():
+            ranks.setdefault(priority, []).append(platform_name)
+        tied = [' and '.join(platform_names) for platform_names in ranks.values() if len(platform_names) > 1]
+        if tied:
+            raise ValueError("Tied reception priorities in scenario %s: %s" % (self.name, ', '.join(tied)))
+        object.__setattr__(self, 'instruments', FrozenMapping(self.instruments))
+        visibility = FrozenMapping((key, value if isinstance(value, StationVisibility) else
+                                    StationVisibility(**value))
+                                   for key, value in self.station_visibility.items())
+        object.__setattr__(self, 'station_visibility', visibility)
+
+    def get_station(self, station):
+        """Get the station location (lon, lat, alt) from a station name or a location."""
+        if isinstance(station, str):
+            try:
+                return self.stations[station]
+            except KeyError:
+                raise KeyError("Station %s not defined in scenario %s" % (station, self.name))
+        return station
+
+    def get_station_visibility(self, station):
+        """Get the visibility settings of a station name, no limits for unknown stations or locations."""
+        if isinstance(station, str):
+            return self.station_visibility.get(station, NO_LIMITS)
+        return NO_LIMITS
+
+
+# EUMETSAT Reception priorities:
+DEFAULT_RECEPTION_PRIORITIES = {'Metop-C': 1,
+                                'Metop-B': 4,
+                                'NOAA-20': 5,
+                                'Suomi-NPP': 2,
+                                'FY-3D': 7,
+                                'NOAA-18': 3}
+
+DEFAULT_INSTRUMENTS = {'Metop-A': 'mhs',
+                       'Metop-B': 'mhs',
+                       'Metop-C': 'mhs',
+                       'NOAA-18': 'mhs',
+                       'NOAA-19': 'mhs',
+                       'Suomi-NPP': 'atms',
+                       'NOAA-20': 'atms',
+                       'FY-3C': 'mwhs-2',
+                       'FY-3D': 'mwhs-2'}
+
+DEFAULT_CONFIG = ScenarioConfig(name='default',
+                                stations=STATIONS,
+                                reception_priorities=DEFAULT_RECEPTION_PRIORITIES,
+                                instruments=DEFAULT_INSTRUMENTS,
+                                tle_realtime_archive="/data/24/saf/polar_in/tle",
+                                tle_longtime_archive="/data/lang/satellit/polar/orbital_elements/TLE",
+                                area_def_file='/home/a000680/usr/src/pytroll-config/etc/areas.yaml',
+                                area_id='se_north')
+
+# Mappings updated key by key by a scenario, the others are replaced:
+_MAPPING_KEYS = ('stations', 'instruments', 'station_visibility')
+_KNOWN_KEYS = set(field.name for field in fields(ScenarioConfig)) - {'name'}
+
+
+class _UniqueKeyLoader(yaml.SafeLoader):
+    """Yaml loader refusing duplicated mapping keys, which would otherwise silently override."""
+
+    def construct_mapping(self, node, deep=False):
+        keys = set()
+        for key_node, _ in node.value:
+            key = self.construct_object(key_node, deep=deep)
+            if key in keys:
+                raise yaml.constructor.ConstructorError(None, None,
+                                                        "Duplicated key %r" % key,
+                                                        key_node.start_mark)
+            keys.add(key)
+        return super().construct_mapping(node, deep=deep)
+
+
+def _merge_settings(base, settings, name):
+    """Create a new config from *base* updated with the *settings* dict."""
+    unknown = set(settings) - _KNOWN_KEYS
+    if unknown:
+        raise ValueError("Unknown setting(s) in scenario %s: %s" % (name, ', '.join(sorted(unknown))))
+
+    updates = {}
+    for key, value in settings.items():
+        if key in _MAPPING_KEYS:
+            merged = dict(getattr(base, key))
+            merged.update(value or {})
+            updates[key] = merged
+        else:
+            updates[key] = value
+
+    return replace(base, name=name, **updates)
+
+
+def read_scenarios(filename, base=DEFAULT_CONFIG):
+    """Read a scenario yaml file and return a dict of scenario name and :class:`ScenarioConfig`.
+
+    If the file has no *scenarios* section, one scenario named after *base*
+    is returned.
+    """
+    with open(filename, 'r') as fpt:
+        settings = yaml.load(fpt, Loader=_UniqueKeyLoader) or {}
+
+    scenario_settings = settings.pop('scenarios', None)
+    common = _merge_settings(base, settings, base.name)
+    if not scenario_settings:
+        return {common.name: common}
+
+    return {name: _merge_settings(common, overrides or {}, name)
+            for name, overrides in scenario_settings.items()}
+
+
+def read_config(filename, scenario=None, base=DEFAULT_CONFIG):
+    """Read a scenario yaml file and return one :class:`ScenarioConfig`.
+
+    *scenario* is required if the file defines more than one scenario.
+    """
+    scenarios = read_scenarios(filename, base=base)
+    if scenario is None:
+        if len(scenarios) > 1:
+            raise ValueError("Several scenarios in %s, please specify one of: %s" %
+                             (filename, ', '.join(scenarios)))
+        return next(iter(scenarios.values()))
+
+    return scenarios[scenario]
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A persistent cache of the coverage of single cells, keyed by what the coverage depends on.
+
+A cell is the relative coverage of one area by one set of satellites in one
+time window. It is fully determined by the area, the satellites and their
+instruments, the start and end of the window, the orbital elements used and
+the method computing it, so it is cached under exactly these: the area is
+identified by its id and a hash of its definition, and the TLE file by a
+hash of its content, not its name. The cells are kept in
+a sqlite database, and are looked up before predicting any pass, so
+re-plotting a sweep, or extending it with a few dates, only computes the
+cells not done before.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+from dataclasses import astuple, dataclass
+
+from .instrumentation import count
+from .labels import get_satellite_set_label
+
+LOG = logging.getLogger(__name__)
+
+_FILE_HASHES = {}
+
+
+def get_file_hash(filename):
+    """Get the sha256 hash of the content of a file.
+
+    The hash is only recomputed when the modification time or size of the
+    file changes.
+    """
+    stat = os.stat(filename)
+    key = (os.path.realpath(filename), stat.st_mtime_ns, stat.st_size)
+    if key not in _FILE_HASHES:
+        with open(filename, 'rb') as fpt:
+            _FILE_HASHES[key] = hashlib.sha256(fpt.read()).hexdigest()
+    return _FILE_HASHES[key]
+
+
+def get_area_hash(area_def):
+    """Get the sha256 hash of the shape, extent and projection of an area definition."""
+    description = repr((tuple(area_def.shape), tuple(float(value) for value in area_def.area_extent),
+                        area_def.crs.to_wkt()))
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class CoverageCell():
+    """The key of one coverage cell.
+
+    The area is its id and a hash of its definition (see
+    :func:`get_area_hash`), the satellites a set label (see
+    :func:`dr_schedule_and_coverage.labels.get_satellite_set_label`)
+    of the sorted satellite names, the instruments a label of each
+    satellite and its instrument, and the window times ISO formatted.
+    """
+
+    area_id: str
+    area_hash: str
+    satellites: str
+    instruments: str
+    start_time: str
+    end_time: str
+    tle_hash: str
+    method: str
+
+    @classmethod
+    def from_window(cls, area_def, satnames, instruments, start_time, end_time, tle_filename, method):
+        """Get the cell of a time window, with the *instruments* a dict of satellite name and instrument."""
+        satnames = sorted(set(satnames))
+        return cls(area_def.area_id, get_area_hash(area_def), get_satellite_set_label(satnames),
+                   ','.join('%s:%s' % (satname, instruments.get(satname, 'mhs')) for satname in satnames),
+                   start_time.isoformat(), end_time.isoformat(), get_file_hash(tle_filename), method)
+
+
+class CoverageCache():
+    """Coverage cells cached in a sqlite database at *path*.
+
+    The database is created if it does not exist. It can be shared by
+    several processes, writers waiting up to *timeout* seconds for each
+    other.
+    """
+
+    def __init__(self, path, timeout=60.):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS coverage_cells ("
+                               "area_id TEXT, area_hash TEXT, satellites TEXT, instruments TEXT, "
+                               "start_time TEXT, end_time TEXT, tle_hash TEXT, method TEXT, coverage REAL, "
+                               "PRIMARY KEY (area_id, area_hash, satellites, instruments, start_time, end_time, "
+                               "tle_hash, method))")
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM coverage_cells").fetchone()[0]
+
+    def get(self, cell):
+        """Get the coverage of a cell, or None if not cached."""
+        row = self._conn.execute("SELECT coverage FROM coverage_cells WHERE area_id = ? AND area_hash = ? AND "
+                                 "satellites = ? AND instruments = ? AND start_time = ? AND end_time = ? AND "
+                                 "tle_hash = ? AND method = ?", astuple(cell)).fetchone()
+        return None if row is None else row[0]
+
+    def get_all(self, cells):
+        """Get the coverages of the *cells*, or None unless all are cached."""
+        coverages = [self.get(cell) for cell in cells]
+        if any(coverage is None for coverage in coverages):
+            count('coverage_cache_misses', len(cells))
+            return None
+        count('coverage_cache_hits', len(cells))
+        return coverages
+
+    def put_all(self, cells, coverages):
+        """Cache the *coverages* of the *cells*, replacing the ones already there."""
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO coverage_cells VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   [astuple(cell) + (float(coverage), )
+                                    for cell, coverage in zip(cells, coverages)])
+
+    def put(self, cell, coverage):
+        """Cache the coverage of a cell."""
+        self.put_all([cell], [coverage])
+
+    def close(self):
+        """Close the database."""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Run the tasks of a sweep locally or spread over a cluster.
+
+The sweep functions take an *executor*, which can be any object with the
+submit method of the :mod:`concurrent.futures` executors. This includes a
+:class:`concurrent.futures.ProcessPoolExecutor` on one machine, and a
+`dask.distributed` Client for running across nodes::
+
+    from dask.distributed import Client
+    with Client('scheduler-address:8786') as client:
+        coverages = derive_constellation_subset_coverage(subsets, dates, hours, 60, executor=client)
+
+Each task only gets small inputs (satellite names, a date, the cycle start
+hours and the scenario config) and returns a small array, and the results
+are collected in the order the tasks were submitted, whatever order they
+finish in.
+"""
+
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+class InProcessExecutor():
+    """Run each task in the calling process when it is submitted.
+
+    A local stand-in for a cluster. With *check_pickle* the function, its
+    arguments and its result are pickled and unpickled as when shipped to
+    and from a worker, and the pickled sizes in bytes are recorded in
+    *shipped* as (input size, result size) tuples.
+    """
+
+    def __init__(self, check_pickle=True):
+        self.check_pickle = check_pickle
+        self.shipped = []
+
+    def submit(self, func, *args, **kwargs):
+        """Run the task and return a finished future with its result."""
+        future = Future()
+        try:
+            if self.check_pickle:
+                task = pickle.dumps((func, args, kwargs))
+                func, args, kwargs = pickle.loads(task)
+            result = func(*args, **kwargs)
+            if self.check_pickle:
+                shipped_result = pickle.dumps(result)
+                result = pickle.loads(shipped_result)
+                self.shipped.append((len(task), len(shipped_result)))
+        except Exception as err:
+            future.set_exception(err)
+        else:
+            future.set_result(result)
+        return future
+
+    def shutdown(self, wait=True):
+        """Nothing to shut down."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+def map_tasks(func, args, executor=None, nprocs=None):
+    """Yield the result of *func* for each tuple of arguments in *args*, in order.
+
+    The tasks are submitted to the *executor* if given, otherwise run in a
+    pool of *nprocs* processes, or one by one in this process.
+    """
+    args = list(args)
+    if len(args) == 0:
+        return
+    if executor is not None:
+        futures = [executor.submit(func, *task_args) for task_args in args]
+        for future in futures:
+            yield future.result()
+    elif nprocs and nprocs > 1:
+        with ProcessPoolExecutor(max_workers=nprocs) as pool:
+            yield from pool.map(func, *zip(*args))
+    else:
+        for task_args in args:
+            yield func(*task_args)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Rasterize satellite swath footprints onto the grid of an area.
+
+A footprint is a boolean mask of the area pixels inside the swath boundary
+of a pass. Masks can be combined with cheap array operations, which is much
+faster than the spherical polygon unions of
+:func:`dr_schedule_and_coverage.pmw_data_coverage.derive_combined_coverage`.
+The coverage from masks is the fraction of area pixels covered.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from matplotlib.path import Path
+
+from .pmw_data_coverage import create_pass
+from .instrumentation import timed
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@timed('rasterize_polygon')
+def rasterize_polygon(polygon, area_def):
+    """Get a boolean mask of the pixels of *area_def* inside the spherical *polygon*.
+
+    The polygon vertices (in radians) are projected to the area grid and
+    pixel centres are tested against the projected outline, so the polygon
+    must be densely sampled, as swath boundaries are.
+    """
+    mask = np.zeros(area_def.shape, dtype=bool)
+    cols, rows = area_def.get_array_coordinates_from_lonlat(np.rad2deg(polygon.lon),
+                                                             np.rad2deg(polygon.lat))
+    cols = np.asarray(cols, dtype=np.float64)
+    rows = np.asarray(rows, dtype=np.float64)
+    valid = np.isfinite(cols) & np.isfinite(rows)
+    if valid.sum() < 3:
+        return mask
+
+    cols = cols[valid]
+    rows = rows[valid]
+    nrows, ncols = area_def.shape
+    col_min = max(int(np.floor(cols.min())), 0)
+    col_max = min(int(np.ceil(cols.max())), ncols - 1)
+    row_min = max(int(np.floor(rows.min())), 0)
+    row_max = min(int(np.ceil(rows.max())), nrows - 1)
+    if col_min > col_max or row_min > row_max:
+        return mask
+
+    path = Path(np.column_stack((cols, rows)))
+    grid_rows, grid_cols = np.mgrid[row_min:row_max + 1, col_min:col_max + 1]
+    inside = path.contains_points(np.column_stack((grid_cols.ravel(), grid_rows.ravel())))
+    mask[row_min:row_max + 1, col_min:col_max + 1] = inside.reshape(grid_rows.shape)
+
+    return mask
+
+
+def rasterize_pass(apass, area_def):
+    """Get the footprint mask of a trollsched pass over *area_def*."""
+    return rasterize_polygon(apass.boundary.contour_poly, area_def)
+
+
+def pass_footprint(satname, instrument, starttime, endtime, tle_filename, area_def):
+    """Create the pass between *starttime* and *endtime* and get its footprint mask over *area_def*."""
+    return rasterize_pass(create_pass(satname, instrument, starttime, endtime, tle_filename), area_def)
+
+
+def get_granule_times(risetime, falltime, granule_length):
+    """Split the time interval of a pass into granules on a fixed time grid.
+
+    The granule boundaries are whole multiples of *granule_length* (a
+    timedelta) since 1970, except the first and last which are cut at the
+    rise and fall times. Return a list of (start, end) tuples.
+    """
+    step = granule_length.total_seconds()
+    first = EPOCH + timedelta(seconds=np.floor((risetime - EPOCH).total_seconds() / step) * step)
+
+    granules = []
+    start = risetime
+    edge = first + granule_length
+    while start < falltime:
+        end = min(edge, falltime)
+        granules.append((start, end))
+        start = end
+        edge = edge + granule_length
+
+    return granules
+
+
+def coverage_from_mask(mask):
+    """Get the relative coverage of the area from a mask or an observation count array."""
+    return np.count_nonzero(mask) / mask.size
+
+
+class GranuleFootprints():
+    """Bit-packed footprint masks of pass granules over an area.
+
+    The table is built once for all candidate satellites, after which the
+    coverage of any time window and any subset of the satellites is found by
+    selecting and combining masks, without predicting or rasterizing again.
+    """
+
+    def __init__(self, satnames, sat_index, starts, ends, packed_masks, shape):
+        self.satnames = list(satnames)
+        self.sat_index = np.asarray(sat_index, dtype=np.int32)
+        self.starts = np.asarray(starts, dtype='datetime64[us]')
+        self.ends = np.asarray(ends, dtype='datetime64[us]')
+        self.packed_masks = packed_masks
+        self.shape = tuple(shape)
+
+    def __len__(self):
+        return len(self.sat_index)
+
+    @classmethod
+    def from_passes(cls, allpasses, area_def, tle_filename, instruments,
+                    granule_length=timedelta(minutes=1), footprint_func=None):
+        """Cut the passes (dict of satellite name and list of (risetime, falltime, uptime)) in granules
+        and rasterize them.
+
+        Granules not touching the area are left out.
+        """
+        if footprint_func is None:
+            def footprint_func(satname, instrument, start, end):
+                return pass_footprint(satname, instrument, start, end, tle_filename, area_def)
+
+        def footprints_func(satname, instrument, start, end):
+            return [footprint_func(satname, instrument, start, end)]
+
+        return build_granule_footprints(allpasses, [area_def], tle_filename, instruments,
+                                        granule_length=granule_length, footprints_func=footprints_func)[0]
+
+    def select(self, start_time, end_time, satnames=None):
+        """Get the indices of the granules with mid time in the window, optionally only of *satnames*."""
+        mids = self.starts + (self.ends - self.starts) / 2
+        selected = (mids >= np.datetime64(start_time, 'us')) & (mids < np.datetime64(end_time, 'us'))
+        if satnames is not None:
+            wanted = [self.satnames.index(satname) for satname in satnames if satname in self.satnames]
+            selected &= np.isin(self.sat_index, wanted)
+        return np.flatnonzero(selected)
+
+    def packed_union(self, indices):
+        """Get the bit-packed union of the masks of the granules *indices*."""
+        if len(indices) == 0:
+            return np.zeros(self.packed_masks.shape[1:], dtype=np.uint8)
+        return np.bitwise_or.reduce(self.packed_masks[indices], axis=0)
+
+    def satellite_unions(self, start_time, end_time):
+        """Get the bit-packed union of the masks of each satellite in the window.
+
+        Return an array of shape (number of satellites, rows, packed columns).
+        """
+        unions = np.zeros((len(self.satnames), ) + self.packed_masks.shape[1:], dtype=np.uint8)
+        indices = self.select(start_time, end_time)
+        for idx in range(len(self.satnames)):
+            unions[idx] = self.packed_union(indices[self.sat_index[indices] == idx])
+        return unions
+
+    def unpack(self, packed):
+        """Unpack a bit-packed mask to a boolean mask of the area shape."""
+        return np.unpackbits(packed, axis=-1, count=self.shape[1]).astype(bool)
+
+    def coverage(self, start_time, end_time, satnames=None):
+        """Get the relative coverage of the area in the window by all or some of the satellites."""
+        mask = self.unpack(self.packed_union(self.select(start_time, end_time, satnames)))
+        return coverage_from_mask(mask)
+
+
+def build_granule_footprints(allpasses, area_defs, tle_filename, instruments,
+                             granule_length=timedelta(minutes=1), footprints_func=None):
+    """Cut the passes in granules and rasterize each of them onto several areas.
+
+    The pass of each granule is created once and its boundary rasterized
+    onto every area in *area_defs*. The *footprints_func* is called as
+    footprints_func(satname, instrument, start, end) and returns one mask per
+    area. Return a list of :class:`GranuleFootprints`, one per area, each
+    leaving out the granules not touching its area.
+    """
+    if footprints_func is None:
+        def footprints_func(satname, instrument, start, end):
+            apass = create_pass(satname, instrument, start, end, tle_filename)
+            return [rasterize_pass(apass, area_def) for area_def in area_defs]
+
+    satnames = list(allpasses)
+    tables = [([], [], [], []) for _ in area_defs]
+    for idx, satname in enumerate(satnames):
+        instrument = instruments.get(satname, 'mhs')
+        for rtime, ftime, _ in allpasses[satname]:
+            for start, end in get_granule_times(rtime, ftime, granule_length):
+                masks = footprints_func(satname, instrument, start, end)
+                for (sat_index, starts, ends, packed), mask in zip(tables, masks):
+                    if not mask.any():
+                        continue
+                    sat_index.append(idx)
+                    starts.append(start)
+                    ends.append(end)
+                    packed.append(np.packbits(mask, axis=-1))
+
+    footprints = []
+    for area_def, (sat_index, starts, ends, packed) in zip(area_defs, tables):
+        packed_shape = (area_def.shape[0], (area_def.shape[1] + 7) // 8)
+        packed_masks = np.array(packed, dtype=np.uint8).reshape((-1, ) + packed_shape)
+        footprints.append(GranuleFootprints(satnames, sat_index, starts, ends, packed_masks, area_def.shape))
+
+    return footprints
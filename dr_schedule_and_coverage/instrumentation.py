@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Opt-in timing instrumentation of the hot paths, with a json run report.
+
+Instrumentation is off by default, and the timers then cost next to
+nothing. Enable it around a run with::
+
+    with report_to('run_report.json'):
+        ...
+
+The report holds, per stage, the number of calls and the total and maximum
+time spent, the counters, the wall time of the run and the peak memory
+(resident set size) of the process. Only the calling process is measured,
+work done in process pools is not included.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+_REPORT = None
+
+
+class RunReport():
+    """Accumulated timings and counters of one run."""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    def add_time(self, stage, seconds):
+        """Add the time of one call to *stage*."""
+        calls, total, longest = self.stages.get(stage, (0, 0., 0.))
+        self.stages[stage] = (calls + 1, total + seconds, max(longest, seconds))
+
+    def count(self, name, number=1):
+        """Add *number* to the counter *name*."""
+        self.counters[name] = self.counters.get(name, 0) + number
+
+    def as_dict(self):
+        """Get the report as a dict."""
+        stages = {stage: {'calls': calls, 'total_seconds': total, 'max_seconds': longest}
+                  for stage, (calls, total, longest) in sorted(self.stages.items(),
+                                                               key=lambda item: -item[1][1])}
+        return {'wall_seconds': time.perf_counter() - self._start,
+                'peak_memory_mb': get_peak_memory_mb(),
+                'stages': stages,
+                'counters': dict(self.counters)}
+
+    def write(self, filename):
+        """Write the report to a json file."""
+        with open(filename, 'w') as fpt:
+            json.dump(self.as_dict(), fpt, indent=2)
+
+
+def get_peak_memory_mb():
+    """Get the peak resident set size of this process in MB, or None if unknown."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def enable():
+    """Start collecting timings in a new report and return it."""
+    global _REPORT
+    _REPORT = RunReport()
+    return _REPORT
+
+
+def disable():
+    """Stop collecting timings and return the report collected so far."""
+    global _REPORT
+    report, _REPORT = _REPORT, None
+    return report
+
+
+def get_report():
+    """Get the current report, or None if instrumentation is not enabled."""
+    return _REPORT
+
+
+@contextmanager
+def report_to(filename):
+    """Collect timings in the block and write the json report to *filename*.
+
+    Nothing is collected if *filename* is None.
+    """
+    if filename is None:
+        yield None
+        return
+
+    report = enable()
+    try:
+        yield report
+    finally:
+        disable()
+        report.write(filename)
+
+
+@contextmanager
+def timer(stage):
+    """Time the block as one call to *stage*."""
+    report = _REPORT
+    if report is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.add_time(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """Decorate a function so each call is timed as *stage*."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            report = _REPORT
+            if report is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                report.add_time(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count(name, number=1):
+    """Add *number* to the counter *name* if instrumentation is enabled."""
+    report = _REPORT
+    if report is not None:
+        report.count(name, number)
@@ -25,6 +25,7 @@ given domain during a given time interval.
 
 """
 
+import logging
 import numpy as np
 from glob import glob
 import os
@@ -40,34 +41,31 @@ from pyorbital import tlefile
 from trollsift import Parser, globify
 from pyresample.spherical_utils import GetNonOverlapUnions
 
+from .config import DEFAULT_CONFIG
+from .coverage_cache import CoverageCell
+from .labels import get_satellite_set_label
+from .instrumentation import timed, timer, count
+from .stations import NRK, SDK, BLACK_RIDGE  # noqa
 
-AREA_DEF_FILE = '/home/a000680/usr/src/pytroll-config/etc/areas.yaml'
+LOG = logging.getLogger(__name__)
+
+AREA_DEF_FILE = DEFAULT_CONFIG.area_def_file
 #AREAID = 'euron1'
 #AREAID = 'arome3km'
-AREAID = 'se_north'
-
-# Location = Longitude (deg), Latitude (deg), Altitude (km)
-NRK = (16.148649, 58.581844, 0.052765)
-SDK = (26.632, 67.368, 0.18)
-BLACK_RIDGE = (-50.62074, 66.99571, 0.4)
-
-TLE_REALTIME_ARCHIVE = "/data/24/saf/polar_in/tle"
-TLE_LONGTIME_ARCHIVE = "/data/lang/satellit/polar/orbital_elements/TLE"
-
-INSTRUMENTS = {'Metop-A': 'mhs',
-               'Metop-B': 'mhs',
-               'Metop-C': 'mhs',
-               'NOAA-18': 'mhs',
-               'NOAA-19': 'mhs',
-               'Suomi-NPP': 'atms',
-               'NOAA-20': 'atms',
-               'FY-3C': 'mwhs-2',
-               'FY-3D': 'mwhs-2'}
+AREAID = DEFAULT_CONFIG.area_id
+
+TLE_REALTIME_ARCHIVE = DEFAULT_CONFIG.tle_realtime_archive
+TLE_LONGTIME_ARCHIVE = DEFAULT_CONFIG.tle_longtime_archive
+
+INSTRUMENTS = DEFAULT_CONFIG.instruments
 
 # tle-202103222030.txt
 tlepattern = 'tle-{time:%Y%m%d%H%M}.txt'
 tlepattern2 = 'tle-{time:%Y%m%d}.txt'
 
+# Method of derive_combined_coverage, in the keys of cached coverage cells:
+COVERAGE_METHOD = 'pass_polygons'
+
 
 def find_valid_file_from_list(parse_obj, obstime, tlefiles, tol_sec):
 
@@ -88,20 +86,29 @@ def find_valid_file_from_list(parse_obj, obstime, tlefiles, tol_sec):
     return found_file
 
 
-def find_actual_tlefile(obstime):
-    """Given a time find the tle-file with the timestamp closest in time and return filename."""
+@timed('find_actual_tlefile')
+def find_actual_tlefile(obstime, config=None, index=None):
+    """Given a time find the tle-file with the timestamp closest in time and return filename.
 
-    tlefiles = glob(os.path.join(TLE_REALTIME_ARCHIVE, globify(tlepattern)))
+    The TLE archives are taken from the scenario *config* if given. With an
+    *index* (see :class:`dr_schedule_and_coverage.tle_archive.TLEArchiveIndex`)
+    of the realtime archive, it is searched instead of globbing the archive.
+    """
+    realtime_archive = TLE_REALTIME_ARCHIVE if config is None else config.tle_realtime_archive
+    longtime_archive = TLE_LONGTIME_ARCHIVE if config is None else config.tle_longtime_archive
 
-    p__ = Parser(tlepattern)
     found_file = None
     tol_sec = 3600
 
-    found_file = find_valid_file_from_list(p__, obstime, tlefiles, tol_sec)
+    if index is not None:
+        found_file = index.find(obstime, tol_sec)
+    else:
+        tlefiles = glob(os.path.join(realtime_archive, globify(tlepattern)))
+        found_file = find_valid_file_from_list(Parser(tlepattern), obstime, tlefiles, tol_sec)
     if not found_file:
         for pattern in [tlepattern, tlepattern2]:
             p__ = Parser(pattern)
-            tlefiles_archive = glob(os.path.join(TLE_LONGTIME_ARCHIVE + obstime.strftime("/%Y%m"), globify(pattern)))
+            tlefiles_archive = glob(os.path.join(longtime_archive + obstime.strftime("/%Y%m"), globify(pattern)))
             found_file = find_valid_file_from_list(p__, obstime, tlefiles_archive, tol_sec)
             if found_file:
                 break
@@ -109,6 +116,7 @@ def find_actual_tlefile(obstime):
     return found_file
 
 
+@timed('get_sats_within_horizon')
 def get_sats_within_horizon(satnames, obstime, forward=1, tle_filename=None, location=NRK):
     """For a given time find all passes for a list of satellites within the horizon of a given location."""
 
@@ -122,10 +130,34 @@ def get_sats_within_horizon(satnames, obstime, forward=1, tle_filename=None, loc
                                           horizon=local_horizon)
 
         passes[satname] = passlist
+        count('passes_predicted', len(passlist))
 
     return passes
 
 
+def get_cycle_windows(mydate, starthours, length_minutes):
+    """Get the (start, end) time windows of the cycles starting *starthours* hours after midnight of *mydate*."""
+    midnight = datetime(mydate.year, mydate.month, mydate.day)
+    return [(midnight + timedelta(hours=float(starthour)),
+             midnight + timedelta(hours=float(starthour), minutes=length_minutes))
+            for starthour in starthours]
+
+
+def predict_passes_for_time_span(satnames, start_time, end_time, config=None, margin=timedelta(minutes=30)):
+    """Predict the passes of all *satnames* between *start_time* and *end_time*.
+
+    The TLE file closest to *start_time* is used. Passes are predicted from
+    *margin* before the start, to catch those already in progress. Return
+    the passes (dict of satellite name and list of (risetime, falltime,
+    uptime)) and the TLE filename.
+    """
+    tle_file = find_actual_tlefile(start_time, config)
+    nhours = int((end_time - start_time + 2 * margin).total_seconds() / 3600. + 1)
+    nextpasses = get_sats_within_horizon(satnames, start_time - margin, forward=nhours, tle_filename=tle_file)
+
+    return nextpasses, tle_file
+
+
 def create_passes_inside_time_window(allpasses, instruments, time_left, time_right, tle_filename):
     """Go through list of passes and adapt passes so they are fully inside the relevant time window."""
 
@@ -138,13 +170,14 @@ def create_passes_inside_time_window(allpasses, instruments, time_left, time_rig
             sensor = instruments.get(satname, 'mhs')
             if time_start > time_end:
                 continue
-            print(satname, sensor, rtime, ftime, time_start, time_end)
+            LOG.debug("%s %s %s %s %s %s", satname, sensor, rtime, ftime, time_start, time_end)
             passes.append(create_pass(satname, sensor,
                                       time_start, time_end, tle_filename))
 
     return passes
 
 
+@timed('create_pass')
 def create_pass(satname, instrument, starttime, endtime, tle_filename=None):
     """Create a satellite pass given a start and an endtime."""
     tle = tlefile.Tle(satname, tle_file=tle_filename)
@@ -162,7 +195,8 @@ def draw_overpasses_on_area(passes, area_def, plotpath="./plots", outline='-r'):
         acov = apass.area_coverage(area_def)
         # print(acov)
         # save_fig(apass, area_boundary, outline='*')
-        save_fig(apass, area_boundary, directory=plotpath, outline=outline)
+        with timer('save_fig'):
+            save_fig(apass, area_boundary, directory=plotpath, outline=outline)
 
 
 def get_accumulated_coverage(passes, area_boundary):
@@ -178,12 +212,19 @@ def get_accumulated_coverage(passes, area_boundary):
 
 
 def derive_combined_coverage(passes, area_def):
-    """From a sequence of satellite overpasses derived the total coverage of an area."""
+    """From a sequence of satellite overpasses derived the total coverage of an area.
+
+    If *area_def* is a list of area definitions the pass polygons are merged
+    once and intersected with each area, and an array with the coverage of
+    each area is returned.
+    """
+    multiple_areas = isinstance(area_def, (list, tuple))
+    area_defs = area_def if multiple_areas else [area_def]
 
     npasses = len(passes)
     if npasses == 0:
-        print("No passes in time window!")
-        return 0
+        LOG.debug("No passes in time window!")
+        return np.zeros(len(area_defs)) if multiple_areas else 0
 
     instruments = set({})
     mintime = 0
@@ -196,27 +237,33 @@ def derive_combined_coverage(passes, area_def):
         if maxtime == 0 or mypass.falltime > maxtime:
             maxtime = mypass.falltime
 
-    area_boundary = AreaDefBoundary(area_def, frequency=100)
-    area_boundary = area_boundary.contour_poly
-
     list_of_polygons = []
-    for mypass in passes:
-        list_of_polygons.append(mypass.boundary.contour_poly)
+    with timer('pass_boundaries'):
+        for mypass in passes:
+            list_of_polygons.append(mypass.boundary.contour_poly)
 
     non_overlaps = GetNonOverlapUnions(list_of_polygons)
-    non_overlaps.merge()
+    with timer('GetNonOverlapUnions.merge'):
+        non_overlaps.merge()
+    count('polygons_merged', len(list_of_polygons))
 
     polygons = non_overlaps.get_polygons()
     pass_ids = non_overlaps.get_ids()
 
-    coverage = 0
-    for polygon in polygons:
-        isect = polygon.intersection(area_boundary)
-        if isect:
-            coverage = coverage + isect.area()
+    area_covs = []
+    for adef in area_defs:
+        area_boundary = AreaDefBoundary(adef, frequency=100)
+        area_boundary = area_boundary.contour_poly
+
+        coverage = 0
+        with timer('area_intersection'):
+            for polygon in polygons:
+                isect = polygon.intersection(area_boundary)
+                if isect:
+                    coverage = coverage + isect.area()
 
-    area_cov = coverage / area_boundary.area()
-    print("Area coverage = {0}".format(area_cov))
+        area_covs.append(coverage / area_boundary.area())
+        LOG.debug("Area coverage = %f", area_covs[-1])
 
     # instrlist = " ".join(instruments)
     # plot_title = "{N} passes between {start_time} and {end_time}".format(N=npasses,
@@ -271,7 +318,9 @@ def derive_combined_coverage(passes, area_def):
 
     # plt.savefig(plotfilename)
 
-    return area_cov
+    if multiple_areas:
+        return np.array(area_covs)
+    return area_covs[0]
 
 
 def draw(lonlat, mapper, options, **more_options):
@@ -284,34 +333,113 @@ def draw(lonlat, mapper, options, **more_options):
     mapper.plot(rx, ry, options, **more_options)
 
 
-def derive_average_coverage_one_timewindow(satnames, starthour, length_minutes, dates):
-    """For a given time window and one set of satellites derive the average coverage over several days."""
-
-    areadef = load_area(AREA_DEF_FILE, AREAID)
+def derive_average_coverage_one_timewindow(satnames, starthour, length_minutes, dates, config=None,
+                                           progress=None, areaids=None, cache=None, store=None,
+                                           plotpath="/tmp/plots/"):
+    """For a given time window and one set of satellites derive the average coverage over several days.
+
+    Area, instruments and TLE archives are taken from the scenario *config* if
+    given, otherwise from the module defaults. If given, *progress* is called
+    for each date with the date, start hour and coverage as keyword
+    arguments, see :class:`dr_schedule_and_coverage.progress.SweepProgress`.
+
+    With a list of *areaids* the coverage of each of these areas is derived
+    from the same passes, and an array of shape (number of areas, number of
+    dates) is returned.
+
+    The passes of each window are drawn on the (first) area in *plotpath*,
+    unless it is None.
+
+    With a *cache* (see
+    :class:`dr_schedule_and_coverage.coverage_cache.CoverageCache`) the
+    coverage of each date is looked up before predicting any pass, and only
+    computed and added to the cache if not found.
+
+    With a *store* (see
+    :class:`dr_schedule_and_coverage.result_store.CoverageStore`, holding
+    the set of *satnames*, the areas and the cycle starting at *starthour*)
+    the coverage of each date is written to it as soon as it is done, and
+    dates already in it are read instead of computed, so an interrupted
+    sweep can be resumed.
+    """
+    if config is None:
+        area_def_file, instruments = AREA_DEF_FILE, INSTRUMENTS
+        areaid = AREAID
+    else:
+        area_def_file, instruments = config.area_def_file, config.instruments
+        areaid = config.area_id
+    if areaids is None:
+        areadef = load_area(area_def_file, areaid)
+    else:
+        areadef = [load_area(area_def_file, areaid) for areaid in areaids]
+    cell_areaids = [areaid] if areaids is None else list(areaids)
+    satellite_sets = [get_satellite_set_label(satnames)]
 
     rel_areacov = []
     for mydate in dates:
         start_time = datetime(mydate.year, mydate.month, mydate.day) + timedelta(hours=starthour)
         end_time = (datetime(mydate.year, mydate.month, mydate.day) +
                     timedelta(hours=starthour) + timedelta(minutes=length_minutes))
-        tle_file = find_actual_tlefile(start_time)
-
-        delta_t = timedelta(minutes=5)
-        nhours = int((end_time - start_time + delta_t).total_seconds()/3600. + 1)
-
-        nextpasses = get_sats_within_horizon(satnames, start_time - delta_t, forward=nhours, tle_filename=tle_file)
+        if store is not None and store.is_cycle_done(mydate, starthour, satellite_sets, cell_areaids):
+            area_cov = store.read_cycle(mydate, starthour, satellite_sets, cell_areaids)[0]
+            rel_areacov.append(area_cov[0] if areaids is None else area_cov)
+            continue
+
+        tle_file = find_actual_tlefile(start_time, config)
+
+        cells = None
+        area_cov = None
+        if cache is not None and tle_file is not None:
+            cells = [CoverageCell.from_window(cell_areadef, satnames, instruments, start_time, end_time, tle_file,
+                                              COVERAGE_METHOD)
+                     for cell_areadef in ([areadef] if areaids is None else areadef)]
+            cached = cache.get_all(cells)
+            if cached is not None:
+                area_cov = cached[0] if areaids is None else np.array(cached)
+
+        if area_cov is None:
+            delta_t = timedelta(minutes=5)
+            nhours = int((end_time - start_time + delta_t).total_seconds()/3600. + 1)
+
+            nextpasses = get_sats_within_horizon(satnames, start_time - delta_t, forward=nhours,
+                                                 tle_filename=tle_file)
+
+            mypasses = create_passes_inside_time_window(nextpasses, instruments, start_time, end_time, tle_file)
+            if plotpath is not None:
+                for p in mypasses:
+                    draw_overpasses_on_area([p, ], areadef if areaids is None else areadef[0],
+                                            plotpath=plotpath)
+                    #save_fig(p, directory="/tmp/plots/")
+
+            area_cov = derive_combined_coverage(mypasses, areadef)
+            if cells is not None:
+                cache.put_all(cells, np.atleast_1d(area_cov))
+
+        if store is not None:
+            store.write_cycle(mydate, starthour, [np.atleast_1d(area_cov)], satellite_sets, cell_areaids)
+        rel_areacov.append(area_cov)
+        if progress is not None:
+            progress(date=mydate, starthour=starthour, coverage=area_cov)
+
+    if areaids is not None:
+        return np.array(rel_areacov).reshape((len(dates), len(areaids))).T
+    return np.array(rel_areacov)
 
-        mypasses = create_passes_inside_time_window(nextpasses, INSTRUMENTS, start_time, end_time, tle_file)
-        for p in mypasses:
-            draw_overpasses_on_area([p, ], areadef, plotpath="/tmp/plots/")
-            #save_fig(p, directory="/tmp/plots/")
 
-        rel_areacov.append(derive_combined_coverage(mypasses, areadef))
+if __name__ == "__main__":
 
-    return np.array(rel_areacov)
+    import sys
+    from dr_schedule_and_coverage.config import read_config
+    from dr_schedule_and_coverage.coverage_cache import CoverageCache
+    from dr_schedule_and_coverage.instrumentation import report_to
+    from dr_schedule_and_coverage.progress import SweepProgress
+    from dr_schedule_and_coverage.result_store import CoverageStore
 
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(levelname)s: %(asctime)s : %(name)s] %(message)s')
 
-if __name__ == "__main__":
+    # Optionally take area, instruments and TLE archives from a scenario file:
+    config = read_config(sys.argv[1]) if len(sys.argv) > 1 else None
 
     # SATS = ['Metop-B', 'Metop-C', 'Metop-A', 'NOAA-18', 'NOAA-19',
     #        'Suomi-NPP', 'NOAA-20', 'FY-3D']
@@ -351,22 +479,33 @@ if __name__ == "__main__":
                                      int(time_window_size/2 - cutoff)),
         'Latency: %d min' % (latency),))
 
-    for fhour in np.arange(-time_window_size/60*0.5, 24-cycle_distance/2, cycle_distance):
-        print("Hour: ", fhour)
-        acov = derive_average_coverage_one_timewindow(SATS, fhour, minutes_ahead, somedates)
-        areacovs[fhour + 1.5] = acov
-
-    str_areacovs = {}
-    for key in areacovs:
-        str_areacovs['%3.1f' % key] = areacovs[key]
-
+    fhours = np.arange(-time_window_size/60*0.5, 24-cycle_distance/2, cycle_distance)
     time_window_desc = "{latency}min_{timewindow}min_{cutoff}min".format(latency=latency,
                                                                          timewindow=time_window_size,
                                                                          cutoff=cutoff)
-    np.savez('./areacoverage_{sats}_{time}_{desc}.npz'.format(sats=strsats_prefix,
-                                                              time=str_time_period,
-                                                              desc=time_window_desc),
-             **str_areacovs)
+    # Each cell is written to the store when done, and a rerun only computes the cells missing:
+    areaid = AREAID if config is None else config.area_id
+    store = CoverageStore.open_or_create('./areacoverage_{sats}_{time}_{desc}.zarr'.format(sats=strsats_prefix,
+                                                                                         time=str_time_period,
+                                                                                         desc=time_window_desc),
+                                         [get_satellite_set_label(SATS)], [areaid], somedates, fhours)
+    # Only the cells not in the store are computed, and counted by the progress:
+    progress = SweepProgress(len(fhours) * len(somedates) -
+                             store.count_done(somedates, [get_satellite_set_label(SATS)], [areaid], fhours))
+
+    # Set DR_SCHEDULE_COVERAGE_CACHE to a sqlite filename to only compute the cells not done in earlier runs:
+    cache_path = os.environ.get('DR_SCHEDULE_COVERAGE_CACHE')
+    cache = CoverageCache(cache_path) if cache_path else None
+
+    # Set DR_SCHEDULE_TIMING_REPORT to a json filename to get a timing report of the sweep:
+    with report_to(os.environ.get('DR_SCHEDULE_TIMING_REPORT')):
+        for fhour in fhours:
+            LOG.debug("Hour: %f", fhour)
+            acov = derive_average_coverage_one_timewindow(SATS, fhour, minutes_ahead, somedates, config=config,
+                                                          progress=progress, cache=cache, store=store)
+            areacovs[fhour + 1.5] = acov
+    if cache is not None:
+        cache.close()
 
     import matplotlib.pyplot as plt
     import matplotlib.dates as mdates
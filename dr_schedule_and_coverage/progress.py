@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Progress reporting for long sweeps over dates and assimilation cycles.
+
+The coverage functions take a *progress* callable, which is called once for
+each finished cell with keyword arguments describing the cell. A
+:class:`SweepProgress` is such a callable, keeping track of how many cells
+are done and remaining and estimating the time left::
+
+    progress = SweepProgress(len(dates) * len(hours))
+    for hour in hours:
+        derive_average_coverage_one_timewindow(sats, hour, 60, dates, progress=progress)
+
+Cells read from a result store when resuming a sweep are not reported, so
+the total is then the number of cells left, see
+:meth:`dr_schedule_and_coverage.result_store.CoverageStore.count_done`.
+"""
+
+import logging
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class SweepProgress():
+    """Aggregate progress of a sweep over *total* cells.
+
+    The status is logged at most every *log_interval* seconds. If a
+    *callback* is given it is called with the status dict after every cell.
+    """
+
+    def __init__(self, total, callback=None, log_interval=30.):
+        self.total = total
+        self.done = 0
+        self.callback = callback
+        self.log_interval = log_interval
+        self.last_cell = None
+        self._start = time.monotonic()
+        self._last_log = self._start
+
+    def __call__(self, **cell):
+        """Register one more finished cell."""
+        self.done += 1
+        self.last_cell = cell
+
+        if self.callback is not None:
+            self.callback(self.status())
+
+        now = time.monotonic()
+        if now - self._last_log >= self.log_interval or self.done == self.total:
+            self._last_log = now
+            LOG.info("%d of %d cells done, %d remaining, ETA %.0f s",
+                     self.done, self.total, self.remaining, self.eta)
+
+    @property
+    def remaining(self):
+        """Number of cells left."""
+        return max(self.total - self.done, 0)
+
+    @property
+    def elapsed(self):
+        """Seconds since the start of the sweep."""
+        return time.monotonic() - self._start
+
+    @property
+    def eta(self):
+        """Estimated seconds left, assuming the remaining cells take as long as the done ones."""
+        if self.done == 0:
+            return float('nan')
+        return self.elapsed / self.done * self.remaining
+
+    def status(self):
+        """Get the progress status as a dict."""
+        return {'done': self.done,
+                'total': self.total,
+                'remaining': self.remaining,
+                'elapsed': self.elapsed,
+                'eta': self.eta,
+                'last_cell': self.last_cell}
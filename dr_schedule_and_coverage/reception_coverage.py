@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Area coverage from the data actually received by a network of direct readout stations.
+
+The passes at each station are predicted once and used for both stages:
+the reception schedule of each station is resolved from them (see
+:func:`dr_schedule_and_coverage.sat_receptions.resolve_station_receptions`),
+and the passes of all stations, merged per satellite, are cut in granules
+and rasterized once (see
+:class:`dr_schedule_and_coverage.footprints.GranuleFootprints`). A granule
+counts in the coverage only if it was received by one of the stations and
+is available, at the end of its reception plus the latency, before the
+deadline.
+"""
+
+import logging
+from datetime import timedelta
+
+import numpy as np
+from pyresample import load_area
+
+from .config import DEFAULT_CONFIG
+from .footprints import GranuleFootprints, coverage_from_mask
+from .pmw_data_coverage import find_actual_tlefile, get_cycle_windows
+from .sat_receptions import CreateReceptionList, resolve_station_receptions
+from .sat_receptions import merge_intervals, get_pass_times, from_epoch_microseconds
+
+LOG = logging.getLogger(__name__)
+
+
+def merge_station_passes(satnames, passlists):
+    """Merge the candidate passes of several stations per satellite.
+
+    The *passlists* are time sorted lists of [start, end, platform name]
+    passes. Return a dict of satellite name and list of (start, end, None),
+    in the form of the predicted passes.
+    """
+    passlists = [list(passlist) for passlist in passlists]
+    allpasses = {}
+    for satname in satnames:
+        satpasses = [apass for passlist in passlists for apass in passlist if apass[2] == satname]
+        starts, ends = merge_intervals(*get_pass_times(satpasses))
+        allpasses[satname] = [(start, end, None) for start, end in zip(from_epoch_microseconds(starts),
+                                                                        from_epoch_microseconds(ends))]
+
+    return allpasses
+
+
+def get_granule_availability(footprints, schedules, latency=timedelta(0)):
+    """Get the time each granule is available, from the station reception schedules.
+
+    A granule is received if its mid time is inside a received pass of its
+    satellite, and is available at the end of that pass plus the *latency*.
+    If received by several stations the earliest time is taken. Return an
+    array of times, NaT for granules not received.
+    """
+    mids = footprints.starts + (footprints.ends - footprints.starts) / 2
+    available = np.full(len(footprints), np.datetime64('NaT'), dtype='datetime64[us]')
+    for schedule in schedules.values():
+        for start, end, platform_name, _ in schedule:
+            if platform_name not in footprints.satnames:
+                continue
+            inside = ((footprints.sat_index == footprints.satnames.index(platform_name)) &
+                      (mids >= np.datetime64(start, 'us')) & (mids < np.datetime64(end, 'us')))
+            ready = np.datetime64(end + latency, 'us')
+            earlier = inside & (np.isnat(available) | (available > ready))
+            available[earlier] = ready
+
+    return available
+
+
+class ReceivedCoverage():
+    """Potential and received coverage of an area from the passes at a network of stations.
+
+    The *schedules* are the received passes of each station, as returned by
+    :func:`dr_schedule_and_coverage.sat_receptions.resolve_station_receptions`,
+    and *available* the time each granule of the *footprints* is available.
+    """
+
+    def __init__(self, footprints, available, candidates, schedules):
+        self.footprints = footprints
+        self.available = available
+        self.candidates = candidates
+        self.schedules = schedules
+
+    @classmethod
+    def from_stations(cls, satnames, stations, start_time, end_time, config=None, antennas=1,
+                      latency=timedelta(0), granule_length=timedelta(minutes=1), tle_file=None,
+                      margin=timedelta(hours=1), footprint_func=None):
+        """Predict the passes at each of the *stations*, resolve the receptions and rasterize the passes.
+
+        The stations are names defined in the scenario *config* or (lon,
+        lat, alt) tuples, each with *antennas* antennas. The passes are
+        predicted from *margin* before *start_time* until *margin* after
+        *end_time*.
+        """
+        if config is None:
+            config = DEFAULT_CONFIG
+        if tle_file is None:
+            tle_file = find_actual_tlefile(start_time, config)
+        area_def = load_area(config.area_def_file, config.area_id)
+
+        candidates = {}
+        schedules = {}
+        for station in stations:
+            reception_list = CreateReceptionList(satnames, (start_time - margin, end_time + margin), station,
+                                                 config=config)
+            reception_list.get_passes(tle_file)
+            candidates[station] = reception_list.sorted_passlist
+            schedules[station], _ = resolve_station_receptions(reception_list.sorted_passlist,
+                                                               antennas=antennas, config=config)
+            LOG.debug("Station %s: %d of %d passes received", station, len(schedules[station]),
+                      len(candidates[station]))
+
+        allpasses = merge_station_passes(satnames, candidates.values())
+        footprints = GranuleFootprints.from_passes(allpasses, area_def, tle_file, config.instruments,
+                                                   granule_length=granule_length, footprint_func=footprint_func)
+        available = get_granule_availability(footprints, schedules, latency)
+
+        return cls(footprints, available, candidates, schedules)
+
+    def coverage(self, start_time, end_time, deadline=None, received=True):
+        """Get the relative coverage of the area in the window.
+
+        Only the granules received and available no later than *deadline*
+        (by default the end of the window) are used, or with *received*
+        False all the granules at the stations.
+        """
+        indices = self.footprints.select(start_time, end_time)
+        if received:
+            if deadline is None:
+                deadline = end_time
+            available = self.available[indices]
+            indices = indices[~np.isnat(available) & (available <= np.datetime64(deadline, 'us'))]
+
+        return coverage_from_mask(self.footprints.unpack(self.footprints.packed_union(indices)))
+
+
+def derive_received_coverage_consecutive_cycles(satnames, stations, starthours, length_minutes, dates,
+                                                config=None, antennas=1, latency=timedelta(0),
+                                                cutoff=timedelta(0), granule_length=timedelta(minutes=1),
+                                                progress=None):
+    """Derive the received and the potential coverage for consecutive cycles of each date.
+
+    The data of a cycle must be available no later than *cutoff* after the
+    end of its window. If given, *progress* is called for each cycle.
+
+    Return two arrays of relative coverages, received and potential, each of
+    shape (number of dates, number of cycles).
+    """
+    received = np.zeros((len(dates), len(starthours)))
+    potential = np.zeros((len(dates), len(starthours)))
+    for date_idx, mydate in enumerate(dates):
+        windows = get_cycle_windows(mydate, starthours, length_minutes)
+        coverage = ReceivedCoverage.from_stations(satnames, stations, windows[0][0], windows[-1][1],
+                                                  config=config, antennas=antennas, latency=latency,
+                                                  granule_length=granule_length)
+        for cycle_idx, (start_time, end_time) in enumerate(windows):
+            received[date_idx, cycle_idx] = coverage.coverage(start_time, end_time, deadline=end_time + cutoff)
+            potential[date_idx, cycle_idx] = coverage.coverage(start_time, end_time, received=False)
+            if progress is not None:
+                progress(date=mydate, starthour=starthours[cycle_idx], coverage=received[date_idx, cycle_idx])
+
+    return received, potential
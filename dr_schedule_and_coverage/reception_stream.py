@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Station reception schedules over long periods, predicted and resolved chunk by chunk.
+
+Instead of predicting all passes of the period at once, the passes are
+predicted per time chunk (one day by default) and streamed through the
+conflict resolution. The time sorted passes are split in conflict groups: a
+new group starts with a pass starting after the end of every pass before it,
+so no pass can conflict with a pass of another group, and resolving each
+group on its own gives the same receptions as resolving the whole list.
+Groups straddling chunk boundaries are carried over to the next chunk, and
+only the current chunk and open group are kept in memory.
+
+For parallel workers, :func:`get_chunk_receptions` resolves one chunk on its
+own, predicting a margin around it to close the conflict groups at its
+edges.
+"""
+
+import logging
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+
+from .pmw_data_coverage import find_actual_tlefile
+from .stations import NO_LIMITS
+from .visibility import get_visible_passes
+from .sat_receptions import resolve_station_receptions, get_reception_statistics, add_reception_efficiencies
+
+LOG = logging.getLogger(__name__)
+
+
+def iter_time_chunks(start_time, end_time, chunk_length=timedelta(days=1)):
+    """Yield the (start, end) time chunks of *chunk_length* covering *start_time* to *end_time*."""
+    chunk_start = start_time
+    while chunk_start < end_time:
+        chunk_end = min(chunk_start + chunk_length, end_time)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end
+
+
+def get_station_passes(platform_names, start_time, end_time, location, tle_file=None, config=None,
+                       margin=timedelta(minutes=30)):
+    """Get the time sorted passes at a station rising between *start_time* and *end_time*.
+
+    The passes are predicted from *margin* before the start until *margin*
+    after the end, so the passes rising in the time span are complete. The
+    TLE file closest to *start_time* is used if no *tle_file* is given, and
+    the *location* may be a station name of the scenario *config*, whose
+    visibility limits are then applied. Return a list of [rise time, fall
+    time, platform name] passes.
+    """
+    visibility = NO_LIMITS
+    if config is not None:
+        visibility = config.get_station_visibility(location)
+        location = config.get_station(location)
+    if tle_file is None:
+        tle_file = find_actual_tlefile(start_time, config)
+
+    nhours = int(np.ceil((end_time - start_time + 2 * margin).total_seconds() / 3600.))
+    satpasses = get_visible_passes(platform_names, start_time - margin, forward=nhours,
+                                   tle_filename=tle_file, location=location, visibility=visibility)
+
+    passlist = [[rtime, ftime, satname] for satname in platform_names for rtime, ftime, _ in satpasses[satname]
+                if start_time <= rtime < end_time]
+    passlist.sort()
+    return passlist
+
+
+def iter_station_passes(platform_names, start_time, end_time, location, chunk_length=timedelta(days=1),
+                        tle_file=None, config=None):
+    """Yield the time sorted passes at a station, predicted one time chunk at a time."""
+    for chunk_start, chunk_end in iter_time_chunks(start_time, end_time, chunk_length):
+        yield from get_station_passes(platform_names, chunk_start, chunk_end, location, tle_file=tle_file,
+                                      config=config)
+
+
+def iter_conflict_groups(passes):
+    """Split a time sorted stream of passes in independent conflict groups.
+
+    A new group starts with a pass starting at or after the end of all the
+    passes before it. Yield the groups as lists of passes.
+    """
+    group = []
+    group_end = None
+    for apass in passes:
+        if group and apass[0] >= group_end:
+            yield group
+            group = []
+        group_end = apass[1] if not group else max(group_end, apass[1])
+        group.append(apass)
+
+    if group:
+        yield group
+
+
+def iter_station_receptions(platform_names, start_time, end_time, location, chunk_length=timedelta(days=1),
+                            antennas=1, tle_file=None, config=None):
+    """Predict and resolve the receptions at a station chunk by chunk.
+
+    Yield for each time chunk a tuple of (chunk start, chunk end, candidate
+    passes, received passes), with the passes rising in the chunk as
+    returned by :func:`dr_schedule_and_coverage.sat_receptions.resolve_station_receptions`.
+    A chunk is yielded once all conflict groups with passes in it are
+    resolved, so conflicts across chunk boundaries are resolved as for the
+    whole period.
+    """
+    chunks = list(iter_time_chunks(start_time, end_time, chunk_length))
+    chunk_starts = [chunk[0] for chunk in chunks]
+    candidates = [[] for _ in chunks]
+    received = [[] for _ in chunks]
+    next_chunk = 0
+
+    passes = iter_station_passes(platform_names, start_time, end_time, location, chunk_length=chunk_length,
+                                 tle_file=tle_file, config=config)
+    for group in iter_conflict_groups(passes):
+        group_received, _ = resolve_station_receptions(group, antennas=antennas, config=config)
+        for apass in group:
+            candidates[bisect_right(chunk_starts, apass[0]) - 1].append(apass)
+        for apass in group_received:
+            received[bisect_right(chunk_starts, apass[0]) - 1].append(apass)
+
+        # All later passes rise after the start of this group:
+        while next_chunk < len(chunks) and chunks[next_chunk][1] <= group[0][0]:
+            yield chunks[next_chunk] + (candidates[next_chunk], received[next_chunk])
+            candidates[next_chunk] = received[next_chunk] = None
+            next_chunk += 1
+
+    while next_chunk < len(chunks):
+        yield chunks[next_chunk] + (candidates[next_chunk], received[next_chunk])
+        candidates[next_chunk] = received[next_chunk] = None
+        next_chunk += 1
+
+
+def get_chunk_receptions(platform_names, chunk_start, chunk_end, location, antennas=1, tle_file=None,
+                         config=None, margin=timedelta(hours=2)):
+    """Predict and resolve the receptions at a station for one time chunk on its own.
+
+    The passes are predicted from *margin* before until *margin* after the
+    chunk, so the conflict groups at the chunk edges can be resolved as
+    for the whole period, assuming no group is longer than the margin.
+    Return the candidate and received passes rising in the chunk.
+    """
+    if tle_file is None:
+        tle_file = find_actual_tlefile(chunk_start, config)
+    passlist = get_station_passes(platform_names, chunk_start - margin, chunk_end + margin, location,
+                                  tle_file=tle_file, config=config)
+    groups = list(iter_conflict_groups(passlist))
+
+    candidates = []
+    received = []
+    for idx, group in enumerate(groups):
+        in_chunk = [apass for apass in group if chunk_start <= apass[0] < chunk_end]
+        if not in_chunk:
+            continue
+        if idx == 0 or idx == len(groups) - 1:
+            LOG.warning("Conflict group at %s reaches the prediction margin of the chunk", group[0][0])
+        group_received, _ = resolve_station_receptions(group, antennas=antennas, config=config)
+        candidates.extend(in_chunk)
+        received.extend([apass for apass in group_received if chunk_start <= apass[0] < chunk_end])
+
+    return candidates, received
+
+
+def _get_chunk_statistics(platform_names, chunk_start, chunk_end, location, antennas, tle_file, config):
+    """Get the reception statistics of one time chunk resolved on its own."""
+    candidates, received = get_chunk_receptions(platform_names, chunk_start, chunk_end, location,
+                                                antennas=antennas, tle_file=tle_file, config=config)
+    return get_reception_statistics(candidates, received, platform_names, antennas=antennas)
+
+
+def _iter_chunk_statistics(platform_names, start_time, end_time, location, chunk_length, antennas, tle_file,
+                           config, nprocs):
+    """Yield the reception statistics of each time chunk, optionally from a pool of processes."""
+    if nprocs and nprocs > 1:
+        args = [(platform_names, chunk_start, chunk_end, location, antennas, tle_file, config)
+                for chunk_start, chunk_end in iter_time_chunks(start_time, end_time, chunk_length)]
+        with ProcessPoolExecutor(max_workers=nprocs) as executor:
+            yield from executor.map(_get_chunk_statistics, *zip(*args))
+    else:
+        for _, _, candidates, received in iter_station_receptions(platform_names, start_time, end_time, location,
+                                                                  chunk_length=chunk_length, antennas=antennas,
+                                                                  tle_file=tle_file, config=config):
+            yield get_reception_statistics(candidates, received, platform_names, antennas=antennas)
+
+
+def get_period_reception_statistics(platform_names, start_time, end_time, location,
+                                    chunk_length=timedelta(days=1), antennas=1, tle_file=None, config=None,
+                                    nprocs=None):
+    """Get the reception statistics at a station over a long period in bounded memory.
+
+    The statistics of each time chunk are summed as the chunks are
+    resolved. With *nprocs* the chunks are resolved on their own (see
+    :func:`get_chunk_receptions`) in a pool of processes. Return the
+    statistics as :func:`dr_schedule_and_coverage.sat_receptions.get_reception_statistics`.
+    """
+    platform_names = list(platform_names)
+    total = {'platform_names': platform_names,
+             'potential_passes': np.zeros(len(platform_names), dtype=np.int64),
+             'potential_minutes': np.zeros(len(platform_names)),
+             'received_passes': np.zeros((len(platform_names), antennas), dtype=np.int64),
+             'received_minutes': np.zeros((len(platform_names), antennas))}
+
+    for stats in _iter_chunk_statistics(platform_names, start_time, end_time, location, chunk_length, antennas,
+                                        tle_file, config, nprocs):
+        for key in ['potential_passes', 'potential_minutes', 'received_passes', 'received_minutes']:
+            total[key] += stats[key]
+
+    return add_reception_efficiencies(total)
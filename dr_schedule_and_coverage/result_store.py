@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A labelled, chunked store of coverage results on disk.
+
+The relative coverages are kept in a Zarr (format 2) store, read and
+written with xarray, with the dimensions satellites (set of satellites),
+area, date and cycle. The store is filled with NaN when created and written date by date
+as the cells of a sweep complete, so an interrupted sweep can be resumed by
+computing only the dates missing. New dates can be appended, and the store
+can be opened lazily to query parts of it without loading everything.
+
+xarray and zarr are optional dependencies, install with the `store` extra.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+try:
+    import xarray as xr
+    import zarr
+except ImportError:
+    xr = None
+    zarr = None
+
+LOG = logging.getLogger(__name__)
+
+
+class CoverageStore():
+    """Coverage results stored in a Zarr store at *path*.
+
+    The labels of the store are read once, when opened, and the dates are
+    only read again when appended to, so writing and reading single cells
+    does not re-open the whole store.
+    """
+
+    def __init__(self, path):
+        if xr is None:
+            raise ImportError("xarray and zarr are needed for the coverage result store")
+        self.path = path
+        self._satellite_sets = None
+        self._areas = None
+        self._dates = None
+        self._cycles = None
+        self._array = None
+        if os.path.exists(path):
+            self._read_labels()
+
+    @classmethod
+    def create(cls, path, satellite_sets, areas, dates, starthours, date_chunks=1):
+        """Create a new store for the given labels, filled with NaN.
+
+        The *satellite_sets* are set labels (see
+        :func:`dr_schedule_and_coverage.labels.get_satellite_set_label`),
+        the *areas* area ids and the *starthours* the cycle start hours.
+        The data are chunked per satellite set and area, with *date_chunks*
+        dates and all cycles in each chunk.
+        """
+        store = cls(path)
+        store._write_new(satellite_sets, areas, dates, starthours, date_chunks, mode='w-')
+        store._read_labels()
+        return store
+
+    @classmethod
+    def open_or_create(cls, path, satellite_sets, areas, dates, starthours, date_chunks=1):
+        """Open the store at *path*, appending the missing *dates*, or create it if it does not exist.
+
+        The satellite sets, areas and cycles of an existing store must be
+        the same as the ones given.
+        """
+        if not os.path.exists(path):
+            return cls.create(path, satellite_sets, areas, dates, starthours, date_chunks=date_chunks)
+
+        store = cls(path)
+        if (store._satellite_sets != list(satellite_sets) or store._areas != list(areas) or
+                len(store._cycles) != len(starthours) or not np.allclose(store._cycles, starthours)):
+            raise ValueError("Store %s has other satellite sets, areas or cycles" % path)
+        store.append_dates([mydate for mydate in dates if store.get_date_index(mydate) is None])
+        return store
+
+    def _read_labels(self):
+        """Read and keep the labels of the store."""
+        with self.open() as dset:
+            self._satellite_sets = list(dset.satellites.values)
+            self._areas = list(dset.area.values)
+            self._dates = dset.date.values
+            self._cycles = dset.cycle.values
+        self._array = None
+
+    def _get_array(self):
+        """Get the coverage array, opened for writing."""
+        if self._array is None:
+            self._array = zarr.open_array(self.path, path='coverage', mode='r+')
+        return self._array
+
+    def _make_dataset(self, satellite_sets, areas, dates, starthours):
+        """Make a dataset of NaN coverages with the given labels."""
+        shape = (len(satellite_sets), len(areas), len(dates), len(starthours))
+        return xr.Dataset({'coverage': (('satellites', 'area', 'date', 'cycle'), np.full(shape, np.nan))},
+                          coords={'satellites': list(satellite_sets),
+                                  'area': list(areas),
+                                  'date': np.array(dates, dtype='datetime64[ns]'),
+                                  'cycle': np.asarray(starthours, dtype=np.float64)},
+                          attrs={'description': 'Relative coverage of the area in each cycle'})
+
+    def _write_new(self, satellite_sets, areas, dates, starthours, date_chunks, mode):
+        """Write a new store."""
+        dset = self._make_dataset(satellite_sets, areas, dates, starthours)
+        encoding = {'coverage': {'chunks': (1, 1, date_chunks, len(starthours))}}
+        dset.to_zarr(self.path, mode=mode, encoding=encoding, zarr_format=2)
+
+    def append_dates(self, dates):
+        """Append the *dates*, filled with NaN, to the store."""
+        if len(dates) == 0:
+            return
+        LOG.debug("Append %d dates to %s", len(dates), self.path)
+        self._make_dataset(self._satellite_sets, self._areas, dates, self._cycles).to_zarr(self.path,
+                                                                                          append_dim='date')
+        self._read_labels()
+
+    def open(self):
+        """Open the store as a lazily loaded xarray dataset."""
+        return xr.open_zarr(self.path, chunks=None)
+
+    def get_date_index(self, mydate):
+        """Get the index of *mydate* in the store, or None if not there."""
+        indices = np.flatnonzero(self._dates == np.datetime64(mydate, 'ns'))
+        if len(indices) == 0:
+            return None
+        return int(indices[0])
+
+    def _get_indices(self, mydate, satellite_sets, areas):
+        """Get the satellite set, area and date indices of the cells."""
+        date_index = self.get_date_index(mydate)
+        if date_index is None:
+            raise KeyError("Date %s not in store %s" % (mydate, self.path))
+        return ([self._satellite_sets.index(label) for label in satellite_sets],
+                [self._areas.index(area) for area in areas],
+                date_index)
+
+    def get_cycle_index(self, starthour):
+        """Get the index of the cycle starting at *starthour* in the store."""
+        indices = np.flatnonzero(np.isclose(self._cycles, starthour))
+        if len(indices) == 0:
+            raise KeyError("Cycle %s not in store %s" % (starthour, self.path))
+        return int(indices[0])
+
+    def write_cycle(self, mydate, starthour, coverages, satellite_sets, areas):
+        """Write the coverages of one cycle of one date.
+
+        The *coverages* have the shape (number of satellite sets, number of
+        areas), for the *satellite_sets* and *areas* given.
+        """
+        set_indices, area_indices, date_index = self._get_indices(mydate, satellite_sets, areas)
+        cycle_index = self.get_cycle_index(starthour)
+        array = self._get_array()
+        for set_idx, set_index in enumerate(set_indices):
+            for area_idx, area_index in enumerate(area_indices):
+                array[set_index, area_index, date_index, cycle_index] = coverages[set_idx][area_idx]
+
+    def read_cycle(self, mydate, starthour, satellite_sets, areas):
+        """Read the coverages of one cycle of one date, shaped as for :meth:`write_cycle`."""
+        return self.read(mydate, satellite_sets, areas)[:, :, self.get_cycle_index(starthour)]
+
+    def is_cycle_done(self, mydate, starthour, satellite_sets, areas):
+        """Check if all the cells of one cycle of one date are written."""
+        if self.get_date_index(mydate) is None:
+            return False
+        return bool(np.all(np.isfinite(self.read_cycle(mydate, starthour, satellite_sets, areas))))
+
+    def write(self, mydate, coverages, satellite_sets, areas):
+        """Write the coverages of one date.
+
+        The *coverages* have the shape (number of satellite sets, number of
+        areas, number of cycles), for the *satellite_sets* and *areas* given.
+        """
+        set_indices, area_indices, date_index = self._get_indices(mydate, satellite_sets, areas)
+        array = self._get_array()
+        for set_idx, set_index in enumerate(set_indices):
+            for area_idx, area_index in enumerate(area_indices):
+                array[set_index, area_index, date_index, :] = coverages[set_idx, area_idx]
+
+    def read(self, mydate, satellite_sets, areas):
+        """Read the coverages of one date, shaped as for :meth:`write`."""
+        set_indices, area_indices, date_index = self._get_indices(mydate, satellite_sets, areas)
+        return self._get_array().get_orthogonal_selection((set_indices, area_indices, date_index, slice(None)))
+
+    def is_done(self, mydate, satellite_sets, areas):
+        """Check if all the cells of one date are written."""
+        if self.get_date_index(mydate) is None:
+            return False
+        return bool(np.all(np.isfinite(self.read(mydate, satellite_sets, areas))))
+
+    def count_done(self, dates, satellite_sets, areas, starthours=None):
+        """Count the dates, or the cycles of the dates if *starthours* are given, with all cells written.
+
+        A sweep resumed on the store only computes the others, so this is
+        what to take off the total of its progress.
+        """
+        if starthours is None:
+            return sum(self.is_done(mydate, satellite_sets, areas) for mydate in dates)
+        return sum(self.is_cycle_done(mydate, starthour, satellite_sets, areas)
+                   for mydate in dates for starthour in starthours)
+
+    def to_netcdf(self, filename):
+        """Export the whole store to a netCDF file."""
+        with self.open() as dset:
+            dset.to_netcdf(filename)
@@ -25,29 +25,38 @@
 
 
 import os
-from .pmw_data_coverage import get_sats_within_horizon
-from .pmw_data_coverage import NRK, SDK, BLACK_RIDGE
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from .stations import NRK, SDK, BLACK_RIDGE, NO_LIMITS  # noqa
+from .visibility import get_visible_passes
 from .pmw_data_coverage import find_actual_tlefile
+from .config import DEFAULT_RECEPTION_PRIORITIES
+from .instrumentation import timed
 from datetime import datetime, timedelta
 from pyresample import load_area
 import numpy as np
 import csv
 
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
 # EUMETSAT Reception priorities:
-SAT_RECEPTION_PRIOLIST = {'Metop-C': 1,
-                          'Metop-B': 4,
-                          'NOAA-20': 5,
-                          'Suomi-NPP': 2,
-                          'FY-3D': 7,
-                          'NOAA-18': 6,
-                          'NOAA-18': 3}
+SAT_RECEPTION_PRIOLIST = dict(DEFAULT_RECEPTION_PRIORITIES)
 
 
 class ReceptionsConflictResolution():
-    """Take a time sorted reception list and resolve conflicts."""
+    """Take a time sorted reception list and resolve conflicts.
+
+    The reception priorities are taken from the scenario *config* if given,
+    otherwise from SAT_RECEPTION_PRIOLIST.
+    """
 
-    def __init__(self, sorted_passlist):
+    def __init__(self, sorted_passlist, config=None):
         self._raw_sorted = sorted_passlist
+        if config is None:
+            self.priorities = SAT_RECEPTION_PRIOLIST
+        else:
+            self.priorities = config.reception_priorities
 
         self.passlist = self._get_annotated_pass_list()
         self.receptions = []
@@ -63,6 +72,7 @@ class ReceptionsConflictResolution():
 
         return passlist_dict
 
+    @timed('check_for_conflicts')
     def check_for_conflicts(self):
         """Check the passlist for possible conflicts and for each pass add the list of conflicting passes."""
         pass_ids = list(self.passlist.keys())
@@ -92,6 +102,7 @@ class ReceptionsConflictResolution():
 
             self.passlist[pass_id]['conflicts'] = overlapping_passes
 
+    @timed('resolve_conflicts')
     def resolve_conflicts(self):
         """Resolve the conflicts, and store passes for reception in a seperate list."""
         pass_ids = list(self.passlist.keys())
@@ -107,8 +118,8 @@ class ReceptionsConflictResolution():
             rejected = False
             for confl_pass in self.passlist[pass_id]['conflicts']:
                 confl_platform_name = self.passlist[confl_pass]['platform_name']
-                if (SAT_RECEPTION_PRIOLIST.get(platform_name, 999) >
-                        SAT_RECEPTION_PRIOLIST.get(confl_platform_name, 999)):
+                if (self.priorities.get(platform_name, 999) >
+                        self.priorities.get(confl_platform_name, 999)):
                     rejected = True
                     break
 
@@ -117,6 +128,195 @@ class ReceptionsConflictResolution():
             else:
                 self.receptions.append(pass_id)
 
+    @property
+    def platform_names(self):
+        """The platforms of the passlist, in order of first appearance."""
+        return list(dict.fromkeys(apass['platform_name'] for apass in self.passlist.values()))
+
+    def get_conflict_edges(self):
+        """Get the conflict graph as an array of (pass index, conflicting pass index) pairs.
+
+        The pairs are grouped by the first pass index. Call check_for_conflicts first.
+        """
+        pass_index = {pass_id: idx for idx, pass_id in enumerate(self.passlist)}
+        edges = [(pass_index[pass_id], pass_index[confl_pass])
+                 for pass_id, apass in self.passlist.items()
+                 for confl_pass in apass['conflicts']]
+
+        return np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+    @timed('resolve_priority_scenarios')
+    def resolve_priority_scenarios(self, priorities, platform_names=None, nprocs=None):
+        """Resolve the conflicts for a batch of reception priority scenarios at once.
+
+        The *priorities* are either a sequence of mappings (platform name:
+        priority), such as the reception_priorities of scenario configs, or an
+        array of shape (number of scenarios, number of platforms) with the
+        priorities in the order of *platform_names*, which defaults to
+        self.platform_names. Platforms without a priority get 999, as in
+        resolve_conflicts. All scenarios are resolved against the same conflict
+        graph, so check_for_conflicts must be called first. With *nprocs* the
+        scenarios are split over a pool of processes.
+
+        Return the received minutes as an array of shape (number of scenarios,
+        number of platforms).
+        """
+        if platform_names is None:
+            platform_names = self.platform_names
+        platform_names = list(platform_names)
+
+        if len(priorities) > 0 and isinstance(priorities[0], Mapping):
+            priorities = [[prios.get(platform_name, 999) for platform_name in platform_names]
+                          for prios in priorities]
+        priorities = np.asarray(priorities, dtype=np.float64).reshape(-1, len(platform_names))
+
+        # Platforms outside the given list get the lowest priority:
+        platform_codes = {platform_name: idx for idx, platform_name in enumerate(platform_names)}
+        codes = np.array([platform_codes.get(apass['platform_name'], len(platform_names))
+                          for apass in self.passlist.values()], dtype=np.int64)
+        priorities = np.hstack((priorities, np.full((len(priorities), 1), 999.)))
+        minutes = get_pass_minutes([(apass['start'], apass['end']) for apass in self.passlist.values()])
+        edges = self.get_conflict_edges()
+
+        if not nprocs or nprocs == 1 or len(priorities) < 2:
+            received_minutes = get_received_minutes_per_scenario(priorities, codes, minutes, edges)
+        else:
+            chunks = np.array_split(priorities, min(nprocs, len(priorities)))
+            with ProcessPoolExecutor(max_workers=nprocs) as executor:
+                results = executor.map(get_received_minutes_per_scenario, chunks,
+                                       [codes] * len(chunks), [minutes] * len(chunks), [edges] * len(chunks))
+                received_minutes = np.vstack(list(results))
+
+        return received_minutes[:, :len(platform_names)]
+
+
+def resolve_station_receptions(sorted_passlist, antennas=1, config=None):
+    """Resolve the receptions at a station with one or more antennas.
+
+    The first antenna receives the passes left after resolving the conflicts
+    of the time sorted *sorted_passlist*, and each following antenna takes
+    care of the passes rejected by the antennas before it. Return the time
+    sorted received passes as [start, end, platform name, antenna] lists,
+    with the antennas numbered from 0, and the passes not received by any
+    antenna as [start, end, platform name] lists.
+    """
+    received = []
+    remaining = list(sorted_passlist)
+    for antenna in range(antennas):
+        if len(remaining) == 0:
+            break
+        schedule_resolver = ReceptionsConflictResolution(remaining, config=config)
+        schedule_resolver.check_for_conflicts()
+        schedule_resolver.resolve_conflicts()
+
+        for pass_id in schedule_resolver.receptions:
+            apass = schedule_resolver.passlist[pass_id]
+            received.append([apass['start'], apass['end'], apass['platform_name'], antenna])
+
+        remaining = []
+        for pass_id in schedule_resolver.rejections:
+            apass = schedule_resolver.passlist[pass_id]
+            remaining.append([apass['start'], apass['end'], apass['platform_name']])
+
+    received.sort()
+    return received, remaining
+
+
+def get_reception_statistics(candidate_passlist, received_passlist, platform_names=None, antennas=None):
+    """Get the reception statistics of a station for every platform and antenna.
+
+    The *candidate_passlist* holds the possible passes as [start, end,
+    platform name] and the *received_passlist* the received ones as [start,
+    end, platform name, antenna], as returned by
+    :func:`resolve_station_receptions`. The platforms default to those of the
+    candidate passes, in order of first appearance, and the number of
+    antennas to the highest antenna received on. A ValueError is raised if
+    a pass is received on an antenna outside the *antennas* given.
+
+    Return a dict with the platform names and arrays of the number of
+    possible passes and minutes per platform, the number of received passes
+    and minutes per platform and antenna, the pass and minute efficiencies
+    (received over possible, NaN without possible passes) per platform, and
+    the pass efficiency per platform and antenna.
+    """
+    if platform_names is None:
+        platform_names = list(dict.fromkeys(apass[2] for apass in candidate_passlist))
+    platform_names = list(platform_names)
+    if antennas is None:
+        antennas = max((apass[3] for apass in received_passlist), default=0) + 1
+    nplatforms = len(platform_names)
+    platform_codes = {platform_name: idx for idx, platform_name in enumerate(platform_names)}
+
+    def _get_codes_and_minutes(passlist):
+        # Passes of platforms not asked for are put in an extra last bin:
+        codes = np.array([platform_codes.get(apass[2], nplatforms) for apass in passlist], dtype=np.int64)
+        return codes, get_pass_minutes(passlist)
+
+    codes, minutes = _get_codes_and_minutes(candidate_passlist)
+    potential_passes = np.bincount(codes, minlength=nplatforms + 1)[:nplatforms]
+    potential_minutes = np.bincount(codes, weights=minutes, minlength=nplatforms + 1)[:nplatforms]
+
+    codes, minutes = _get_codes_and_minutes(received_passlist)
+    antenna_numbers = np.array([apass[3] for apass in received_passlist], dtype=np.int64)
+    outside = (antenna_numbers < 0) | (antenna_numbers >= antennas)
+    if np.any(outside):
+        raise ValueError("Pass received on antenna %d, outside the %d antennas given" %
+                         (antenna_numbers[outside][0], antennas))
+    cells = codes * antennas + antenna_numbers
+    nbins = (nplatforms + 1) * antennas
+    received_passes = np.bincount(cells, minlength=nbins).reshape(-1, antennas)[:nplatforms]
+    received_minutes = np.bincount(cells, weights=minutes, minlength=nbins).reshape(-1, antennas)[:nplatforms]
+
+    return add_reception_efficiencies({'platform_names': platform_names,
+                                       'potential_passes': potential_passes,
+                                       'potential_minutes': potential_minutes,
+                                       'received_passes': received_passes,
+                                       'received_minutes': received_minutes})
+
+
+def add_reception_efficiencies(stats):
+    """Add the pass and minute efficiencies per platform, and per platform and antenna, to the statistics *stats*."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats['pass_efficiency'] = stats['received_passes'].sum(axis=1) / stats['potential_passes']
+        stats['minute_efficiency'] = stats['received_minutes'].sum(axis=1) / stats['potential_minutes']
+        stats['antenna_pass_efficiency'] = stats['received_passes'] / stats['potential_passes'][:, np.newaxis]
+    return stats
+
+
+def resolve_priority_matrix(ranks, conflict_edges):
+    """Resolve conflicts for several priority scenarios at once.
+
+    *ranks* is an array of shape (number of scenarios, number of passes) with
+    the priority of each pass in each scenario, and *conflict_edges* an array
+    of (pass index, conflicting pass index) pairs grouped by the first index.
+    A pass is rejected if any conflicting pass has a higher priority (lower
+    number). Return a boolean array of received passes, shaped like *ranks*.
+    """
+    received = np.ones(ranks.shape, dtype=bool)
+    if len(conflict_edges) == 0:
+        return received
+
+    passes, conflicting = conflict_edges[:, 0], conflict_edges[:, 1]
+    beaten = ranks[:, passes] > ranks[:, conflicting]
+
+    group_starts = np.flatnonzero(np.r_[True, passes[1:] != passes[:-1]])
+    rejected = np.logical_or.reduceat(beaten, group_starts, axis=1)
+    received[:, passes[group_starts]] = ~rejected
+
+    return received
+
+
+def get_received_minutes_per_scenario(priorities, platform_codes, minutes, conflict_edges):
+    """Get the received minutes per platform for each priority scenario.
+
+    *priorities* has shape (number of scenarios, number of platforms), and
+    *platform_codes* gives the platform (column) of each pass.
+    """
+    received = resolve_priority_matrix(priorities[:, platform_codes], conflict_edges)
+    platform_onehot = platform_codes[:, np.newaxis] == np.arange(priorities.shape[1])
+
+    return (received * minutes) @ platform_onehot
+
 
 def passes_overlap_dict(pass1, pass2):
     """Check if two passes overlap/conflicts.
@@ -162,59 +362,104 @@ def passes_overlap(pass1, pass2):
 
 
 def merge_two_passes(pass1, pass2):
-    """Merge two overlapping passes of the same satellite."""
+    """Merge two overlapping passes of the same satellite.
+
+    The times may be datetimes or epoch microseconds.
+    """
     starttime = min(pass1[0], pass2[0])
     endtime = max(pass1[1], pass2[1])
     return [starttime, endtime, pass1[2]]
 
 
-def merge_passes_one_satellite(allpasses):
-    """Take a passlist of one satellite only and merge overlapping passes."""
-    newlist = []
-    num_of_passes = len(allpasses)
-    idx = 0
-    apass = allpasses[0]
-    while idx < num_of_passes:
-        if idx == num_of_passes - 1:
-            newlist.append(apass)
-            break
+def to_epoch_microseconds(times):
+    """Convert a sequence of datetimes, or a datetime64 array, to an int64 array of microseconds since 1970."""
+    if isinstance(times, np.ndarray) and times.dtype.kind == 'M':
+        return times.astype('datetime64[us]').astype(np.int64)
+    # Faster than letting numpy convert the datetime objects:
+    return np.array([(time - EPOCH) // ONE_MICROSECOND for time in times], dtype=np.int64)
 
-        nextpass = allpasses[idx+1]
-        overlaps = passes_overlap(apass, nextpass)
-        if overlaps:
-            newpass = merge_two_passes(apass, nextpass)
-            newlist.append(newpass)
-            idx = idx+2
-        else:
-            newlist.append(apass)
-            idx = idx+1
 
-        if idx < num_of_passes:
-            apass = allpasses[idx]
+def from_epoch_microseconds(values):
+    """Convert an array of microseconds since 1970 to a list of datetimes."""
+    return np.asarray(values, dtype=np.int64).astype('datetime64[us]').tolist()
+
+
+def get_pass_times(passlist):
+    """Get the start and end times of the passes as int64 arrays of microseconds since 1970."""
+    return (to_epoch_microseconds([apass[0] for apass in passlist]),
+            to_epoch_microseconds([apass[1] for apass in passlist]))
+
+
+def get_pass_minutes(passlist):
+    """Get the duration in minutes of each pass as an array."""
+    starts, ends = get_pass_times(passlist)
+    return (ends - starts) / 60e6
+
+
+def merge_intervals(starts, ends):
+    """Merge overlapping time intervals, given as int64 arrays of microseconds since 1970.
+
+    Intervals just touching each other are not merged, as in the strict
+    comparisons of the earlier pass by pass merging, but identical intervals
+    are merged into one, where the pass by pass merging kept both and counted
+    their time twice. Return the start and end times of the merged
+    intervals, sorted by time.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if len(starts) == 0:
+        return starts, ends
+
+    order = np.lexsort((ends, starts))
+    starts = starts[order]
+    ends = ends[order]
+    latest_end = np.maximum.accumulate(ends)
+    first = np.flatnonzero(np.r_[True, starts[1:] >= latest_end[:-1]])
 
-    if len(newlist) == len(allpasses):
-        return newlist
-    else:
-        return merge_passes_one_satellite(newlist)
+    return starts[first], np.maximum.reduceat(ends, first)
+
+
+def get_total_minutes(starts, ends):
+    """Get the total minutes covered by the time intervals, counting overlaps once."""
+    starts, ends = merge_intervals(starts, ends)
+    return float(np.sum(ends - starts)) / 60e6
+
+
+def merge_passes_one_satellite(allpasses):
+    """Take a passlist of one satellite only and merge overlapping passes.
+
+    Identical passes are merged, touching passes are not, see :func:`merge_intervals`.
+    """
+    if len(allpasses) == 0:
+        return []
+    starts, ends = merge_intervals(*get_pass_times(allpasses))
+    platform_name = allpasses[0][2]
+    return [[start, end, platform_name]
+            for start, end in zip(from_epoch_microseconds(starts), from_epoch_microseconds(ends))]
 
 
 def calculate_total_minutes_received(passlist):
     """Take a list of passes for one satellite and calculate the total minutes received."""
-    passlist = merge_passes_one_satellite(passlist)
-    total_minutes = 0
-    for apass in passlist:
-        minutes_one_pass = (apass[1] - apass[0]).total_seconds()/60.
-        total_minutes = total_minutes + minutes_one_pass
-
-    return total_minutes
+    return get_total_minutes(*get_pass_times(passlist))
 
 
 class CreateReceptionList():
-    """Create  a list of possible satellite receptions at station."""
+    """Create  a list of possible satellite receptions at station.
 
-    def __init__(self, platform_names, time_window, location):
+    The *location* is either a (lon, lat, alt) tuple or the name of a station
+    defined in the scenario *config*. Passes below the *visibility* limits,
+    by default those of the station in the scenario *config*, are left out.
+    """
+
+    def __init__(self, platform_names, time_window, location, config=None, visibility=None):
         self.start = time_window[0]
         self.end = time_window[1]
+        self.config = config
+        if visibility is None:
+            visibility = NO_LIMITS if config is None else config.get_station_visibility(location)
+        self.visibility = visibility
+        if config is not None:
+            location = config.get_station(location)
         self.location = location
         self.platforms = platform_names
         self.center_id = 'SMHI'
@@ -226,13 +471,19 @@ class CreateReceptionList():
         self.receptions = []
         self.rejected = []
 
-    def get_passes(self, tle_file):
-        """Get all passes within horizon and time window."""
+    def get_passes(self, tle_file=None):
+        """Get all passes within horizon and time window.
+
+        If no *tle_file* is given the one closest in time to the start of the
+        time window is searched for in the TLE archives.
+        """
         delta_t = timedelta(seconds=1800)
+        if tle_file is None:
+            tle_file = find_actual_tlefile(self.start, self.config)
         self._tlefile = tle_file
-        self._satpass_list = get_sats_within_horizon(self.platforms, self.start - delta_t,
-                                                     forward=self.nhours, tle_filename=self._tlefile,
-                                                     location=self.location)
+        self._satpass_list = get_visible_passes(self.platforms, self.start - delta_t,
+                                                forward=self.nhours, tle_filename=self._tlefile,
+                                                location=self.location, visibility=self.visibility)
 
         self.sorted_passlist = self._get_sorted_satpasslist()
 
@@ -248,6 +499,7 @@ class CreateReceptionList():
         sorted_passlist.sort()
         return sorted_passlist
 
+    @timed('generate_csv_file')
     def generate_csv_file(self, output_filename):
         """Generate a file with comma separated items."""
         rows = []
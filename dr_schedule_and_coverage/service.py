@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A long running service answering schedule and coverage queries from warm caches.
+
+The service keeps the TLE file lookups, the area definitions, the resolved
+station schedules and the footprint tables of whole days in memory, and
+answers queries over a local HTTP socket (TCP or Unix), so the pytroll
+libraries are imported and the orbits propagated once rather than for each
+analysis. The predictions and rasterizations run in a pool of processes
+(or threads), while the event loop keeps serving the queries answered from
+the caches. Concurrent queries needing the same computation share it.
+
+The queries are GET requests with the parameters in the query string, or
+POST requests with a JSON body, and the answers are JSON::
+
+    GET /schedule?satellites=Metop-B,NOAA-19&station=nrk&start=2020-01-10T00:00&end=2020-01-11T00:00&antennas=2
+    GET /coverage?satellites=Metop-B,NOAA-19&start=2020-01-10T06:00&end=2020-01-10T07:00&area=euron1
+    GET /status
+"""
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from urllib.parse import parse_qsl, urlsplit
+
+from pyresample import load_area
+
+from .config import DEFAULT_CONFIG
+from .footprints import GranuleFootprints, coverage_from_mask
+from .pmw_data_coverage import find_actual_tlefile, get_sats_within_horizon
+from .sat_receptions import CreateReceptionList, resolve_station_receptions
+from .tle_archive import watch_tle_archive
+
+LOG = logging.getLogger(__name__)
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+def get_station_schedule(satnames, station, start_time, end_time, antennas, tle_file, config):
+    """Predict the passes at a station and resolve its receptions.
+
+    Return the candidate and the received passes, as
+    :func:`dr_schedule_and_coverage.sat_receptions.resolve_station_receptions`.
+    """
+    reception_list = CreateReceptionList(list(satnames), (start_time, end_time), station, config=config)
+    reception_list.get_passes(tle_file)
+    received, _ = resolve_station_receptions(reception_list.sorted_passlist, antennas=antennas, config=config)
+    return reception_list.sorted_passlist, received
+
+
+def get_day_footprints(satnames, mydate, area_def, tle_file, instruments, granule_length=timedelta(minutes=1),
+                       margin=timedelta(minutes=30)):
+    """Predict and rasterize the passes of one day, from *margin* before until *margin* after it."""
+    start_time = datetime(mydate.year, mydate.month, mydate.day) - margin
+    nhours = int((timedelta(days=1) + 2 * margin).total_seconds() / 3600. + 1)
+    nextpasses = get_sats_within_horizon(list(satnames), start_time, forward=nhours, tle_filename=tle_file)
+    return GranuleFootprints.from_passes(nextpasses, area_def, tle_file, instruments, granule_length=granule_length)
+
+
+class TaskCache():
+    """A bounded cache of asyncio tasks, dropping the least recently used first.
+
+    The tasks are cached as soon as they are started, so concurrent requests
+    for the same key wait for the same task. Failed tasks are dropped.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._tasks = OrderedDict()
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, key):
+        return key in self._tasks
+
+    def keys(self):
+        """The cached keys, least recently used first."""
+        return list(self._tasks)
+
+    def get(self, key, make_coroutine):
+        """Get the task of *key*, started from *make_coroutine()* if not cached."""
+        if key in self._tasks:
+            self.hits += 1
+            self._tasks.move_to_end(key)
+            return self._tasks[key]
+
+        self.misses += 1
+        task = asyncio.ensure_future(make_coroutine())
+        task.add_done_callback(lambda done: self._drop_failed(key, done))
+        self._tasks[key] = task
+        while len(self._tasks) > self.maxsize:
+            self._tasks.popitem(last=False)
+        return task
+
+    def _drop_failed(self, key, task):
+        """Drop the *task* of *key* if it failed."""
+        if (task.cancelled() or task.exception() is not None) and self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def invalidate(self, predicate=None):
+        """Drop the entries whose key fulfills *predicate*, or all entries. Return the number dropped."""
+        keys = [key for key in self._tasks if predicate is None or predicate(key)]
+        for key in keys:
+            del self._tasks[key]
+        return len(keys)
+
+    def stats(self):
+        """Get the number of entries, hits and misses."""
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses}
+
+
+class ScheduleService():
+    """Schedule and coverage queries for one scenario *config*, answered from warm caches.
+
+    The CPU heavy work runs in a pool of *nprocs* processes, or in threads
+    when *nprocs* is not given. Each cache holds at most *cache_size*
+    entries. With :meth:`watch_tle_archive` the TLE files are looked up in
+    an index of the realtime archive kept current as new files land, and
+    the cached results whose closest TLE file changed are dropped.
+    """
+
+    def __init__(self, config=None, nprocs=None, granule_length=timedelta(minutes=1), cache_size=128):
+        self.config = DEFAULT_CONFIG if config is None else config
+        self.tle_index = None
+        self._watcher = None
+        self.granule_length = granule_length
+        self.executor = None
+        if nprocs and nprocs > 1:
+            # The event loop runs threads, which do not mix well with forking:
+            self.executor = ProcessPoolExecutor(max_workers=nprocs, mp_context=get_context('forkserver'))
+        self.tle_files = TaskCache(cache_size)
+        self.schedules = TaskCache(cache_size)
+        self.footprints = TaskCache(cache_size)
+        self._areas = {}
+        self.routes = {'/schedule': self.handle_schedule,
+                       '/coverage': self.handle_coverage,
+                       '/status': self.handle_status}
+
+    def close(self):
+        """Stop watching the TLE archive and shut down the process pool."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def watch_tle_archive(self, poll_interval=60., use_inotify=True):
+        """Index the realtime TLE archive and watch it for new files. Call from the running event loop."""
+        loop = asyncio.get_running_loop()
+
+        def _on_new_files(new_files):
+            loop.call_soon_threadsafe(self.update_tle_files, new_files)
+
+        self.tle_index, self._watcher = watch_tle_archive(self.config.tle_realtime_archive, _on_new_files,
+                                                          poll_interval=poll_interval, use_inotify=use_inotify)
+        LOG.info("Watching %s, %d TLE files indexed", self.config.tle_realtime_archive, len(self.tle_index))
+
+    def update_tle_files(self, new_files):
+        """Drop the cached results whose closest TLE file changed with the *new_files* in the index."""
+        def _outdated(obstime, tle_file):
+            closest = self.tle_index.find(obstime.replace(minute=0, second=0, microsecond=0))
+            return closest is not None and closest != tle_file
+
+        # Only the hours not found in the realtime archive are left in the TLE file cache:
+        self.tle_files.invalidate()
+        nschedules = self.schedules.invalidate(lambda key: _outdated(key[2], key[5]))
+        nfootprints = self.footprints.invalidate(lambda key: _outdated(datetime(key[2].year, key[2].month,
+                                                                                key[2].day), key[3]))
+        LOG.info("%d new TLE files, dropped %d schedules and %d footprint tables", len(new_files), nschedules,
+                 nfootprints)
+
+    async def _offload(self, func, *args):
+        """Run *func* in the process pool, or in a thread."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def get_area(self, area_id=None):
+        """Get the area definition of *area_id*, by default the area of the scenario."""
+        area_id = area_id or self.config.area_id
+        if area_id not in self._areas:
+            self._areas[area_id] = load_area(self.config.area_def_file, area_id)
+        return self._areas[area_id]
+
+    async def get_tle_file(self, obstime):
+        """Get the TLE file closest to the whole hour of *obstime*."""
+        hour = obstime.replace(minute=0, second=0, microsecond=0)
+        tle_file = None if self.tle_index is None else self.tle_index.find(hour)
+        if tle_file is None:
+            loop = asyncio.get_running_loop()
+            tle_file = await self.tle_files.get(hour, lambda: loop.run_in_executor(None, find_actual_tlefile, hour,
+                                                                                   self.config, self.tle_index))
+        if tle_file is None:
+            raise ValueError("No TLE file found close to %s" % hour)
+        return tle_file
+
+    async def get_station_schedule(self, satnames, station, start_time, end_time, antennas=1):
+        """Get the candidate and received passes at a *station* between *start_time* and *end_time*."""
+        satnames = tuple(satnames)
+        tle_file = await self.get_tle_file(start_time)
+        key = (satnames, station, start_time, end_time, antennas, tle_file)
+        return await self.schedules.get(key, lambda: self._offload(get_station_schedule, satnames, station,
+                                                                   start_time, end_time, antennas, tle_file,
+                                                                   self.config))
+
+    async def get_day_footprints(self, satnames, mydate, area_id=None):
+        """Get the footprint table of the passes of one day over the area."""
+        satnames = tuple(satnames)
+        area_def = self.get_area(area_id)
+        tle_file = await self.get_tle_file(datetime(mydate.year, mydate.month, mydate.day))
+        key = (satnames, area_def.area_id, mydate, tle_file)
+        return await self.footprints.get(key, lambda: self._offload(get_day_footprints, satnames, mydate, area_def,
+                                                                    tle_file, self.config.instruments,
+                                                                    self.granule_length))
+
+    async def get_coverage(self, satnames, start_time, end_time, area_id=None):
+        """Get the relative coverage of the area by the satellites between *start_time* and *end_time*.
+
+        The window may span several days, each with its own footprint table.
+        """
+        if end_time <= start_time:
+            raise ValueError("End time %s is not after start time %s" % (end_time, start_time))
+        days = [start_time.date() + timedelta(days=idx)
+                for idx in range(((end_time - timedelta(microseconds=1)).date() - start_time.date()).days + 1)]
+        tables = await asyncio.gather(*[self.get_day_footprints(satnames, day, area_id) for day in days])
+
+        packed = None
+        for day, footprints in zip(days, tables):
+            midnight = datetime(day.year, day.month, day.day)
+            indices = footprints.select(max(start_time, midnight), min(end_time, midnight + timedelta(days=1)))
+            union = footprints.packed_union(indices)
+            packed = union if packed is None else packed | union
+
+        return coverage_from_mask(tables[0].unpack(packed))
+
+    async def handle_schedule(self, params):
+        """Answer a schedule query."""
+        candidates, received = await self.get_station_schedule(_get_satellites(params), params['station'],
+                                                               _get_time(params, 'start'), _get_time(params, 'end'),
+                                                               int(params.get('antennas', 1)))
+        return {'candidates': [[start.isoformat(), end.isoformat(), platform_name]
+                               for start, end, platform_name in candidates],
+                'received': [[start.isoformat(), end.isoformat(), platform_name, antenna]
+                             for start, end, platform_name, antenna in received]}
+
+    async def handle_coverage(self, params):
+        """Answer a coverage query."""
+        coverage = await self.get_coverage(_get_satellites(params), _get_time(params, 'start'),
+                                           _get_time(params, 'end'), params.get('area'))
+        return {'coverage': coverage}
+
+    async def handle_status(self, params):
+        """Answer a status query with the cache statistics."""
+        return {'scenario': self.config.name,
+                'tle_files': self.tle_files.stats(),
+                'schedules': self.schedules.stats(),
+                'footprints': self.footprints.stats()}
+
+    async def handle_query(self, path, params):
+        """Answer a query to *path* with the *params*. Return the HTTP status and the answer."""
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404, {'error': 'Unknown query %s' % path}
+        try:
+            return 200, await handler(params)
+        except (KeyError, ValueError, TypeError) as err:
+            return 400, {'error': 'Bad query: %s' % err}
+        except Exception as err:
+            LOG.exception("Failed to answer %s %s", path, params)
+            return 500, {'error': str(err)}
+
+    async def handle_connection(self, reader, writer):
+        """Read one HTTP request from the connection and write the answer."""
+        try:
+            try:
+                method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, value = line.decode('latin-1').split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                url = urlsplit(target)
+                params = dict(parse_qsl(url.query))
+                length = int(headers.get('content-length', 0))
+                if method == 'POST' and length > 0:
+                    params.update(json.loads(await reader.readexactly(length)))
+                status, answer = await self.handle_query(url.path, params)
+            except ValueError as err:
+                status, answer = 400, {'error': 'Bad request: %s' % err}
+
+            body = json.dumps(answer).encode()
+            writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n'
+                          'Connection: close\r\n\r\n' % (status, HTTP_REASONS[status], len(body))).encode() + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError) as err:
+            LOG.warning("Connection lost before answering: %s", err)
+        except Exception:
+            LOG.exception("Failed to handle a connection")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start_server(self, host='127.0.0.1', port=8765, socket_path=None):
+        """Start serving on *host* and *port*, or on the Unix socket *socket_path*."""
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+        LOG.info("Serving scenario %s on %s", self.config.name,
+                 socket_path or ', '.join(str(sock.getsockname()) for sock in server.sockets))
+        return server
+
+
+def _get_satellites(params):
+    """Get the satellite names of a query, a list or a comma separated string."""
+    satnames = params['satellites']
+    if isinstance(satnames, str):
+        satnames = satnames.split(',')
+    return [satname.strip() for satname in satnames]
+
+
+def _get_time(params, key):
+    """Get a time of a query from its ISO string."""
+    return datetime.fromisoformat(params[key])
+
+
+def serve(config=None, host='127.0.0.1', port=8765, socket_path=None, nprocs=None, cache_size=128,
+          watch_tle=True, poll_interval=60.):
+    """Run the service until interrupted, with *watch_tle* keeping up with the new TLE files."""
+    service = ScheduleService(config, nprocs=nprocs, cache_size=cache_size)
+
+    async def _serve():
+        if watch_tle:
+            service.watch_tle_archive(poll_interval=poll_interval)
+        server = await service.start_server(host=host, port=port, socket_path=socket_path)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        LOG.info("Service stopped")
+    finally:
+        service.close()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Granule and footprint tables in shared memory for pools of worker processes.
+
+The tables are flat numpy arrays placed in
+:mod:`multiprocessing.shared_memory` blocks. Workers get a small handle with
+the block names, shapes and dtypes, and attach to the arrays without
+copying, instead of receiving pickled lists of datetimes, passes or masks.
+
+Two uses are provided: rasterizing the granules of the passes in parallel,
+each worker writing its bit-packed masks straight into a shared output
+array, and evaluating the coverage of many satellite subsets from one
+shared footprint table. Shared memory is local to one machine, so these
+use pools of processes rather than the cluster executors.
+"""
+
+from contextlib import contextmanager
+from datetime import timedelta
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .executors import map_tasks
+from .footprints import GranuleFootprints, get_granule_times, rasterize_pass
+from .pmw_data_coverage import create_pass
+
+
+class SharedArrays():
+    """Copies of numpy *arrays* (a dict of name and array) in shared memory blocks.
+
+    The copies are in *arrays*, and *handle* is a small picklable
+    description for attaching to them from other processes with
+    :func:`attached_arrays`. The blocks are freed by :meth:`unlink`, or when
+    leaving the context.
+    """
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.arrays = {}
+        self.handle = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._blocks.append(block)
+            self.arrays[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            self.arrays[name][...] = array
+            self.handle[name] = (block.name, array.shape, array.dtype.str)
+
+    def unlink(self):
+        """Free the shared memory blocks."""
+        self.arrays = {}
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unlink()
+
+
+@contextmanager
+def attached_arrays(handle):
+    """Attach to shared arrays from their *handle*, yielding a dict of name and array.
+
+    The arrays are views of the shared memory, not copies, and must not be
+    used after leaving the context.
+    """
+    blocks = []
+    arrays = {}
+    try:
+        for name, (block_name, shape, dtype) in handle.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        yield arrays
+    finally:
+        arrays.clear()
+        for block in blocks:
+            block.close()
+
+
+def get_granule_table(allpasses, granule_length=timedelta(minutes=1)):
+    """Get the granules of the passes as a flat table.
+
+    Return the satellite names and a dict of arrays of the satellite index,
+    and the start and end times in microseconds since 1970, of each granule.
+    """
+    satnames = list(allpasses)
+    sat_index, starts, ends = [], [], []
+    for idx, satname in enumerate(satnames):
+        for rtime, ftime, _ in allpasses[satname]:
+            for start, end in get_granule_times(rtime, ftime, granule_length):
+                sat_index.append(idx)
+                starts.append(start)
+                ends.append(end)
+
+    return satnames, {'sat_index': np.array(sat_index, dtype=np.int32),
+                      'starts': np.array(starts, dtype='datetime64[us]').view(np.int64),
+                      'ends': np.array(ends, dtype='datetime64[us]').view(np.int64)}
+
+
+def _rasterize_granules(table_handle, output_handle, indices, satnames, instruments, tle_filename, area_def):
+    """Rasterize the granules *indices* of the shared granule table into the shared output masks."""
+    with attached_arrays(table_handle) as table, attached_arrays(output_handle) as output:
+        for idx in indices:
+            satname = satnames[table['sat_index'][idx]]
+            start = table['starts'][idx].astype('datetime64[us]').item()
+            end = table['ends'][idx].astype('datetime64[us]').item()
+            apass = create_pass(satname, instruments.get(satname, 'mhs'), start, end, tle_filename)
+            output['masks'][idx] = np.packbits(rasterize_pass(apass, area_def), axis=-1)
+
+    return len(indices)
+
+
+def rasterize_granules_shared(allpasses, area_def, tle_filename, instruments, granule_length=timedelta(minutes=1),
+                              nprocs=None):
+    """Cut the passes in granules and rasterize them in a pool of *nprocs* processes.
+
+    The granule table and the output masks are in shared memory, so each
+    worker only gets a range of granule indices and writes its masks in
+    place. Return the same as
+    :meth:`dr_schedule_and_coverage.footprints.GranuleFootprints.from_passes`.
+    """
+    satnames, table = get_granule_table(allpasses, granule_length)
+    ngranules = len(table['sat_index'])
+    packed_shape = (area_def.shape[0], (area_def.shape[1] + 7) // 8)
+
+    with SharedArrays(table) as shared_table, \
+            SharedArrays({'masks': np.zeros((ngranules, ) + packed_shape, dtype=np.uint8)}) as shared_output:
+        chunks = np.array_split(np.arange(ngranules), max(nprocs or 1, 1))
+        args = [(shared_table.handle, shared_output.handle, chunk, satnames, instruments, tle_filename, area_def)
+                for chunk in chunks if len(chunk) > 0]
+        for _ in map_tasks(_rasterize_granules, args, nprocs=nprocs):
+            pass
+
+        masks = shared_output.arrays['masks']
+        keep = masks.any(axis=(1, 2))
+        return GranuleFootprints(satnames, table['sat_index'][keep],
+                                 table['starts'][keep].view('datetime64[us]'),
+                                 table['ends'][keep].view('datetime64[us]'),
+                                 masks[keep], area_def.shape)
+
+
+def share_footprints(footprints):
+    """Put the arrays of the *footprints* in shared memory.
+
+    Return the :class:`SharedArrays` and a small handle for
+    :func:`attached_footprints`.
+    """
+    shared = SharedArrays({'sat_index': footprints.sat_index,
+                           'starts': footprints.starts.view(np.int64),
+                           'ends': footprints.ends.view(np.int64),
+                           'packed_masks': footprints.packed_masks})
+    handle = {'arrays': shared.handle, 'satnames': footprints.satnames, 'shape': footprints.shape}
+    return shared, handle
+
+
+@contextmanager
+def attached_footprints(handle):
+    """Attach to footprints in shared memory, yielding a GranuleFootprints without copying the masks."""
+    with attached_arrays(handle['arrays']) as arrays:
+        footprints = GranuleFootprints(handle['satnames'], arrays['sat_index'],
+                                       arrays['starts'].view('datetime64[us]'),
+                                       arrays['ends'].view('datetime64[us]'),
+                                       arrays['packed_masks'], handle['shape'])
+        try:
+            yield footprints
+        finally:
+            footprints.sat_index = footprints.starts = footprints.ends = footprints.packed_masks = None
+
+
+def _subset_window_coverages(handle, subsets, windows):
+    """Get the coverage of each subset in each window from shared footprints."""
+    with attached_footprints(handle) as footprints:
+        return np.array([[footprints.coverage(start_time, end_time, satnames) for start_time, end_time in windows]
+                         for satnames in subsets])
+
+
+def subset_coverages_shared(footprints, subsets, windows, nprocs=None):
+    """Get the coverage of many satellite subsets in each window, sharing the footprints with the workers.
+
+    The subsets are split over a pool of *nprocs* processes, all attached to
+    one copy of the *footprints* in shared memory. Return an array of shape
+    (number of subsets, number of windows).
+    """
+    subsets = [list(subset) for subset in subsets]
+    shared, handle = share_footprints(footprints)
+    with shared:
+        chunks = [list(chunk) for chunk in np.array_split(np.arange(len(subsets)), max(nprocs or 1, 1))
+                  if len(chunk) > 0]
+        args = [(handle, [subsets[idx] for idx in chunk], windows) for chunk in chunks]
+        return np.vstack(list(map_tasks(_subset_window_coverages, args, nprocs=nprocs)))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Incremental area coverage in a time window sliding over consecutive assimilation cycles.
+
+The passes are cut in short granules on a fixed time grid, and the
+footprint of each granule is rasterized once. A per-pixel observation
+count over the area grid is kept for the current window: when the window
+moves, the granules entering it are added and those leaving it are
+subtracted, so each cycle only costs the granules that changed.
+
+A granule belongs to a window if its mid time is inside the window. With
+window start and end times on the granule grid (e.g. whole minutes for the
+default one minute granules) this gives the same passes as clipping them
+to the window.
+"""
+
+import logging
+from bisect import bisect_left
+from datetime import timedelta
+
+import numpy as np
+from pyresample import load_area
+
+from .footprints import pass_footprint, get_granule_times, coverage_from_mask
+from .pmw_data_coverage import predict_passes_for_time_span, get_cycle_windows
+from .pmw_data_coverage import AREA_DEF_FILE, AREAID, INSTRUMENTS
+from .instrumentation import count
+
+LOG = logging.getLogger(__name__)
+
+
+class SlidingWindowCoverage():
+    """Coverage of an area in a time window moving forward over the candidate passes.
+
+    The *footprint_func* is called as footprint_func(satname, instrument,
+    start, end) and returns the footprint mask of a granule. It defaults to
+    rasterizing trollsched passes made from the *tle_filename*.
+    """
+
+    def __init__(self, area_def, granule_length=timedelta(minutes=1), tle_filename=None,
+                 footprint_func=None):
+        self.area_def = area_def
+        self.granule_length = granule_length
+        if footprint_func is None:
+            def footprint_func(satname, instrument, start, end):
+                return pass_footprint(satname, instrument, start, end, tle_filename, area_def)
+        self.footprint_func = footprint_func
+
+        self.counts = np.zeros(area_def.shape, dtype=np.int32)
+        self._granules = []
+        self._mids = []
+        self._masks = {}
+        self._in_window = set()
+        self._window = None
+
+    def add_passes(self, allpasses, instruments=INSTRUMENTS):
+        """Add candidate passes, a dict of satellite name and list of (risetime, falltime, uptime)."""
+        for satname in allpasses:
+            instrument = instruments.get(satname, 'mhs')
+            for rtime, ftime, _ in allpasses[satname]:
+                for start, end in get_granule_times(rtime, ftime, self.granule_length):
+                    self._granules.append((start + (end - start) / 2, satname, instrument, start, end))
+
+        self._granules.sort()
+        self._mids = [granule[0] for granule in self._granules]
+
+    def _get_mask(self, idx):
+        """Get the footprint of granule *idx*, rasterizing it the first time."""
+        if idx not in self._masks:
+            _, satname, instrument, start, end = self._granules[idx]
+            self._masks[idx] = self.footprint_func(satname, instrument, start, end)
+            count('granules_rasterized')
+        return self._masks[idx]
+
+    def move_to(self, start_time, end_time):
+        """Move the window to [*start_time*, *end_time*] and return the coverage of the area."""
+        first = bisect_left(self._mids, start_time)
+        last = bisect_left(self._mids, end_time)
+        in_window = set(range(first, last))
+
+        for idx in in_window - self._in_window:
+            self.counts += self._get_mask(idx)
+        for idx in self._in_window - in_window:
+            self.counts -= self._masks[idx]
+        count('granules_updated', len(in_window ^ self._in_window))
+
+        # Granules behind the window are not needed anymore when moving forward:
+        for idx in [idx for idx in self._masks if idx < first]:
+            del self._masks[idx]
+
+        self._in_window = in_window
+        self._window = (start_time, end_time)
+
+        return self.coverage
+
+    @property
+    def coverage(self):
+        """The relative coverage of the area in the current window."""
+        return coverage_from_mask(self.counts)
+
+    def get_observation_count(self):
+        """Get the number of granules observing each pixel in the current window."""
+        return self.counts.copy()
+
+
+def derive_coverage_consecutive_cycles(satnames, starthours, length_minutes, dates, config=None,
+                                       granule_length=timedelta(minutes=1), progress=None):
+    """Derive the coverage for consecutive cycles of each date, sliding the window over the day.
+
+    The passes for each date are predicted once for all the cycles starting
+    at *starthours* (hours after midnight, ascending) and lasting
+    *length_minutes*. Return an array of relative coverages of shape
+    (number of dates, number of cycles).
+    """
+    if config is None:
+        areadef = load_area(AREA_DEF_FILE, AREAID)
+        instruments = INSTRUMENTS
+    else:
+        areadef = load_area(config.area_def_file, config.area_id)
+        instruments = config.instruments
+
+    starthours = sorted(starthours)
+    coverages = np.zeros((len(dates), len(starthours)))
+    for date_idx, mydate in enumerate(dates):
+        windows = get_cycle_windows(mydate, starthours, length_minutes)
+        nextpasses, tle_file = predict_passes_for_time_span(satnames, windows[0][0], windows[-1][1], config)
+
+        sliding = SlidingWindowCoverage(areadef, granule_length=granule_length, tle_filename=tle_file)
+        sliding.add_passes(nextpasses, instruments)
+        for cycle_idx, (start_time, end_time) in enumerate(windows):
+            coverages[date_idx, cycle_idx] = sliding.move_to(start_time, end_time)
+            LOG.debug("Area coverage %s - %s = %f", start_time, end_time, coverages[date_idx, cycle_idx])
+            if progress is not None:
+                progress(date=mydate, starthour=starthours[cycle_idx], coverage=coverages[date_idx, cycle_idx])
+
+    return coverages
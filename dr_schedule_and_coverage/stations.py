@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Direct readout station locations and visibility settings.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+# Location = Longitude (deg), Latitude (deg), Altitude (km)
+NRK = (16.148649, 58.581844, 0.052765)
+SDK = (26.632, 67.368, 0.18)
+BLACK_RIDGE = (-50.62074, 66.99571, 0.4)
+
+STATIONS = {'nrk': NRK,
+            'sdk': SDK,
+            'black_ridge': BLACK_RIDGE}
+
+
+@dataclass(frozen=True)
+class StationVisibility:
+    """Settings for which passes over a station are worth receiving.
+
+    Passes with a maximum elevation below *min_elevation* (degrees), or
+    staying above it for less than *min_duration* (minutes), are dropped.
+    The *horizon_mask* holds (azimuth, elevation) pairs in degrees of the
+    terrain horizon around the station, linearly interpolated in between,
+    and the passes are trimmed to the time above both the horizon mask and
+    the minimum elevation.
+    """
+
+    min_elevation: float = 0.
+    min_duration: float = 0.
+    horizon_mask: tuple = ()
+
+    def __post_init__(self):
+        object.__setattr__(self, 'horizon_mask', tuple((float(azimuth), float(elevation))
+                                                       for azimuth, elevation in self.horizon_mask))
+
+    @property
+    def is_limited(self):
+        """Check if any pass may be trimmed or dropped."""
+        return self.min_elevation > 0 or self.min_duration > 0 or len(self.horizon_mask) > 0
+
+    def get_min_elevations(self, azimuths):
+        """Get the lowest usable elevation in degrees towards each of the *azimuths* (degrees)."""
+        if len(self.horizon_mask) == 0:
+            return np.full(np.shape(azimuths), self.min_elevation)
+        mask_azimuths, mask_elevations = np.array(self.horizon_mask).T
+        horizon = np.interp(np.mod(azimuths, 360.), mask_azimuths, mask_elevations, period=360.)
+        return np.maximum(horizon, self.min_elevation)
+
+
+NO_LIMITS = StationVisibility()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Coverage sweeps over dates and cycles sharing one set of predictions and footprints.
+
+For each date the passes of all the satellites involved are predicted once,
+cut in granules and rasterized over the area (see
+:class:`dr_schedule_and_coverage.footprints.GranuleFootprints`). The
+coverage of every requested combination is then found by selecting
+footprints. Several areas share the same pass boundaries, each only costing
+its own rasterization. Dates are independent and can be run in a pool of
+processes, or as tasks on any executor, e.g. a cluster (see
+:mod:`dr_schedule_and_coverage.executors`).
+"""
+
+import csv
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+from pyresample import load_area
+
+from .footprints import GranuleFootprints, build_granule_footprints, coverage_from_mask
+from .pmw_data_coverage import predict_passes_for_time_span, get_cycle_windows
+from .pmw_data_coverage import AREA_DEF_FILE, AREAID, INSTRUMENTS
+from .labels import get_satellite_set_label
+from .executors import map_tasks
+
+LOG = logging.getLogger(__name__)
+
+
+def _get_area_and_instruments(config):
+    """Get the area definition and instruments from the *config*, or the module defaults."""
+    if config is None:
+        return load_area(AREA_DEF_FILE, AREAID), INSTRUMENTS
+    return load_area(config.area_def_file, config.area_id), config.instruments
+
+
+def _get_areas_and_instruments(areaids, config):
+    """Get the area definitions of *areaids* and the instruments from the *config*, or the module defaults."""
+    if config is None:
+        return [load_area(AREA_DEF_FILE, areaid) for areaid in areaids], INSTRUMENTS
+    return [load_area(config.area_def_file, areaid) for areaid in areaids], config.instruments
+
+
+def _run_over_dates(func, args, dates, result_shape, nprocs=None, progress=None, store=None,
+                    satellite_sets=None, areas=None, executor=None):
+    """Run *func* for the *args* of each date, optionally in a pool of processes or on an *executor*.
+
+    The result of each date is stored along the second axis of an array of
+    shape *result_shape*. With a *store* (see
+    :class:`dr_schedule_and_coverage.result_store.CoverageStore`) the result
+    of each date is also written to it, labelled with the *satellite_sets*
+    and *areas*, as soon as it is done, and dates already in the store are
+    read instead of computed.
+    """
+    results = np.zeros(result_shape)
+    todo = list(range(len(dates)))
+    if store is not None:
+        todo = []
+        for date_idx, mydate in enumerate(dates):
+            if store.is_done(mydate, satellite_sets, areas):
+                results[:, date_idx, :] = store.read(mydate, satellite_sets, areas).reshape(result_shape[0], -1)
+            else:
+                todo.append(date_idx)
+        LOG.info("%d of %d dates already in the store", len(dates) - len(todo), len(dates))
+
+    for date_idx, result in zip(todo, map_tasks(func, [args[idx] for idx in todo], executor=executor, nprocs=nprocs)):
+        results[:, date_idx, :] = result
+        if store is not None:
+            store.write(dates[date_idx], result.reshape(len(satellite_sets), len(areas), -1),
+                        satellite_sets, areas)
+        if progress is not None:
+            progress(date=dates[date_idx])
+
+    return results
+
+
+def get_union_of_satellites(subsets):
+    """Get the satellites of all *subsets*, in order of first appearance."""
+    return list(dict.fromkeys(satname for subset in subsets for satname in subset))
+
+
+def subset_coverages_one_date(subsets, mydate, starthours, length_minutes, config=None,
+                              granule_length=timedelta(minutes=1)):
+    """Get the coverage of each satellite subset in each cycle of one date.
+
+    Return an array of shape (number of subsets, number of cycles).
+    """
+    areadef, instruments = _get_area_and_instruments(config)
+    satnames = get_union_of_satellites(subsets)
+    windows = get_cycle_windows(mydate, starthours, length_minutes)
+
+    nextpasses, tle_file = predict_passes_for_time_span(satnames, windows[0][0], windows[-1][1], config)
+    footprints = GranuleFootprints.from_passes(nextpasses, areadef, tle_file, instruments,
+                                               granule_length=granule_length)
+    subset_indices = [[footprints.satnames.index(satname) for satname in subset] for subset in subsets]
+
+    coverages = np.zeros((len(subsets), len(windows)))
+    for cycle_idx, (start_time, end_time) in enumerate(windows):
+        sat_unions = footprints.satellite_unions(start_time, end_time)
+        for subset_idx, indices in enumerate(subset_indices):
+            packed = np.bitwise_or.reduce(sat_unions[indices], axis=0)
+            coverages[subset_idx, cycle_idx] = coverage_from_mask(footprints.unpack(packed))
+
+    return coverages
+
+
+def derive_constellation_subset_coverage(subsets, dates, starthours, length_minutes, config=None,
+                                         granule_length=timedelta(minutes=1), nprocs=None, progress=None,
+                                         store=None, executor=None):
+    """Derive the coverage of several satellite constellations over dates and cycles.
+
+    Predictions and footprints are made once per date for the union of all
+    satellites in *subsets* (a list of lists of satellite names), and each
+    subset is evaluated by selecting its footprints. With *nprocs* the dates
+    are spread over a pool of processes, or with an *executor* submitted to
+    it as one task per date. If given, *progress* is called once
+    per finished date. With a *store* the results are written to it date by
+    date, labelled with the subsets and the area of the *config*, and dates
+    already in it are not computed again.
+
+    Return an array of relative coverages of shape (number of subsets,
+    number of dates, number of cycles).
+    """
+    subsets = [list(subset) for subset in subsets]
+    args = [(subsets, mydate, starthours, length_minutes, config, granule_length) for mydate in dates]
+    return _run_over_dates(subset_coverages_one_date, args, dates, (len(subsets), len(dates), len(starthours)),
+                           nprocs=nprocs, progress=progress, store=store,
+                           satellite_sets=[get_satellite_set_label(subset) for subset in subsets],
+                           areas=[AREAID if config is None else config.area_id], executor=executor)
+
+
+def scenario_coverages_one_date(satnames, mydate, starthours, length_minutes, config,
+                                granule_length=timedelta(minutes=1)):
+    """Get the coverage of each cycle of one date for one scenario *config*."""
+    return subset_coverages_one_date([satnames], mydate, starthours, length_minutes, config=config,
+                                     granule_length=granule_length)[0]
+
+
+def derive_scenario_coverage(satnames, configs, dates, starthours, length_minutes,
+                             granule_length=timedelta(minutes=1), nprocs=None, progress=None, executor=None,
+                             stores=None):
+    """Derive the coverage of the satellites over dates and cycles for several scenarios.
+
+    Each (scenario, date) pair is one task, shipping only the satellite
+    names, the date, the cycle start hours and the scenario config, and
+    returning the coverage of each cycle, so the tasks can run on the
+    *executor* of a cluster. The cycles of a date share the predictions and
+    footprints of the task. With *nprocs* the tasks run in a pool of
+    processes. If given, *progress* is called once per finished task, in
+    order. With *stores*, one
+    :class:`dr_schedule_and_coverage.result_store.CoverageStore` (or None)
+    per scenario, the results of each task are written to the store of its
+    scenario as soon as it is done, labelled with the satellites and the
+    area of the scenario, and the dates already in a store are not computed
+    again.
+
+    Return an array of relative coverages of shape (number of scenarios,
+    number of dates, number of cycles), in the order of the *configs* and
+    *dates* whatever order the tasks finish in.
+    """
+    satnames = list(satnames)
+    starthours = list(starthours)
+    if stores is None:
+        stores = [None] * len(configs)
+    satellite_sets = [get_satellite_set_label(satnames)]
+
+    coverages = np.zeros((len(configs), len(dates), len(starthours)))
+    tasks = []
+    for config_idx, (config, store) in enumerate(zip(configs, stores)):
+        for date_idx, mydate in enumerate(dates):
+            if store is not None and store.is_done(mydate, satellite_sets, [config.area_id]):
+                coverages[config_idx, date_idx] = store.read(mydate, satellite_sets, [config.area_id])[0, 0]
+            else:
+                tasks.append((config_idx, date_idx))
+    args = [(satnames, dates[date_idx], starthours, length_minutes, configs[config_idx], granule_length)
+            for config_idx, date_idx in tasks]
+
+    results = map_tasks(scenario_coverages_one_date, args, executor=executor, nprocs=nprocs)
+    for (config_idx, date_idx), result in zip(tasks, results):
+        coverages[config_idx, date_idx] = result
+        if stores[config_idx] is not None:
+            stores[config_idx].write(dates[date_idx], result.reshape(1, 1, -1), satellite_sets,
+                                     [configs[config_idx].area_id])
+        if progress is not None:
+            progress(scenario=configs[config_idx].name, date=dates[date_idx])
+
+    return coverages
+
+
+def area_coverages_one_date(satnames, areaids, mydate, starthours, length_minutes, config=None,
+                            granule_length=timedelta(minutes=1)):
+    """Get the coverage of each area in each cycle of one date from the same passes.
+
+    Return an array of shape (number of areas, number of cycles).
+    """
+    areadefs, instruments = _get_areas_and_instruments(areaids, config)
+    windows = get_cycle_windows(mydate, starthours, length_minutes)
+
+    nextpasses, tle_file = predict_passes_for_time_span(satnames, windows[0][0], windows[-1][1], config)
+    area_footprints = build_granule_footprints(nextpasses, areadefs, tle_file, instruments,
+                                               granule_length=granule_length)
+
+    coverages = np.zeros((len(areaids), len(windows)))
+    for area_idx, footprints in enumerate(area_footprints):
+        for cycle_idx, (start_time, end_time) in enumerate(windows):
+            coverages[area_idx, cycle_idx] = footprints.coverage(start_time, end_time)
+
+    return coverages
+
+
+def derive_multi_area_coverage(satnames, areaids, dates, starthours, length_minutes, config=None,
+                               granule_length=timedelta(minutes=1), nprocs=None, progress=None, store=None,
+                               executor=None):
+    """Derive the coverage of several areas over dates and cycles in one sweep.
+
+    The passes are predicted and their granule boundaries made once per
+    date, and rasterized onto each of the areas *areaids* (read from the area
+    definition file of the *config*). With *nprocs* the dates are spread
+    over a pool of processes, or with an *executor* submitted to it as one
+    task per date. If given, *progress* is called once per
+    finished date. With a *store* the results are written to it date by
+    date, and dates already in it are not computed again.
+
+    Return an array of relative coverages of shape (number of areas, number
+    of dates, number of cycles).
+    """
+    areaids = list(areaids)
+    args = [(satnames, areaids, mydate, starthours, length_minutes, config, granule_length) for mydate in dates]
+    return _run_over_dates(area_coverages_one_date, args, dates, (len(areaids), len(dates), len(starthours)),
+                           nprocs=nprocs, progress=progress, store=store,
+                           satellite_sets=[get_satellite_set_label(satnames)], areas=areaids, executor=executor)
+
+
+@dataclass(frozen=True)
+class CycleSetting():
+    """Timing of the assimilation cycles.
+
+    Cycles are *cycle_distance* hours apart, with a time window of
+    *time_window_size* minutes centred on the analysis time. Observations
+    are used up to *cutoff* minutes before the end of the window and arrive
+    with a *latency* in minutes.
+    """
+
+    cycle_distance: float = 1.0
+    time_window_size: int = 60
+    cutoff: int = 0
+    latency: int = 0
+
+    @property
+    def length_minutes(self):
+        """The minutes of the time window with usable observations."""
+        return self.time_window_size - self.cutoff - self.latency
+
+    @property
+    def starthours(self):
+        """The start of each time window of the day, in hours after midnight."""
+        return np.arange(-self.time_window_size/60*0.5, 24-self.cycle_distance/2, self.cycle_distance)
+
+    @property
+    def description(self):
+        """A short description, used in filenames."""
+        return "{latency}min_{timewindow}min_{cutoff}min".format(latency=self.latency,
+                                                                 timewindow=self.time_window_size,
+                                                                 cutoff=self.cutoff)
+
+
+def _get_cycle_row(setting, mydate, starthour, start_time, end_time, coverage):
+    """Get the result row of one cycle of a cycle *setting*."""
+    return {'cycle_distance': setting.cycle_distance,
+            'time_window_size': setting.time_window_size,
+            'cutoff': setting.cutoff,
+            'latency': setting.latency,
+            'date': mydate,
+            'starthour': float(starthour),
+            'start_time': start_time,
+            'end_time': end_time,
+            'coverage': coverage}
+
+
+def cycle_setting_coverages_one_date(satnames, settings, mydate, config=None,
+                                     granule_length=timedelta(minutes=1)):
+    """Get the coverage of every cycle of each of the cycle *settings* for one date.
+
+    The passes are predicted and rasterized once for the time span enclosing
+    the windows of all settings. Return a list of result rows (dicts).
+    """
+    areadef, instruments = _get_area_and_instruments(config)
+    setting_windows = [get_cycle_windows(mydate, setting.starthours, setting.length_minutes)
+                       for setting in settings]
+    span_start = min(windows[0][0] for windows in setting_windows)
+    span_end = max(windows[-1][1] for windows in setting_windows)
+
+    nextpasses, tle_file = predict_passes_for_time_span(satnames, span_start, span_end, config)
+    footprints = GranuleFootprints.from_passes(nextpasses, areadef, tle_file, instruments,
+                                               granule_length=granule_length)
+
+    rows = []
+    for setting, windows in zip(settings, setting_windows):
+        for starthour, (start_time, end_time) in zip(setting.starthours, windows):
+            rows.append(_get_cycle_row(setting, mydate, starthour, start_time, end_time,
+                                       footprints.coverage(start_time, end_time)))
+
+    return rows
+
+
+def derive_cycle_setting_coverage(satnames, settings, dates, config=None, granule_length=timedelta(minutes=1),
+                                  nprocs=None, progress=None, executor=None, stores=None):
+    """Derive the coverage over dates for each of several cycle settings sharing one set of predictions.
+
+    For each date the passes are predicted and rasterized once, and every
+    :class:`CycleSetting` in *settings* is evaluated by selecting the
+    footprints in its time windows. With *nprocs* the dates are spread over
+    a pool of processes, or with an *executor* submitted to it as one task
+    per date. If given, *progress* is called once per finished date. With
+    *stores*, one :class:`dr_schedule_and_coverage.result_store.CoverageStore`
+    per setting holding the cycles of the setting, the coverages are written
+    to them as soon as a date is done, and the dates already in all of them
+    are read instead of computed.
+
+    Return a tidy table, a list of dicts with the setting, date, cycle start
+    hour, window and coverage of each cycle.
+    """
+    settings = list(settings)
+    satellite_sets = [get_satellite_set_label(satnames)]
+    areas = [AREAID if config is None else config.area_id]
+
+    date_rows = {}
+    todo = list(dates)
+    if stores is not None:
+        todo = []
+        for mydate in dates:
+            if all(store.is_done(mydate, satellite_sets, areas) for store in stores):
+                date_rows[mydate] = _read_cycle_setting_rows(settings, stores, mydate, satellite_sets, areas)
+            else:
+                todo.append(mydate)
+        LOG.info("%d of %d dates already in the stores", len(dates) - len(todo), len(dates))
+
+    args = [(satnames, settings, mydate, config, granule_length) for mydate in todo]
+    for mydate, rows in zip(todo, map_tasks(cycle_setting_coverages_one_date, args, executor=executor,
+                                            nprocs=nprocs)):
+        date_rows[mydate] = rows
+        if stores is not None:
+            for setting, store in zip(settings, stores):
+                coverages = [row['coverage'] for row in rows if is_setting_row(row, setting)]
+                store.write(mydate, np.reshape(coverages, (1, 1, -1)), satellite_sets, areas)
+        if progress is not None:
+            progress(date=mydate)
+
+    return [row for mydate in dates for row in date_rows[mydate]]
+
+
+def is_setting_row(row, setting):
+    """Check if a result row is of the cycle *setting*."""
+    return ((row['cycle_distance'], row['time_window_size'], row['cutoff'], row['latency']) ==
+            (setting.cycle_distance, setting.time_window_size, setting.cutoff, setting.latency))
+
+
+def _read_cycle_setting_rows(settings, stores, mydate, satellite_sets, areas):
+    """Read the result rows of one date from the stores of the cycle *settings*."""
+    rows = []
+    for setting, store in zip(settings, stores):
+        coverages = store.read(mydate, satellite_sets, areas)[0, 0]
+        windows = get_cycle_windows(mydate, setting.starthours, setting.length_minutes)
+        for starthour, (start_time, end_time), coverage in zip(setting.starthours, windows, coverages):
+            rows.append(_get_cycle_row(setting, mydate, starthour, start_time, end_time, float(coverage)))
+    return rows
+
+
+def save_table(filename, rows):
+    """Save a table of result rows (dicts with the same keys) as a csv file."""
+    with open(filename, 'w', newline='') as fpt:
+        writer = csv.DictWriter(fpt, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def save_subset_coverage(filename, coverages, subsets, dates, starthours):
+    """Save the constellation subset coverages with their labels in one npz file."""
+    np.savez(filename,
+             coverage=coverages,
+             subsets=np.array([get_satellite_set_label(subset) for subset in subsets]),
+             dates=np.array(dates, dtype='datetime64[D]'),
+             starthours=np.asarray(starthours, dtype=np.float64))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the scenario configuration.
+"""
+
+import os
+import pickle
+import subprocess
+import sys
+import dataclasses
+import datetime
+import pytest
+import yaml
+
+from dr_schedule_and_coverage.config import read_config, read_scenarios, DEFAULT_CONFIG
+from dr_schedule_and_coverage.sat_receptions import ReceptionsConflictResolution
+from dr_schedule_and_coverage.pmw_data_coverage import find_actual_tlefile
+from dr_schedule_and_coverage.stations import NRK
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+SCENARIOS_YAML = """
+tle_realtime_archive: {tledir}
+stations:
+  kiruna: [20.96, 67.86, 0.4]
+reception_priorities:
+  Metop-C: 1
+  Suomi-NPP: 2
+  NOAA-18: 3
+  Metop-B: 4
+  NOAA-20: 5
+  AWS-4: 6
+  FY-3D: 7
+station_visibility:
+  kiruna:
+    min_elevation: 5
+    min_duration: 3
+scenarios:
+  eumetsat:
+  aws_first:
+    reception_priorities:
+      AWS-4: 0
+      Metop-C: 1
+      Suomi-NPP: 2
+"""
+
+TWO_PASSES = [[datetime.datetime(2022, 3, 21, 22, 44, 52), datetime.datetime(2022, 3, 21, 22, 56, 40), 'Suomi-NPP'],
+              [datetime.datetime(2022, 3, 21, 22, 45, 14), datetime.datetime(2022, 3, 21, 22, 54, 18), 'AWS-4']]
+
+
+@pytest.fixture
+def scenario_file(tmp_path):
+    """Write a scenario file with two scenarios."""
+    filename = tmp_path / 'scenarios.yaml'
+    filename.write_text(SCENARIOS_YAML.format(tledir=TEST_DATA_DIR))
+    return str(filename)
+
+
+def test_read_scenarios(scenario_file):
+    """Test reading several scenarios sharing common settings."""
+    scenarios = read_scenarios(scenario_file)
+
+    assert list(scenarios) == ['eumetsat', 'aws_first']
+    assert scenarios['eumetsat'].reception_priorities['AWS-4'] == 6
+    assert scenarios['aws_first'].reception_priorities == {'AWS-4': 0, 'Metop-C': 1, 'Suomi-NPP': 2}
+    assert scenarios['eumetsat'].stations['kiruna'] == (20.96, 67.86, 0.4)
+    assert scenarios['eumetsat'].stations['nrk'] == NRK
+    assert scenarios['eumetsat'].area_id == DEFAULT_CONFIG.area_id
+    assert scenarios['eumetsat'].get_station_visibility('kiruna').min_elevation == 5
+    assert scenarios['eumetsat'].get_station_visibility('nrk').min_elevation == 0
+    assert scenarios['eumetsat'].get_station_visibility(NRK).min_duration == 0
+
+
+def test_read_config_requires_scenario_name(scenario_file):
+    """Test that a scenario has to be chosen when there are several."""
+    with pytest.raises(ValueError):
+        read_config(scenario_file)
+
+    config = read_config(scenario_file, 'aws_first')
+    assert config.name == 'aws_first'
+
+
+def test_config_is_immutable_and_picklable(scenario_file):
+    """Test that the config can not be modified, but can be hashed and sent to other processes."""
+    config = read_config(scenario_file, 'eumetsat')
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.area_id = 'euron1'
+    with pytest.raises(TypeError):
+        config.reception_priorities['AWS-4'] = 1
+
+    assert pickle.loads(pickle.dumps(config)) == config
+    assert hash(config) == hash(read_config(scenario_file, 'eumetsat'))
+
+
+def test_config_pickled_under_another_hash_seed():
+    """Test that a config pickled in a process with another hash seed hashes as the local one."""
+    script = ("import pickle, sys; from dr_schedule_and_coverage.config import DEFAULT_CONFIG; "
+              "hash(DEFAULT_CONFIG); sys.stdout.buffer.write(pickle.dumps(DEFAULT_CONFIG))")
+    hash(DEFAULT_CONFIG)
+    for seed in ['1', '2']:
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=os.pathsep.join(sys.path))
+        config = pickle.loads(subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                                             stdout=subprocess.PIPE).stdout)
+        assert config == DEFAULT_CONFIG
+        assert config in {DEFAULT_CONFIG}
+
+
+def test_duplicated_keys_are_refused(tmp_path):
+    """Test that duplicated keys are not silently overridden."""
+    filename = tmp_path / 'dup.yaml'
+    filename.write_text("reception_priorities:\n  NOAA-18: 6\n  NOAA-18: 3\n")
+
+    with pytest.raises(yaml.YAMLError):
+        read_config(str(filename))
+
+
+def test_tied_priorities_are_refused(tmp_path):
+    """Test that a scenario ranking two platforms the same is refused."""
+    filename = tmp_path / 'tied.yaml'
+    filename.write_text("reception_priorities:\n  NOAA-18: 3\n  AWS-4: 3\n")
+
+    with pytest.raises(ValueError, match='NOAA-18 and AWS-4'):
+        read_config(str(filename))
+
+
+def test_example_scenarios():
+    """Test that the example scenarios have their own complete rankings without ties."""
+    scenarios = read_scenarios(os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'scenario.yaml'))
+
+    assert scenarios['eumetsat'].reception_priorities['Suomi-NPP'] == 2
+    assert scenarios['aws_first'].reception_priorities['AWS-4'] == 1
+    assert scenarios['aws_first'].reception_priorities['Suomi-NPP'] == 3
+
+
+def test_unknown_setting_is_refused(tmp_path):
+    """Test that misspelled settings are refused."""
+    filename = tmp_path / 'typo.yaml'
+    filename.write_text("areaid: euron1\n")
+
+    with pytest.raises(ValueError):
+        read_config(str(filename))
+
+
+def test_conflict_resolution_uses_scenario_priorities(scenario_file):
+    """Test that scenarios with different priorities can be resolved side by side."""
+    scenarios = read_scenarios(scenario_file)
+
+    results = {}
+    for name, config in scenarios.items():
+        schedule_resolver = ReceptionsConflictResolution(TWO_PASSES, config=config)
+        schedule_resolver.check_for_conflicts()
+        schedule_resolver.resolve_conflicts()
+        results[name] = schedule_resolver.receptions
+
+    assert results == {'eumetsat': ['pass_000'], 'aws_first': ['pass_001']}
+
+
+def test_find_actual_tlefile_from_config(scenario_file):
+    """Test finding the TLE file in the archive given by the scenario."""
+    config = read_config(scenario_file, 'eumetsat')
+
+    tlefile = find_actual_tlefile(datetime.datetime(2020, 1, 10, 0, 30), config)
+
+    assert tlefile == os.path.join(TEST_DATA_DIR, 'tle-202001100000.txt')
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the persistent cache of coverage cells.
+"""
+
+import shutil
+from datetime import date, datetime
+
+import numpy as np
+from pyresample import load_area
+
+from dr_schedule_and_coverage import instrumentation
+from dr_schedule_and_coverage.coverage_cache import CoverageCache, CoverageCell
+from dr_schedule_and_coverage.pmw_data_coverage import COVERAGE_METHOD, derive_average_coverage_one_timewindow
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TLE_FILE, TEST_CONFIG, AREA_DEF_FILE
+
+INSTRUMENTS = {'NOAA-19': 'mhs', 'Suomi-NPP': 'atms'}
+START_TIME = datetime(2020, 1, 10, 6)
+END_TIME = datetime(2020, 1, 10, 7)
+SE_NORTH = load_area(AREA_DEF_FILE, 'se_north')
+EURON1 = load_area(AREA_DEF_FILE, 'euron1')
+
+
+def test_cells_are_keyed_by_content(tmp_path):
+    """Test that cells only differ by what the coverage depends on, and persist."""
+    cell = CoverageCell.from_window(SE_NORTH, ['Suomi-NPP', 'NOAA-19'], INSTRUMENTS, START_TIME, END_TIME,
+                                    TLE_FILE, COVERAGE_METHOD)
+    assert cell.satellites == 'NOAA-19_Suomi-NPP'
+    assert cell.instruments == 'NOAA-19:mhs,Suomi-NPP:atms'
+
+    renamed = str(tmp_path / 'tle-202001100030.txt')
+    shutil.copy(TLE_FILE, renamed)
+    assert CoverageCell.from_window(SE_NORTH, ['NOAA-19', 'Suomi-NPP'], INSTRUMENTS, START_TIME, END_TIME,
+                                    renamed, COVERAGE_METHOD) == cell
+    with open(renamed, 'a') as fpt:
+        fpt.write('\n')
+    assert CoverageCell.from_window(SE_NORTH, ['NOAA-19', 'Suomi-NPP'], INSTRUMENTS, START_TIME, END_TIME,
+                                    renamed, COVERAGE_METHOD).tle_hash != cell.tle_hash
+    assert CoverageCell.from_window(SE_NORTH, ['NOAA-19', 'Suomi-NPP'], {'NOAA-19': 'amsu-a'}, START_TIME,
+                                    END_TIME, TLE_FILE, COVERAGE_METHOD) != cell
+    other_se_north = SE_NORTH.copy(area_extent=(-400000.0, -3500000.0, 700000.0, -2300000.0))
+    assert other_se_north.area_id == 'se_north'
+    assert CoverageCell.from_window(other_se_north, ['NOAA-19', 'Suomi-NPP'], INSTRUMENTS, START_TIME, END_TIME,
+                                    TLE_FILE, COVERAGE_METHOD) != cell
+
+    path = str(tmp_path / 'coverage.sqlite')
+    with CoverageCache(path) as cache:
+        assert cache.get(cell) is None
+        cache.put(cell, np.float64(0.3))
+        cache.put(cell, 0.4)
+    with CoverageCache(path) as cache:
+        assert len(cache) == 1
+        assert cache.get(cell) == 0.4
+        assert cache.get_all([cell, CoverageCell.from_window(EURON1, ['NOAA-19'], INSTRUMENTS, START_TIME,
+                                                             END_TIME, TLE_FILE, COVERAGE_METHOD)]) is None
+
+
+def test_average_coverage_reads_cached_cells(tmp_path):
+    """Test that cached cells are returned without predicting any pass."""
+    satnames = ['NOAA-19', 'Metop-B']
+    cells = [CoverageCell.from_window(area_def, satnames, TEST_CONFIG.instruments, START_TIME, END_TIME, TLE_FILE,
+                                      COVERAGE_METHOD) for area_def in [SE_NORTH, EURON1]]
+
+    with CoverageCache(str(tmp_path / 'coverage.sqlite')) as cache:
+        cache.put_all(cells, [0.25, 0.75])
+        report = instrumentation.enable()
+        try:
+            coverage = derive_average_coverage_one_timewindow(satnames, 6, 60, [date(2020, 1, 10)],
+                                                              config=TEST_CONFIG, cache=cache)
+            area_coverages = derive_average_coverage_one_timewindow(satnames, 6, 60, [date(2020, 1, 10)],
+                                                                    config=TEST_CONFIG, cache=cache,
+                                                                    areaids=['se_north', 'euron1'])
+        finally:
+            instrumentation.disable()
+
+    np.testing.assert_allclose(coverage, [0.25])
+    np.testing.assert_allclose(area_coverages, [[0.25], [0.75]])
+    assert 'get_sats_within_horizon' not in report.stages
+    assert report.counters == {'coverage_cache_hits': 3}
+
+
+def test_average_coverage_caches_computed_cells(tmp_path):
+    """Test that the cells computed on a miss are cached and read on the next call."""
+    satnames = ['NOAA-19', 'Metop-B']
+    dates = [date(2020, 1, 10)]
+    expected = derive_average_coverage_one_timewindow(satnames, 6, 60, dates, config=TEST_CONFIG,
+                                                      areaids=['se_north', 'euron1'], plotpath=None)
+
+    with CoverageCache(str(tmp_path / 'coverage.sqlite')) as cache:
+        report = instrumentation.enable()
+        try:
+            first = derive_average_coverage_one_timewindow(satnames, 6, 60, dates, config=TEST_CONFIG, cache=cache,
+                                                           areaids=['se_north', 'euron1'], plotpath=None)
+            second = derive_average_coverage_one_timewindow(satnames, 6, 60, dates, config=TEST_CONFIG, cache=cache,
+                                                            areaids=['se_north', 'euron1'], plotpath=None)
+        finally:
+            instrumentation.disable()
+        assert len(cache) == 2
+
+    np.testing.assert_allclose(first, expected)
+    np.testing.assert_allclose(second, expected)
+    assert report.stages['get_sats_within_horizon'][0] == 1
+    assert report.counters['coverage_cache_misses'] == 2
+    assert report.counters['coverage_cache_hits'] == 2
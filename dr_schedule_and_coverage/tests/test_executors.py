@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test running sweep tasks on pluggable executors.
+"""
+
+import dataclasses
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+import pytest
+
+from dr_schedule_and_coverage.executors import InProcessExecutor, map_tasks
+from dr_schedule_and_coverage.sweeps import derive_scenario_coverage, derive_constellation_subset_coverage
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TEST_CONFIG
+
+DATES = [date(2020, 1, 10), date(2020, 1, 11)]
+STARTHOURS = [6., 8.]
+CONFIGS = [TEST_CONFIG, dataclasses.replace(TEST_CONFIG, name='euron1', area_id='euron1')]
+
+
+def _slow_square(value):
+    """Square a value, taking longer for smaller values."""
+    time.sleep(0.05 * (3 - value))
+    return value * value
+
+
+def _fail(value):
+    raise ValueError(value)
+
+
+def test_map_tasks_keeps_order():
+    """Test that the results come in the order of the tasks, whatever order they finish in."""
+    args = [(0, ), (1, ), (2, ), (3, )]
+    assert list(map_tasks(_slow_square, args)) == [0, 1, 4, 9]
+    assert list(map_tasks(_slow_square, args, nprocs=2)) == [0, 1, 4, 9]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(map_tasks(_slow_square, args, executor=executor)) == [0, 1, 4, 9]
+    assert list(map_tasks(_slow_square, [])) == []
+
+
+def test_in_process_executor():
+    """Test the in-process stand-in executor."""
+    executor = InProcessExecutor()
+    assert list(map_tasks(_slow_square, [(2, ), (3, )], executor=executor)) == [4, 9]
+    assert len(executor.shipped) == 2
+
+    with pytest.raises(ValueError):
+        list(map_tasks(_fail, [(1, )], executor=executor))
+
+
+def test_scenario_coverage_on_executor():
+    """Test the scenario sweep as small tasks on an executor."""
+    cells = []
+
+    def progress(**cell):
+        cells.append((cell['scenario'], cell['date']))
+
+    coverages = derive_scenario_coverage(['NOAA-19', 'Metop-B'], CONFIGS, DATES, STARTHOURS, 60)
+    executor = InProcessExecutor()
+    coverages_executor = derive_scenario_coverage(['NOAA-19', 'Metop-B'], CONFIGS, DATES, STARTHOURS, 60,
+                                                  executor=executor, progress=progress)
+
+    assert coverages.shape == (2, 2, 2)
+    np.testing.assert_allclose(coverages_executor, coverages)
+    assert not np.allclose(coverages[0], coverages[1])
+    assert cells == [(config.name, mydate) for config in CONFIGS for mydate in DATES]
+    # Each task ships only a few kB each way:
+    assert len(executor.shipped) == 4
+    assert max(max(sizes) for sizes in executor.shipped) < 10000
+
+
+def test_sweep_on_in_process_dask_cluster():
+    """Test a sweep on an in-process dask cluster."""
+    distributed = pytest.importorskip('distributed')
+
+    subsets = [['NOAA-19'], ['NOAA-19', 'Metop-B']]
+    coverages = derive_constellation_subset_coverage(subsets, DATES, [7.], 60, config=TEST_CONFIG)
+    with distributed.Client(processes=False, n_workers=1, threads_per_worker=2,
+                            dashboard_address=None) as client:
+        coverages_dask = derive_constellation_subset_coverage(subsets, DATES, [7.], 60, config=TEST_CONFIG,
+                                                              executor=client)
+
+    np.testing.assert_allclose(coverages_dask, coverages)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the timing instrumentation and run report.
+"""
+
+import json
+
+from dr_schedule_and_coverage import instrumentation
+from dr_schedule_and_coverage.sat_receptions import ReceptionsConflictResolution
+from dr_schedule_and_coverage.tests.test_reception_resolve_conflicts import TEST1_SORTED_LIST
+
+
+def test_no_report_when_not_enabled():
+    """Test that nothing is collected unless instrumentation is enabled."""
+    with instrumentation.timer('some_stage'):
+        instrumentation.count('some_counter')
+
+    assert instrumentation.get_report() is None
+
+
+def test_report_to_json(tmp_path):
+    """Test that the timings of a run are written to a json report."""
+    filename = str(tmp_path / 'report.json')
+
+    with instrumentation.report_to(filename):
+        schedule_resolver = ReceptionsConflictResolution(TEST1_SORTED_LIST)
+        schedule_resolver.check_for_conflicts()
+        schedule_resolver.resolve_conflicts()
+        schedule_resolver.resolve_conflicts()
+        with instrumentation.timer('plotting'):
+            instrumentation.count('plots', 3)
+
+    assert instrumentation.get_report() is None
+    with open(filename) as fpt:
+        report = json.load(fpt)
+
+    assert report['stages']['check_for_conflicts']['calls'] == 1
+    assert report['stages']['resolve_conflicts']['calls'] == 2
+    assert report['stages']['plotting']['total_seconds'] >= 0
+    assert report['counters'] == {'plots': 3}
+    assert report['wall_seconds'] > 0
+    assert report['peak_memory_mb'] > 0
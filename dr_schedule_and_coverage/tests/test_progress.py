@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the progress reporting and logging of the coverage functions.
+"""
+
+import os
+import logging
+import datetime
+
+from dr_schedule_and_coverage.progress import SweepProgress
+from dr_schedule_and_coverage.pmw_data_coverage import create_passes_inside_time_window
+from dr_schedule_and_coverage.pmw_data_coverage import derive_combined_coverage
+from dr_schedule_and_coverage.pmw_data_coverage import INSTRUMENTS
+
+TLE_FILE = os.path.join(os.path.dirname(__file__), 'data', 'tle-202001100000.txt')
+
+
+def test_sweep_progress(caplog):
+    """Test the aggregated progress of a sweep."""
+    statuses = []
+    progress = SweepProgress(4, callback=statuses.append, log_interval=3600)
+
+    assert progress.remaining == 4
+    with caplog.at_level(logging.INFO):
+        for cycle in range(4):
+            progress(cycle=cycle, coverage=0.5)
+
+    assert [status['done'] for status in statuses] == [1, 2, 3, 4]
+    assert statuses[1]['remaining'] == 2
+    assert statuses[1]['eta'] >= 0
+    assert statuses[-1]['last_cell'] == {'cycle': 3, 'coverage': 0.5}
+    # Only the final status is logged within the log interval:
+    assert len(caplog.records) == 1
+    assert "4 of 4 cells done" in caplog.text
+
+
+def test_coverage_functions_do_not_print(capsys, caplog):
+    """Test that the passes and coverage are logged at debug level instead of printed."""
+    start_time = datetime.datetime(2020, 1, 10, 8, 30)
+    end_time = datetime.datetime(2020, 1, 10, 8, 35)
+    allpasses = {'Metop-B': [(datetime.datetime(2020, 1, 10, 8, 30, 6),
+                              datetime.datetime(2020, 1, 10, 8, 40, 49),
+                              datetime.datetime(2020, 1, 10, 8, 35, 29))]}
+
+    with caplog.at_level(logging.DEBUG):
+        passes = create_passes_inside_time_window(allpasses, INSTRUMENTS, start_time, end_time, TLE_FILE)
+        assert derive_combined_coverage([], None) == 0
+
+    assert len(passes) == 1
+    assert capsys.readouterr().out == ''
+    assert "Metop-B mhs" in caplog.text
+    assert "No passes in time window!" in caplog.text
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the coverage from the data received at the stations.
+"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from dr_schedule_and_coverage.reception_coverage import ReceivedCoverage, merge_station_passes
+from dr_schedule_and_coverage.reception_coverage import derive_received_coverage_consecutive_cycles
+from dr_schedule_and_coverage.sliding_coverage import derive_coverage_consecutive_cycles
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TEST_CONFIG
+
+SATS = ['NOAA-19', 'Metop-B', 'Metop-C']
+DATES = [date(2020, 1, 10)]
+STARTHOURS = [6., 8., 18.]
+
+
+def test_merge_station_passes():
+    """Test merging the candidate passes of several stations per satellite."""
+    nrk = [[datetime(2020, 1, 10, 8, 0), datetime(2020, 1, 10, 8, 12), 'NOAA-19']]
+    sdk = [[datetime(2020, 1, 10, 8, 5), datetime(2020, 1, 10, 8, 16), 'NOAA-19'],
+           [datetime(2020, 1, 10, 9, 0), datetime(2020, 1, 10, 9, 10), 'Metop-B']]
+
+    allpasses = merge_station_passes(['NOAA-19', 'Metop-B', 'Metop-C'], [nrk, sdk, nrk])
+
+    assert allpasses == {'NOAA-19': [(datetime(2020, 1, 10, 8, 0), datetime(2020, 1, 10, 8, 16), None)],
+                         'Metop-B': [(datetime(2020, 1, 10, 9, 0), datetime(2020, 1, 10, 9, 10), None)],
+                         'Metop-C': []}
+
+
+def test_received_coverage_one_station():
+    """Test that the potential coverage at one station is the coverage of all its passes."""
+    received, potential = derive_received_coverage_consecutive_cycles(SATS, ['nrk'], STARTHOURS, 60, DATES,
+                                                                      config=TEST_CONFIG)
+    expected = derive_coverage_consecutive_cycles(SATS, STARTHOURS, 60, DATES, config=TEST_CONFIG)
+
+    np.testing.assert_allclose(potential, expected)
+    assert np.all(received <= potential)
+    assert received.sum() < potential.sum()
+
+
+def test_received_coverage_antennas_and_latency():
+    """Test that enough antennas receive everything, and that late data are left out."""
+    start_time, end_time = datetime(2020, 1, 10, 6), datetime(2020, 1, 10, 20)
+    coverage = ReceivedCoverage.from_stations(SATS, ['nrk', 'sdk'], start_time, end_time, config=TEST_CONFIG,
+                                              antennas=len(SATS), latency=timedelta(minutes=20))
+
+    assert set(coverage.schedules) == {'nrk', 'sdk'}
+    for station in coverage.schedules:
+        assert len(coverage.schedules[station]) == len(coverage.candidates[station])
+
+    window = (datetime(2020, 1, 10, 11), datetime(2020, 1, 10, 12))
+    potential = coverage.coverage(*window, received=False)
+    assert potential > 0
+    assert coverage.coverage(*window, deadline=window[1] + timedelta(hours=1)) == potential
+    assert coverage.coverage(*window) < potential
+    assert coverage.coverage(*window, deadline=window[0]) == 0
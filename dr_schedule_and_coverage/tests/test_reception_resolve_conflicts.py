@@ -24,12 +24,19 @@
 """
 
 import pytest
+import numpy as np
 import datetime
+import dataclasses
+from dr_schedule_and_coverage.config import DEFAULT_CONFIG
 from dr_schedule_and_coverage.sat_receptions import ReceptionsConflictResolution
 from dr_schedule_and_coverage.sat_receptions import passes_overlap
 from dr_schedule_and_coverage.sat_receptions import merge_passes_one_satellite
 from dr_schedule_and_coverage.sat_receptions import merge_two_passes
 from dr_schedule_and_coverage.sat_receptions import calculate_total_minutes_received
+from dr_schedule_and_coverage.sat_receptions import merge_intervals, get_total_minutes, get_pass_times
+from dr_schedule_and_coverage.sat_receptions import to_epoch_microseconds, from_epoch_microseconds
+from dr_schedule_and_coverage.sat_receptions import resolve_station_receptions
+from dr_schedule_and_coverage.sat_receptions import get_reception_statistics
 
 
 TEST1_SORTED_LIST = [[datetime.datetime(2022, 3, 21, 22, 2, 40, 571967),
@@ -188,6 +195,47 @@ def test_resolve_conflicts():
     assert schedule_resolver.receptions == ['pass_000', 'pass_001']
 
 
+def test_resolve_station_receptions_several_antennas():
+    """Test that each antenna takes the passes rejected by the antennas before it."""
+    received, remaining = resolve_station_receptions(TEST1_SORTED_LIST)
+    assert [(apass[2], apass[3]) for apass in received] == [('Metop-B', 0), ('Suomi-NPP', 0)]
+    assert [apass[2] for apass in remaining] == ['AWS-4', 'FY-3D']
+
+    received, remaining = resolve_station_receptions(TEST1_SORTED_LIST, antennas=2)
+    assert [(apass[2], apass[3]) for apass in received] == [('Metop-B', 0), ('Suomi-NPP', 0), ('FY-3D', 1)]
+    assert remaining == [TEST1_SORTED_LIST[2]]
+
+    received, remaining = resolve_station_receptions(TEST1_SORTED_LIST, antennas=3)
+    assert [apass[:3] for apass in received] == TEST1_SORTED_LIST
+    assert remaining == []
+
+
+def test_get_reception_statistics():
+    """Test the reception statistics per platform and antenna."""
+    received, _ = resolve_station_receptions(TEST1_SORTED_LIST, antennas=2)
+    stats = get_reception_statistics(TEST1_SORTED_LIST, received, ['Metop-B', 'Suomi-NPP', 'AWS-4', 'FY-3D', 'NOAA-20'])
+
+    def minutes(apass):
+        return (apass[1] - apass[0]).total_seconds()/60.
+
+    np.testing.assert_array_equal(stats['potential_passes'], [1, 1, 1, 1, 0])
+    np.testing.assert_allclose(stats['potential_minutes'], [minutes(apass) for apass in TEST1_SORTED_LIST] + [0])
+    np.testing.assert_array_equal(stats['received_passes'], [[1, 0], [1, 0], [0, 0], [0, 1], [0, 0]])
+    np.testing.assert_allclose(stats['received_minutes'][3], [0, minutes(TEST1_SORTED_LIST[3])])
+    np.testing.assert_allclose(stats['pass_efficiency'], [1, 1, 0, 1, np.nan])
+    np.testing.assert_allclose(stats['minute_efficiency'], [1, 1, 0, 1, np.nan])
+    np.testing.assert_allclose(stats['antenna_pass_efficiency'],
+                               [[1, 0], [1, 0], [0, 0], [0, 1], [np.nan, np.nan]])
+
+    with pytest.raises(ValueError):
+        get_reception_statistics(TEST1_SORTED_LIST, received, antennas=1)
+
+    stats = get_reception_statistics(TEST1_SORTED_LIST, [])
+    assert stats['platform_names'] == ['Metop-B', 'Suomi-NPP', 'AWS-4', 'FY-3D']
+    assert stats['received_passes'].shape == (4, 1)
+    assert stats['received_minutes'].sum() == 0
+
+
 def test_merge_two_passes():
     """Test merging two overlapping passes of the same satellite."""
     pass1 = [datetime.datetime(2022, 3, 21, 19, 31, 11, 641153),
@@ -230,3 +278,107 @@ def test_calculate_total_minutes_received():
     """Test the total minutes ereceived for a list of passes."""
     total_min = calculate_total_minutes_received(PASS_LIST_AWS_OVERLAPPING)
     assert pytest.approx(total_min, 0.05) == 36.5
+
+
+def test_merge_intervals():
+    """Test merging time intervals given in epoch microseconds."""
+    starts = np.array([50, 0, 10, 30, 30, 60], dtype=np.int64)
+    ends = np.array([55, 20, 15, 40, 40, 70], dtype=np.int64)
+
+    merged_starts, merged_ends = merge_intervals(starts, ends)
+
+    # Duplicated intervals are merged, touching intervals are not:
+    np.testing.assert_array_equal(merged_starts, [0, 30, 50, 60])
+    np.testing.assert_array_equal(merged_ends, [20, 40, 55, 70])
+    assert get_total_minutes(starts * 60e6, ends * 60e6) == 45.
+    assert len(merge_intervals([], [])[0]) == 0
+
+    # An empty interval at the start of another is kept apart whatever the order:
+    for order in ([0, 1], [1, 0]):
+        merged_starts, merged_ends = merge_intervals(np.array([0, 0])[order], np.array([0, 10])[order])
+        np.testing.assert_array_equal(merged_ends, [0, 10])
+
+
+def test_merge_identical_and_touching_passes():
+    """Test that identical passes are merged and counted once, and touching passes are kept apart."""
+    apass = PASS_LIST_AWS_OVERLAPPING[0]
+    touching = [apass[1], apass[1] + datetime.timedelta(minutes=5), apass[2]]
+
+    assert merge_passes_one_satellite([apass, list(apass)]) == [list(apass)]
+    assert merge_passes_one_satellite([apass, touching]) == [list(apass), touching]
+    minutes = (apass[1] - apass[0]).total_seconds() / 60.
+    assert calculate_total_minutes_received([apass, list(apass), touching]) == pytest.approx(minutes + 5)
+
+
+def test_epoch_microseconds_round_trip():
+    """Test converting pass times to epoch microseconds and back."""
+    starts, ends = get_pass_times(PASS_LIST_AWS_OVERLAPPING)
+
+    assert starts.dtype == np.int64
+    assert from_epoch_microseconds(starts) == [apass[0] for apass in PASS_LIST_AWS_OVERLAPPING]
+    np.testing.assert_array_equal(to_epoch_microseconds(starts.astype('datetime64[us]')), starts)
+    assert calculate_total_minutes_received(PASS_LIST_AWS_OVERLAPPING) == get_total_minutes(starts, ends)
+
+
+def test_get_conflict_edges():
+    """Test getting the conflict graph as pairs of pass indices."""
+    schedule_resolver = ReceptionsConflictResolution(TEST1_SORTED_LIST)
+    schedule_resolver.check_for_conflicts()
+
+    edges = schedule_resolver.get_conflict_edges()
+    np.testing.assert_array_equal(edges, [[1, 2], [1, 3], [2, 3], [2, 1], [3, 2], [3, 1]])
+
+
+def test_resolve_priority_scenarios():
+    """Test resolving a batch of priority scenarios against one conflict graph."""
+    schedule_resolver = ReceptionsConflictResolution(TEST1_SORTED_LIST)
+    schedule_resolver.check_for_conflicts()
+
+    scenarios = [{'Metop-B': 1, 'Suomi-NPP': 2, 'AWS-4': 3, 'FY-3D': 4},
+                 {'Metop-B': 1, 'Suomi-NPP': 3, 'AWS-4': 1, 'FY-3D': 4},
+                 {'Metop-B': 1, 'FY-3D': 1}]
+    minutes = schedule_resolver.resolve_priority_scenarios(scenarios)
+
+    assert schedule_resolver.platform_names == ['Metop-B', 'Suomi-NPP', 'AWS-4', 'FY-3D']
+    assert minutes.shape == (3, 4)
+
+    # Compare with resolving each scenario on its own:
+    for scenario, scenario_minutes in zip(scenarios, minutes):
+        single_resolver = ReceptionsConflictResolution(TEST1_SORTED_LIST)
+        single_resolver.priorities = scenario
+        single_resolver.check_for_conflicts()
+        single_resolver.resolve_conflicts()
+        expected = dict.fromkeys(single_resolver.platform_names, 0)
+        for pass_id in single_resolver.receptions:
+            apass = single_resolver.passlist[pass_id]
+            expected[apass['platform_name']] += (apass['end'] - apass['start']).total_seconds()/60.
+        np.testing.assert_allclose(scenario_minutes, list(expected.values()))
+
+
+def test_resolve_priority_scenarios_from_configs():
+    """Test resolving the reception priorities of scenario configs."""
+    schedule_resolver = ReceptionsConflictResolution(TEST1_SORTED_LIST)
+    schedule_resolver.check_for_conflicts()
+
+    scenarios = [{'Metop-B': 1, 'Suomi-NPP': 2, 'AWS-4': 3, 'FY-3D': 4},
+                 {'Metop-B': 2, 'FY-3D': 1}]
+    configs = [dataclasses.replace(DEFAULT_CONFIG, reception_priorities=scenario) for scenario in scenarios]
+    minutes = schedule_resolver.resolve_priority_scenarios([config.reception_priorities for config in configs])
+
+    np.testing.assert_allclose(minutes, schedule_resolver.resolve_priority_scenarios(scenarios))
+    assert minutes.shape == (2, 4)
+
+
+def test_resolve_priority_scenarios_process_pool():
+    """Test that spreading the scenarios over processes gives the same result."""
+    schedule_resolver = ReceptionsConflictResolution(TEST1_SORTED_LIST)
+    schedule_resolver.check_for_conflicts()
+
+    platform_names = ['Suomi-NPP', 'AWS-4', 'FY-3D']
+    priorities = np.array([[1, 2, 3], [3, 2, 1], [2, 1, 3], [1, 1, 1]])
+    minutes = schedule_resolver.resolve_priority_scenarios(priorities, platform_names)
+    minutes_pool = schedule_resolver.resolve_priority_scenarios(priorities, platform_names, nprocs=2)
+
+    np.testing.assert_allclose(minutes, minutes_pool)
+    assert minutes[0, 1] == 0
+    assert minutes[3].min() > 0
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the chunked streaming reception scheduler.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dr_schedule_and_coverage.reception_stream import iter_time_chunks, iter_conflict_groups
+from dr_schedule_and_coverage.reception_stream import get_station_passes, iter_station_receptions
+from dr_schedule_and_coverage.reception_stream import get_chunk_receptions, get_period_reception_statistics
+from dr_schedule_and_coverage.sat_receptions import resolve_station_receptions, get_reception_statistics
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TEST_CONFIG
+
+SATS = ['NOAA-19', 'Metop-B', 'Metop-C', 'NOAA-20', 'Suomi-NPP']
+START_TIME = datetime(2020, 1, 10, 0)
+END_TIME = datetime(2020, 1, 11, 12)
+
+
+def assert_same_passes(passes1, passes2):
+    """Assert two pass lists are the same, allowing for small differences in the predicted times."""
+    assert [apass[2:] for apass in passes1] == [apass[2:] for apass in passes2]
+    for apass1, apass2 in zip(passes1, passes2):
+        assert abs(apass1[0] - apass2[0]) < timedelta(seconds=1)
+        assert abs(apass1[1] - apass2[1]) < timedelta(seconds=1)
+
+
+def test_iter_time_chunks():
+    """Test splitting a period in time chunks."""
+    chunks = list(iter_time_chunks(START_TIME, END_TIME))
+    assert chunks == [(START_TIME, datetime(2020, 1, 11)), (datetime(2020, 1, 11), END_TIME)]
+
+
+def test_iter_conflict_groups():
+    """Test that conflict groups are split where no pass overlaps the passes before."""
+    t0 = datetime(2020, 1, 10)
+    passes = [[t0, t0 + timedelta(minutes=10), 'a'],
+              [t0 + timedelta(minutes=2), t0 + timedelta(minutes=5), 'b'],
+              [t0 + timedelta(minutes=8), t0 + timedelta(minutes=20), 'c'],
+              [t0 + timedelta(minutes=20), t0 + timedelta(minutes=30), 'd']]
+
+    groups = list(iter_conflict_groups(passes))
+    assert [[apass[2] for apass in group] for group in groups] == [['a', 'b', 'c'], ['d']]
+
+
+def test_streamed_receptions_as_whole_period():
+    """Test that resolving chunk by chunk gives the receptions of the whole period."""
+    passlist = get_station_passes(SATS, START_TIME, END_TIME, 'nrk', config=TEST_CONFIG)
+    expected, _ = resolve_station_receptions(passlist, config=TEST_CONFIG)
+    assert len(expected) < len(passlist)
+
+    chunks = list(iter_station_receptions(SATS, START_TIME, END_TIME, 'nrk', chunk_length=timedelta(hours=5),
+                                          config=TEST_CONFIG))
+    assert len(chunks) == 8
+    for chunk_start, chunk_end, candidates, received in chunks:
+        assert all(chunk_start <= apass[0] < chunk_end for apass in candidates + received)
+    assert_same_passes([apass for chunk in chunks for apass in chunk[2]], passlist)
+    assert_same_passes([apass for chunk in chunks for apass in chunk[3]], expected)
+
+    # Each chunk resolved on its own gives the same:
+    for chunk_start, chunk_end, candidates, received in chunks:
+        chunk_candidates, chunk_received = get_chunk_receptions(SATS, chunk_start, chunk_end, 'nrk',
+                                                                config=TEST_CONFIG)
+        assert_same_passes(chunk_candidates, candidates)
+        assert_same_passes(chunk_received, received)
+
+
+def test_period_reception_statistics():
+    """Test summing the reception statistics of the chunks, in one process and in a pool."""
+    passlist = get_station_passes(SATS, START_TIME, END_TIME, 'nrk', config=TEST_CONFIG)
+    received, _ = resolve_station_receptions(passlist, antennas=2, config=TEST_CONFIG)
+    expected = get_reception_statistics(passlist, received, SATS, antennas=2)
+
+    for nprocs in [None, 2]:
+        stats = get_period_reception_statistics(SATS, START_TIME, END_TIME, 'nrk', chunk_length=timedelta(hours=6),
+                                                antennas=2, config=TEST_CONFIG, nprocs=nprocs)
+        np.testing.assert_array_equal(stats['potential_passes'], expected['potential_passes'])
+        np.testing.assert_array_equal(stats['received_passes'], expected['received_passes'])
+        np.testing.assert_allclose(stats['received_minutes'], expected['received_minutes'], rtol=1e-4)
+        np.testing.assert_allclose(stats['pass_efficiency'], expected['pass_efficiency'])
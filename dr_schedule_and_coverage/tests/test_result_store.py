@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the labelled coverage result store.
+"""
+
+import dataclasses
+from datetime import date
+
+import numpy as np
+import pytest
+
+from dr_schedule_and_coverage import instrumentation
+from dr_schedule_and_coverage.pmw_data_coverage import derive_average_coverage_one_timewindow
+from dr_schedule_and_coverage.progress import SweepProgress
+from dr_schedule_and_coverage.sweeps import derive_constellation_subset_coverage, derive_scenario_coverage
+from dr_schedule_and_coverage.sweeps import CycleSetting, derive_cycle_setting_coverage
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TEST_CONFIG
+
+pytest.importorskip('xarray')
+pytest.importorskip('zarr')
+
+from dr_schedule_and_coverage.result_store import CoverageStore  # noqa: E402
+
+DATES = [date(2020, 1, 10), date(2020, 1, 11)]
+STARTHOURS = [6., 8.]
+SUBSETS = [['NOAA-19'], ['NOAA-19', 'Metop-B']]
+SET_LABELS = ['NOAA-19', 'NOAA-19_Metop-B']
+
+
+def test_write_read_and_append(tmp_path):
+    """Test writing cells date by date and appending dates."""
+    path = str(tmp_path / 'coverage.zarr')
+    store = CoverageStore.create(path, SET_LABELS, ['se_north', 'euron1'], DATES[:1], STARTHOURS)
+
+    assert not store.is_done(DATES[0], SET_LABELS, ['se_north'])
+    store.write(DATES[0], np.array([[[0.1, 0.2]], [[0.3, 0.4]]]), SET_LABELS, ['se_north'])
+    assert store.is_done(DATES[0], SET_LABELS, ['se_north'])
+    assert not store.is_done(DATES[0], SET_LABELS, ['euron1'])
+
+    store = CoverageStore.open_or_create(path, SET_LABELS, ['se_north', 'euron1'], DATES, STARTHOURS)
+    with store.open() as dset:
+        assert dset.coverage.shape == (2, 2, 2, 2)
+        np.testing.assert_allclose(dset.coverage.sel(area='se_north', date=np.datetime64(DATES[0])), [[0.1, 0.2], [0.3, 0.4]])
+        assert np.all(np.isnan(dset.coverage.sel(date=np.datetime64(DATES[1]))))
+
+    with pytest.raises(ValueError):
+        CoverageStore.open_or_create(path, SET_LABELS, ['se_north'], DATES, STARTHOURS)
+
+
+def test_sweep_resumes_from_store(tmp_path):
+    """Test that a sweep writes to the store and only computes the missing dates on a rerun."""
+    path = str(tmp_path / 'coverage.zarr')
+    store = CoverageStore.open_or_create(path, SET_LABELS, ['se_north'], DATES[:1], STARTHOURS)
+    first = derive_constellation_subset_coverage(SUBSETS, DATES[:1], STARTHOURS, 60, config=TEST_CONFIG,
+                                                 store=store)
+
+    computed = []
+
+    def progress(**cell):
+        computed.append(cell['date'])
+
+    store = CoverageStore.open_or_create(path, SET_LABELS, ['se_north'], DATES, STARTHOURS)
+    coverages = derive_constellation_subset_coverage(SUBSETS, DATES, STARTHOURS, 60, config=TEST_CONFIG,
+                                                     progress=progress, store=store)
+
+    assert computed == DATES[1:]
+    np.testing.assert_allclose(coverages[:, :1], first)
+    with store.open() as dset:
+        np.testing.assert_allclose(dset.coverage.sel(area='se_north').values, coverages)
+
+
+def test_write_read_cycle(tmp_path):
+    """Test writing and reading the cells of one cycle."""
+    store = CoverageStore.create(str(tmp_path / 'coverage.zarr'), SET_LABELS, ['se_north'], DATES, STARTHOURS)
+
+    store.write_cycle(DATES[1], 8., [[0.5], [0.6]], SET_LABELS, ['se_north'])
+    assert store.is_cycle_done(DATES[1], 8., SET_LABELS, ['se_north'])
+    assert not store.is_cycle_done(DATES[1], 6., SET_LABELS, ['se_north'])
+    assert not store.is_done(DATES[1], SET_LABELS, ['se_north'])
+    np.testing.assert_allclose(store.read_cycle(DATES[1], 8., SET_LABELS[1:], ['se_north']), [[0.6]])
+
+
+def test_average_coverage_reads_store(tmp_path):
+    """Test that the cells in the store are read instead of computed."""
+    store = CoverageStore.create(str(tmp_path / 'coverage.zarr'), ['NOAA-19_Metop-B'], ['se_north', 'euron1'],
+                                 DATES, STARTHOURS)
+    for date_idx, mydate in enumerate(DATES):
+        store.write_cycle(mydate, 6., [[0.1 + date_idx, 0.2 + date_idx]], ['NOAA-19_Metop-B'],
+                          ['se_north', 'euron1'])
+
+    report = instrumentation.enable()
+    try:
+        coverage = derive_average_coverage_one_timewindow(['NOAA-19', 'Metop-B'], 6., 60, DATES,
+                                                          config=TEST_CONFIG, store=store)
+        area_coverages = derive_average_coverage_one_timewindow(['NOAA-19', 'Metop-B'], 6., 60, DATES,
+                                                                config=TEST_CONFIG, store=store,
+                                                                areaids=['se_north', 'euron1'])
+    finally:
+        instrumentation.disable()
+
+    np.testing.assert_allclose(coverage, [0.1, 1.1])
+    np.testing.assert_allclose(area_coverages, [[0.1, 1.1], [0.2, 1.2]])
+    assert 'get_sats_within_horizon' not in report.stages
+
+
+def test_progress_of_resumed_sweep(tmp_path):
+    """Test that the progress of a sweep resumed on a half written store counts the cells left only."""
+    store = CoverageStore.create(str(tmp_path / 'coverage.zarr'), ['NOAA-19_Metop-B'], ['se_north'], DATES,
+                                 STARTHOURS[:1])
+    store.write_cycle(DATES[0], 6., [[0.1]], ['NOAA-19_Metop-B'], ['se_north'])
+    assert store.count_done(DATES, ['NOAA-19_Metop-B'], ['se_north'], STARTHOURS[:1]) == 1
+    assert store.count_done(DATES, ['NOAA-19_Metop-B'], ['se_north']) == 1
+
+    progress = SweepProgress(len(DATES) - store.count_done(DATES, ['NOAA-19_Metop-B'], ['se_north'],
+                                                           STARTHOURS[:1]))
+    coverage = derive_average_coverage_one_timewindow(['NOAA-19', 'Metop-B'], 6., 60, DATES, config=TEST_CONFIG,
+                                                      progress=progress, store=store, plotpath=None)
+
+    assert coverage[0] == pytest.approx(0.1)
+    assert progress.done == progress.total == 1
+    assert progress.remaining == 0
+    assert progress.last_cell['date'] == DATES[1]
+    assert store.count_done(DATES, ['NOAA-19_Metop-B'], ['se_north']) == 2
+
+
+def test_scenario_sweep_resumes_from_stores(tmp_path):
+    """Test that the scenario sweep writes to the store of each scenario and only computes the missing dates."""
+    configs = [TEST_CONFIG, dataclasses.replace(TEST_CONFIG, name='other')]
+    paths = [str(tmp_path / ('coverage_%d.zarr' % idx)) for idx in range(len(configs))]
+    first = derive_scenario_coverage(['NOAA-19', 'Metop-B'], configs, DATES[:1], STARTHOURS, 60,
+                                     stores=[CoverageStore.open_or_create(paths[0], ['NOAA-19_Metop-B'],
+                                                                          ['se_north'], DATES[:1], STARTHOURS),
+                                             None])
+
+    computed = []
+
+    def progress(**cell):
+        computed.append((cell['scenario'], cell['date']))
+
+    stores = [CoverageStore.open_or_create(path, ['NOAA-19_Metop-B'], ['se_north'], DATES, STARTHOURS)
+              for path in paths]
+    coverages = derive_scenario_coverage(['NOAA-19', 'Metop-B'], configs, DATES, STARTHOURS, 60,
+                                         progress=progress, stores=stores)
+
+    assert computed == [(TEST_CONFIG.name, DATES[1]), ('other', DATES[0]), ('other', DATES[1])]
+    np.testing.assert_allclose(coverages[:, :1], first)
+    for store, scenario_coverages in zip(stores, coverages):
+        with store.open() as dset:
+            np.testing.assert_allclose(dset.coverage.values[0, 0], scenario_coverages)
+
+
+def test_cycle_setting_sweep_resumes_from_stores(tmp_path):
+    """Test that the cycle setting sweep reads the dates already in the stores of all settings."""
+    settings = [CycleSetting(3.0, 180, 15, 20), CycleSetting(6.0, 60, 0, 0)]
+
+    def open_stores(dates):
+        return [CoverageStore.open_or_create(str(tmp_path / ('coverage_%s.zarr' % setting.description)),
+                                             ['NOAA-19_Metop-B'], ['se_north'], dates, setting.starthours)
+                for setting in settings]
+
+    first = derive_cycle_setting_coverage(['NOAA-19', 'Metop-B'], settings, DATES[:1], config=TEST_CONFIG,
+                                          stores=open_stores(DATES[:1]))
+
+    computed = []
+
+    def progress(**cell):
+        computed.append(cell['date'])
+
+    rows = derive_cycle_setting_coverage(['NOAA-19', 'Metop-B'], settings, DATES, config=TEST_CONFIG,
+                                         progress=progress, stores=open_stores(DATES))
+
+    assert computed == DATES[1:]
+    assert rows[:len(first)] == first
+    assert [row['date'] for row in rows] == [DATES[0]] * len(first) + [DATES[1]] * len(first)
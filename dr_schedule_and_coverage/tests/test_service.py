@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the schedule and coverage service.
+"""
+
+import asyncio
+import dataclasses
+import json
+import shutil
+from datetime import datetime
+
+import pytest
+from pyresample import load_area
+
+from dr_schedule_and_coverage.footprints import GranuleFootprints
+from dr_schedule_and_coverage.pmw_data_coverage import get_sats_within_horizon
+from dr_schedule_and_coverage.service import ScheduleService, get_station_schedule
+from dr_schedule_and_coverage.tle_archive import TLEArchiveIndex
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TLE_FILE, AREA_DEF_FILE, TEST_CONFIG
+
+SATS = ['Metop-B', 'NOAA-19']
+
+
+async def _request(socket_path, target, body=None):
+    """Send one HTTP request to the service and return the status and the answer."""
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    if body is None:
+        request = 'GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % target
+    else:
+        body = json.dumps(body)
+        request = 'POST %s HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s' % (target, len(body), body)
+    writer.write(request.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, answer = response.split(b'\r\n\r\n', 1)
+    return int(head.split()[1]), json.loads(answer)
+
+
+@pytest.mark.parametrize('nprocs', [None, 2])
+def test_service_answers_from_warm_caches(tmp_path, nprocs):
+    """Test the schedule and coverage queries, answered from the caches when repeated."""
+    socket_path = str(tmp_path / 'service.sock')
+    service = ScheduleService(TEST_CONFIG, nprocs=nprocs)
+    schedule_query = '/schedule?satellites=Metop-B,NOAA-19&station=nrk&start=2020-01-10T01:00&end=2020-01-10T13:00'
+    coverage_query = {'satellites': SATS, 'start': '2020-01-10T06:00', 'end': '2020-01-10T09:00'}
+
+    async def _run():
+        server = await service.start_server(socket_path=socket_path)
+        async with server:
+            results = await asyncio.gather(_request(socket_path, schedule_query),
+                                           _request(socket_path, schedule_query),
+                                           _request(socket_path, '/coverage', coverage_query))
+            results.append(await _request(socket_path, '/coverage', coverage_query))
+            results.append(await _request(socket_path, '/status'))
+            results.append(await _request(socket_path, '/unknown'))
+            results.append(await _request(socket_path, '/coverage?satellites=Metop-B&start=yesterday'))
+        return results
+
+    try:
+        results = asyncio.run(_run())
+    finally:
+        service.close()
+
+    candidates, received = get_station_schedule(SATS, 'nrk', datetime(2020, 1, 10, 1), datetime(2020, 1, 10, 13),
+                                                1, TLE_FILE, TEST_CONFIG)
+    assert results[0] == results[1]
+    assert results[0][0] == 200
+    assert results[0][1]['candidates'] == [[start.isoformat(), end.isoformat(), name] for start, end, name in candidates]
+    assert results[0][1]['received'] == [[start.isoformat(), end.isoformat(), name, antenna]
+                                         for start, end, name, antenna in received]
+
+    area_def = load_area(AREA_DEF_FILE, 'se_north')
+    nextpasses = get_sats_within_horizon(SATS, datetime(2020, 1, 9, 23, 30), forward=26, tle_filename=TLE_FILE)
+    footprints = GranuleFootprints.from_passes(nextpasses, area_def, TLE_FILE, TEST_CONFIG.instruments)
+    expected = footprints.coverage(datetime(2020, 1, 10, 6), datetime(2020, 1, 10, 9))
+    assert results[2] == results[3] == (200, {'coverage': expected})
+    assert expected > 0
+
+    status = results[4][1]
+    assert status['schedules'] == {'entries': 1, 'hits': 1, 'misses': 1}
+    assert status['footprints'] == {'entries': 1, 'hits': 1, 'misses': 1}
+    assert results[5][0] == 404
+    assert results[6][0] == 400
+
+
+def test_client_disconnecting_mid_request(tmp_path):
+    """Test that a client leaving in the middle of its request body is handled and its connection closed."""
+    socket_path = str(tmp_path / 'service.sock')
+    service = ScheduleService(TEST_CONFIG)
+    errors = []
+
+    async def _run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        server = await service.start_server(socket_path=socket_path)
+        async with server:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            writer.write(b'POST /coverage HTTP/1.1\r\nContent-Length: 100\r\n\r\n{"satellites"')
+            writer.write_eof()
+            response = await reader.read()
+            writer.close()
+            return response, await _request(socket_path, '/status')
+
+    try:
+        response, status = asyncio.run(_run())
+    finally:
+        service.close()
+
+    assert response == b''
+    assert status[0] == 200
+    assert errors == []
+
+
+def test_missing_tle_file_is_refused():
+    """Test that a query without a TLE file close in time is refused rather than downloading TLEs."""
+    service = ScheduleService(TEST_CONFIG)
+    status, answer = asyncio.run(service.handle_query('/coverage', {'satellites': 'Metop-B',
+                                                                    'start': '2020-03-01T06:00',
+                                                                    'end': '2020-03-01T07:00'}))
+    assert status == 400
+    assert 'No TLE file' in answer['error']
+
+
+
+@pytest.mark.parametrize('end', ['2020-01-11T00:00', '2020-01-10T23:00'])
+def test_empty_window_is_refused(end):
+    """Test that a coverage query ending at or before its start is refused."""
+    service = ScheduleService(TEST_CONFIG)
+    status, answer = asyncio.run(service.handle_query('/coverage', {'satellites': 'Metop-B',
+                                                                    'start': '2020-01-11T00:00',
+                                                                    'end': end}))
+    assert status == 400
+    assert 'not after start time' in answer['error']
+
+
+def test_indexed_archive_is_not_globbed(tmp_path):
+    """Test that the realtime archive is only searched through its index when there is one."""
+    service = ScheduleService(dataclasses.replace(TEST_CONFIG, tle_realtime_archive=str(tmp_path)))
+    service.tle_index = TLEArchiveIndex(str(tmp_path))
+    shutil.copy(TLE_FILE, str(tmp_path / 'tle-202001100000.txt'))
+
+    with pytest.raises(ValueError, match='No TLE file'):
+        asyncio.run(service.get_tle_file(datetime(2020, 1, 10, 6)))
+
+    service.tle_index.scan()
+    tle_file = asyncio.run(service.get_tle_file(datetime(2020, 1, 10, 7)))
+    assert tle_file == str(tmp_path / 'tle-202001100000.txt')
+
+def test_coverage_across_midnight(tmp_path):
+    """Test that a window across midnight combines the footprint tables of both days."""
+    for tle_name in ['tle-202001100000.txt', 'tle-202001110000.txt']:
+        shutil.copy(TLE_FILE, str(tmp_path / tle_name))
+    service = ScheduleService(dataclasses.replace(TEST_CONFIG, tle_realtime_archive=str(tmp_path)))
+
+    async def _run():
+        night = await service.get_coverage(SATS, datetime(2020, 1, 10, 23), datetime(2020, 1, 11, 1))
+        evening = await service.get_coverage(SATS, datetime(2020, 1, 10, 23), datetime(2020, 1, 11))
+        morning = await service.get_coverage(SATS, datetime(2020, 1, 11), datetime(2020, 1, 11, 1))
+        return night, evening, morning
+
+    night, evening, morning = asyncio.run(_run())
+    assert night >= max(evening, morning)
+    assert len(service.footprints) == 2
+    assert service.footprints.hits == 2
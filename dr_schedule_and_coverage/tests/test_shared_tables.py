@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the granule and footprint tables in shared memory.
+"""
+
+import pickle
+from datetime import datetime, timedelta
+
+import numpy as np
+from pyresample import load_area
+
+from dr_schedule_and_coverage.config import DEFAULT_CONFIG
+from dr_schedule_and_coverage.footprints import GranuleFootprints
+from dr_schedule_and_coverage.pmw_data_coverage import get_sats_within_horizon
+from dr_schedule_and_coverage.shared_tables import SharedArrays, attached_arrays, share_footprints
+from dr_schedule_and_coverage.shared_tables import attached_footprints, rasterize_granules_shared
+from dr_schedule_and_coverage.shared_tables import subset_coverages_shared
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TLE_FILE, AREA_DEF_FILE
+
+SATNAMES = ['Metop-B', 'NOAA-19']
+START = datetime(2020, 1, 10, 6, 0)
+
+
+def _get_footprints(nprocs=None):
+    """Get the footprints of the passes during three hours, serially and in shared memory."""
+    area_def = load_area(AREA_DEF_FILE, 'se_north')
+    allpasses = get_sats_within_horizon(SATNAMES, START, forward=3, tle_filename=TLE_FILE)
+    serial = GranuleFootprints.from_passes(allpasses, area_def, TLE_FILE, DEFAULT_CONFIG.instruments)
+    shared = rasterize_granules_shared(allpasses, area_def, TLE_FILE, DEFAULT_CONFIG.instruments, nprocs=nprocs)
+    return serial, shared
+
+
+def test_shared_arrays_round_trip():
+    """Test attaching to arrays in shared memory through a small handle."""
+    arrays = {'index': np.arange(100000, dtype=np.int64), 'empty': np.zeros((0, 4), dtype=np.uint8)}
+    with SharedArrays(arrays) as shared:
+        assert len(pickle.dumps(shared.handle)) < 500
+        with attached_arrays(shared.handle) as attached:
+            np.testing.assert_array_equal(attached['index'], arrays['index'])
+            assert attached['empty'].shape == (0, 4)
+            attached['index'][0] = -1
+        assert shared.arrays['index'][0] == -1
+
+
+def test_rasterize_granules_shared():
+    """Test rasterizing the granules in a pool of processes writing to shared memory."""
+    serial, shared = _get_footprints(nprocs=2)
+
+    assert len(serial) > 0
+    assert shared.satnames == serial.satnames
+    np.testing.assert_array_equal(shared.sat_index, serial.sat_index)
+    np.testing.assert_array_equal(shared.starts, serial.starts)
+    np.testing.assert_array_equal(shared.ends, serial.ends)
+    np.testing.assert_array_equal(shared.packed_masks, serial.packed_masks)
+
+
+def test_subset_coverages_shared():
+    """Test the subset coverages from footprints shared with the workers."""
+    serial, _ = _get_footprints()
+    subsets = [['Metop-B'], ['NOAA-19'], SATNAMES]
+    windows = [(START, START + timedelta(hours=1)), (START + timedelta(hours=1), START + timedelta(hours=3))]
+
+    coverages = subset_coverages_shared(serial, subsets, windows, nprocs=2)
+
+    expected = [[serial.coverage(start, end, satnames) for start, end in windows] for satnames in subsets]
+    np.testing.assert_allclose(coverages, expected)
+    assert coverages[2, 1] > 0
+
+    shared, handle = share_footprints(serial)
+    with shared:
+        assert len(pickle.dumps(handle)) < 1000
+        with attached_footprints(handle) as footprints:
+            assert footprints.coverage(*windows[1]) == serial.coverage(*windows[1])
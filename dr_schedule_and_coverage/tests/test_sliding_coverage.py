@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the footprint rasterization and the sliding window coverage.
+"""
+
+import os
+import dataclasses
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from pyresample import load_area
+from pyresample.spherical import SphPolygon
+
+from dr_schedule_and_coverage.config import DEFAULT_CONFIG
+from dr_schedule_and_coverage.footprints import rasterize_polygon, get_granule_times, coverage_from_mask
+from dr_schedule_and_coverage.footprints import pass_footprint
+from dr_schedule_and_coverage.sliding_coverage import SlidingWindowCoverage
+from dr_schedule_and_coverage.sliding_coverage import derive_coverage_consecutive_cycles
+from dr_schedule_and_coverage.pmw_data_coverage import get_sats_within_horizon
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+TLE_FILE = os.path.join(TEST_DATA_DIR, 'tle-202001100000.txt')
+AREA_DEF_FILE = os.path.join(TEST_DATA_DIR, 'areas.yaml')
+TEST_CONFIG = dataclasses.replace(DEFAULT_CONFIG, tle_realtime_archive=TEST_DATA_DIR,
+                                  area_def_file=AREA_DEF_FILE, area_id='se_north')
+
+
+def make_polygon(lons, lats):
+    """Make a spherical polygon from vertices in degrees."""
+    return SphPolygon(np.deg2rad(np.vstack((lons, lats)).T))
+
+
+def test_rasterize_polygon():
+    """Test rasterizing a polygon onto the area grid."""
+    areadef = load_area(AREA_DEF_FILE, 'se_north')
+    lons, lats = areadef.get_lonlats()
+
+    mask = rasterize_polygon(make_polygon([-10, 21, 21, -10], [50, 50, 75, 75]), areadef)
+    assert mask.shape == areadef.shape
+    # Away from the edges the mask follows the longitude bound:
+    assert np.all(mask[(lons < 20.5) & (lats < 72)])
+    assert not np.any(mask[lons > 21.5])
+
+    outside = rasterize_polygon(make_polygon([100, 110, 110, 100], [0, 0, 10, 10]), areadef)
+    assert not np.any(outside)
+
+
+def test_get_granule_times():
+    """Test cutting a pass in granules on a fixed time grid."""
+    granules = get_granule_times(datetime(2020, 1, 10, 8, 30, 6), datetime(2020, 1, 10, 8, 32, 30),
+                                 timedelta(minutes=1))
+
+    assert granules == [(datetime(2020, 1, 10, 8, 30, 6), datetime(2020, 1, 10, 8, 31)),
+                        (datetime(2020, 1, 10, 8, 31), datetime(2020, 1, 10, 8, 32)),
+                        (datetime(2020, 1, 10, 8, 32), datetime(2020, 1, 10, 8, 32, 30))]
+
+
+class FakeArea():
+    """A small fake area definition."""
+
+    shape = (4, 10)
+
+
+def stripe_footprint(satname, instrument, start, end):
+    """Get a footprint covering one column per minute, in a row depending on the satellite."""
+    mask = np.zeros(FakeArea.shape, dtype=bool)
+    mask[int(satname[-1]), start.minute % 10] = True
+    return mask
+
+
+def test_sliding_window_matches_full_recomputation():
+    """Test that moving the window gives the same counts as computing each window from scratch."""
+    allpasses = {'sat0': [(datetime(2020, 1, 1, 0, 0), datetime(2020, 1, 1, 0, 12), None),
+                          (datetime(2020, 1, 1, 1, 40), datetime(2020, 1, 1, 1, 55), None)],
+                 'sat1': [(datetime(2020, 1, 1, 0, 5), datetime(2020, 1, 1, 0, 9), None)]}
+    sliding = SlidingWindowCoverage(FakeArea(), footprint_func=stripe_footprint)
+    sliding.add_passes(allpasses)
+
+    windows = [(datetime(2020, 1, 1, 0, 0), datetime(2020, 1, 1, 0, 30)),
+               (datetime(2020, 1, 1, 0, 3), datetime(2020, 1, 1, 0, 8)),
+               (datetime(2020, 1, 1, 0, 30), datetime(2020, 1, 1, 1, 45)),
+               (datetime(2020, 1, 1, 1, 44), datetime(2020, 1, 1, 2, 30))]
+    for start_time, end_time in windows:
+        coverage = sliding.move_to(start_time, end_time)
+
+        fresh = SlidingWindowCoverage(FakeArea(), footprint_func=stripe_footprint)
+        fresh.add_passes(allpasses)
+        fresh.move_to(start_time, end_time)
+        np.testing.assert_array_equal(sliding.get_observation_count(), fresh.counts)
+        assert coverage == fresh.coverage
+
+    assert sliding.coverage == 10 / 40
+
+
+@pytest.mark.parametrize('starthours', [[6., 7., 8.], [6., 6.5, 7.]])
+def test_derive_coverage_consecutive_cycles(starthours):
+    """Test the coverage of consecutive cycles against the footprints of the clipped passes."""
+    satnames = ['NOAA-19', 'Metop-B']
+    coverages = derive_coverage_consecutive_cycles(satnames, starthours, 60, [datetime(2020, 1, 10).date()],
+                                                   config=TEST_CONFIG)
+    assert coverages.shape == (1, 3)
+
+    areadef = load_area(AREA_DEF_FILE, 'se_north')
+    allpasses = get_sats_within_horizon(satnames, datetime(2020, 1, 10, 5), forward=5, tle_filename=TLE_FILE)
+    for starthour, coverage in zip(starthours, coverages[0]):
+        start_time = datetime(2020, 1, 10) + timedelta(hours=starthour)
+        end_time = start_time + timedelta(minutes=60)
+        mask = np.zeros(areadef.shape, dtype=bool)
+        for satname in satnames:
+            for rtime, ftime, _ in allpasses[satname]:
+                if ftime > start_time and rtime < end_time:
+                    mask |= pass_footprint(satname, 'mhs', max(rtime, start_time), min(ftime, end_time),
+                                           TLE_FILE, areadef)
+        assert coverage == pytest.approx(coverage_from_mask(mask), abs=0.02)
+
+    assert coverages.max() > 0.5
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the coverage sweeps sharing predictions and footprints.
+"""
+
+import dataclasses
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import numpy as np
+from pyresample import load_area
+
+from dr_schedule_and_coverage.sweeps import derive_constellation_subset_coverage, save_subset_coverage
+from dr_schedule_and_coverage.sweeps import derive_multi_area_coverage
+from dr_schedule_and_coverage.sweeps import CycleSetting, derive_cycle_setting_coverage, save_table
+from dr_schedule_and_coverage.sliding_coverage import derive_coverage_consecutive_cycles
+from dr_schedule_and_coverage.pmw_data_coverage import derive_combined_coverage
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TEST_CONFIG, AREA_DEF_FILE, make_polygon
+
+DATES = [date(2020, 1, 10)]
+STARTHOURS = [6., 8.]
+SUBSETS = [['NOAA-19'], ['Metop-B'], ['NOAA-19', 'Metop-B']]
+
+
+def test_constellation_subset_coverage(tmp_path):
+    """Test the coverage of several constellations from one set of footprints."""
+    coverages = derive_constellation_subset_coverage(SUBSETS, DATES, STARTHOURS, 60, config=TEST_CONFIG)
+
+    assert coverages.shape == (3, 1, 2)
+    for subset, subset_coverages in zip(SUBSETS, coverages):
+        expected = derive_coverage_consecutive_cycles(subset, STARTHOURS, 60, DATES, config=TEST_CONFIG)
+        np.testing.assert_allclose(subset_coverages, expected)
+    assert np.all(coverages[2] >= coverages[:2].max(axis=0))
+
+    filename = str(tmp_path / 'subsets.npz')
+    save_subset_coverage(filename, coverages, SUBSETS, DATES, STARTHOURS)
+    with np.load(filename) as npz:
+        np.testing.assert_array_equal(npz['coverage'], coverages)
+        assert list(npz['subsets']) == ['NOAA-19', 'Metop-B', 'NOAA-19_Metop-B']
+
+
+def test_constellation_subset_coverage_in_processes():
+    """Test that the dates can be spread over processes."""
+    dates = [date(2020, 1, 10), date(2020, 1, 11)]
+    progress_dates = []
+
+    def progress(**cell):
+        progress_dates.append(cell['date'])
+
+    coverages = derive_constellation_subset_coverage(SUBSETS[:2], dates, [7.], 60, config=TEST_CONFIG)
+    coverages_pool = derive_constellation_subset_coverage(SUBSETS[:2], dates, [7.], 60, config=TEST_CONFIG,
+                                                          nprocs=2, progress=progress)
+
+    np.testing.assert_allclose(coverages, coverages_pool)
+    assert progress_dates == dates
+
+
+def test_multi_area_coverage():
+    """Test the coverage of several areas from the same passes."""
+    areaids = ['se_north', 'euron1']
+    coverages = derive_multi_area_coverage(['NOAA-19', 'Metop-B'], areaids, DATES, STARTHOURS, 60,
+                                           config=TEST_CONFIG)
+
+    assert coverages.shape == (2, 1, 2)
+    for areaid, area_coverages in zip(areaids, coverages):
+        config = dataclasses.replace(TEST_CONFIG, area_id=areaid)
+        expected = derive_coverage_consecutive_cycles(['NOAA-19', 'Metop-B'], STARTHOURS, 60, DATES,
+                                                      config=config)
+        np.testing.assert_allclose(area_coverages, expected)
+
+
+def test_combined_coverage_several_areas():
+    """Test the polygon coverage of several areas from one merge of the passes."""
+    areadefs = [load_area(AREA_DEF_FILE, 'se_north'), load_area(AREA_DEF_FILE, 'euron1')]
+    apass = SimpleNamespace(instrument='mhs',
+                            risetime=datetime(2020, 1, 10, 8), falltime=datetime(2020, 1, 10, 8, 10),
+                            boundary=SimpleNamespace(contour_poly=make_polygon([0, 20, 20, 0], [40, 40, 75, 75])))
+
+    coverages = derive_combined_coverage([apass], areadefs)
+
+    assert coverages.shape == (2, )
+    assert np.all((coverages > 0) & (coverages < 1))
+    for areadef, coverage in zip(areadefs, coverages):
+        assert coverage == derive_combined_coverage([apass], areadef)
+    np.testing.assert_array_equal(derive_combined_coverage([], areadefs), [0, 0])
+
+
+def test_cycle_setting():
+    """Test the cycle timing derived from a setting."""
+    setting = CycleSetting(cycle_distance=3.0, time_window_size=180, cutoff=15, latency=20)
+
+    assert setting.length_minutes == 145
+    np.testing.assert_allclose(setting.starthours, np.arange(-1.5, 22.5, 3.0))
+    assert setting.description == '20min_180min_15min'
+
+
+def test_cycle_setting_coverage(tmp_path):
+    """Test the coverage of several cycle settings from one set of predictions."""
+    settings = [CycleSetting(3.0, 180, 15, 20), CycleSetting(6.0, 60, 0, 0)]
+    rows = derive_cycle_setting_coverage(['NOAA-19', 'Metop-B'], settings, DATES, config=TEST_CONFIG)
+
+    assert len(rows) == 8 + 4
+    for setting in settings:
+        coverages = [row['coverage'] for row in rows if row['cycle_distance'] == setting.cycle_distance]
+        expected = derive_coverage_consecutive_cycles(['NOAA-19', 'Metop-B'], setting.starthours,
+                                                      setting.length_minutes, DATES, config=TEST_CONFIG)
+        np.testing.assert_allclose(coverages, expected[0])
+
+    filename = tmp_path / 'settings.csv'
+    save_table(str(filename), rows)
+    lines = filename.read_text().splitlines()
+    assert lines[0].startswith('cycle_distance,time_window_size,cutoff,latency,date,starthour')
+    assert len(lines) == len(rows) + 1
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the TLE archive index and watcher.
+"""
+
+import asyncio
+import dataclasses
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from glob import glob
+
+import pytest
+from trollsift import Parser
+
+from dr_schedule_and_coverage.pmw_data_coverage import find_actual_tlefile, find_valid_file_from_list, tlepattern
+from dr_schedule_and_coverage.service import ScheduleService
+from dr_schedule_and_coverage.tle_archive import TLEArchiveIndex, TLEArchiveWatcher, watch_tle_archive
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TLE_FILE, TEST_CONFIG
+
+ARCHIVE_TIMES = ['202001080600', '202001100000', '202001100030', '202001101200', '202001120000']
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Make a TLE archive with a few files, and a file not matching the pattern."""
+    for archive_time in ARCHIVE_TIMES:
+        shutil.copy(TLE_FILE, str(tmp_path / ('tle-%s.txt' % archive_time)))
+    (tmp_path / 'README').write_text('not a TLE file')
+    return tmp_path
+
+
+def test_index_finds_the_same_file_as_globbing(archive):
+    """Test that the index finds the same TLE file as searching the globbed archive."""
+    index = TLEArchiveIndex(str(archive))
+    assert len(index.scan()) == len(ARCHIVE_TIMES)
+    assert index.scan() == []
+
+    tlefiles = glob(os.path.join(str(archive), 'tle-*.txt'))
+    config = dataclasses.replace(TEST_CONFIG, tle_realtime_archive=str(archive))
+    for minutes in range(-15 * 24 * 60, 15 * 24 * 60, 17):
+        obstime = datetime(2020, 1, 10) + timedelta(minutes=minutes)
+        expected = find_valid_file_from_list(Parser(tlepattern), obstime, list(tlefiles), 3600)
+        assert index.find(obstime) == expected
+        if minutes % 10 == 0:
+            assert find_actual_tlefile(obstime, config, index=index) == find_actual_tlefile(obstime, config)
+
+
+@pytest.mark.parametrize('use_inotify', [True, False])
+def test_watcher_adds_new_files(archive, use_inotify):
+    """Test that the watcher adds the files landing in the archive to the index."""
+    index = TLEArchiveIndex(str(archive))
+    watcher = TLEArchiveWatcher(index, use_inotify=use_inotify)
+    index.scan()
+    assert not use_inotify or watcher.uses_inotify
+
+    assert watcher.check() == []
+    new_file = str(archive / 'tle-202001110000.txt')
+    shutil.copy(TLE_FILE, new_file)
+    shutil.copy(TLE_FILE, str(archive / 'tle-20200111.tmp'))
+    assert watcher.check() == [new_file]
+    assert index.find(datetime(2020, 1, 11, 0, 20)) == new_file
+    watcher.stop()
+
+
+def test_watch_in_background(archive):
+    """Test watching the archive in a background thread."""
+    found = []
+    done = threading.Event()
+
+    def _callback(new_files):
+        found.extend(new_files)
+        done.set()
+
+    index, watcher = watch_tle_archive(str(archive), _callback, poll_interval=0.05)
+    try:
+        assert len(index) == len(ARCHIVE_TIMES)
+        shutil.copy(TLE_FILE, str(archive / 'tle-202001110000.txt'))
+        assert done.wait(5)
+    finally:
+        watcher.stop()
+    assert found == [str(archive / 'tle-202001110000.txt')]
+
+
+def test_service_drops_results_of_outdated_tle_files(tmp_path):
+    """Test that the service drops only the cached results whose closest TLE file changed."""
+    shutil.copy(TLE_FILE, str(tmp_path / 'tle-202001100000.txt'))
+    service = ScheduleService(dataclasses.replace(TEST_CONFIG, tle_realtime_archive=str(tmp_path)))
+    satnames = ['Metop-B']
+
+    async def _run():
+        service.watch_tle_archive(poll_interval=0.05, use_inotify=False)
+        for hour in [1, 12]:
+            await service.get_station_schedule(satnames, 'nrk', datetime(2020, 1, 10, hour),
+                                               datetime(2020, 1, 10, hour + 2))
+        assert len(service.schedules) == 2
+
+        shutil.copy(TLE_FILE, str(tmp_path / 'tle-202001101200.txt'))
+        for _ in range(100):
+            await asyncio.sleep(0.05)
+            if len(service.schedules) < 2:
+                break
+        assert service.tle_index.find(datetime(2020, 1, 10, 12)).endswith('tle-202001101200.txt')
+
+    try:
+        asyncio.run(_run())
+    finally:
+        service.close()
+
+    assert [key[2].hour for key in service.schedules.keys()] == [1]
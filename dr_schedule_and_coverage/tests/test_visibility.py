@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Test the pass elevations, the horizon masks and the pruning of passes below the station limits.
+"""
+
+import dataclasses
+from datetime import datetime, timedelta
+
+import numpy as np
+from pyorbital.orbital import Orbital
+
+from dr_schedule_and_coverage.sat_receptions import CreateReceptionList
+from dr_schedule_and_coverage.stations import NRK, StationVisibility
+from dr_schedule_and_coverage.visibility import get_sample_times, get_pass_visibility, get_visible_passes
+from dr_schedule_and_coverage.tests.test_sliding_coverage import TLE_FILE, TEST_CONFIG
+
+START_TIME = datetime(2020, 1, 10, 0, 0)
+SATS = ['Metop-B', 'NOAA-19', 'NOAA-20']
+
+
+def test_get_sample_times():
+    """Test sampling the passes from rise to fall."""
+    passlist = [(datetime(2020, 1, 10, 8, 0), datetime(2020, 1, 10, 8, 0, 25), None),
+                (datetime(2020, 1, 10, 9, 0), datetime(2020, 1, 10, 9, 0, 20), None)]
+
+    times, pass_index, firsts = get_sample_times(passlist, timedelta(seconds=10))
+
+    np.testing.assert_array_equal(pass_index, [0, 0, 0, 0, 1, 1, 1, 1])
+    np.testing.assert_array_equal(firsts, [0, 4])
+    assert times[3] == np.datetime64('2020-01-10T08:00:25')
+    assert times[6] == np.datetime64('2020-01-10T09:00:20')
+
+
+def test_get_pass_visibility():
+    """Test the maximum elevation and the usable duration of each pass."""
+    orbital = Orbital('Metop-B', tle_file=TLE_FILE)
+    passlist = orbital.get_next_passes(START_TIME, 24, *NRK, horizon=0)
+
+    visibility = get_pass_visibility(orbital, passlist, NRK)
+    elevations = [orbital.get_observer_look(apass[2], *NRK)[1] for apass in passlist]
+    np.testing.assert_allclose(visibility['max_elevation'], elevations, atol=0.01)
+    np.testing.assert_allclose(visibility['usable_duration'], visibility['duration'], atol=1e-6)
+
+    above_ten = get_pass_visibility(orbital, passlist, NRK, StationVisibility(min_elevation=10.))
+    assert np.all(above_ten['usable_duration'][above_ten['max_elevation'] < 10.] == 0)
+    high = above_ten['max_elevation'] > 10.
+    assert np.all(above_ten['usable_duration'][high] > 0)
+    assert np.all(above_ten['usable_duration'][high] < visibility['duration'][high])
+
+    # The crossing of ten degrees is interpolated between the samples:
+    apass = passlist[np.flatnonzero(high)[0]]
+    times = [apass[0] + timedelta(seconds=sec) for sec in range(int((apass[1] - apass[0]).total_seconds()))]
+    fine = sum(orbital.get_observer_look(time, *NRK)[1] >= 10. for time in times) / 60.
+    assert abs(above_ten['usable_duration'][np.flatnonzero(high)[0]] - fine) < 1. / 60
+
+
+def test_passes_below_station_limits_are_dropped():
+    """Test that low passes are dropped before the reception conflicts are resolved."""
+    visibility = StationVisibility(min_elevation=10., min_duration=4.)
+    allpasses = get_visible_passes(SATS, START_TIME, forward=24, tle_filename=TLE_FILE, location=NRK)
+    kept = get_visible_passes(SATS, START_TIME, forward=24, tle_filename=TLE_FILE, location=NRK,
+                              visibility=visibility)
+
+    for satname in SATS:
+        assert 0 < len(kept[satname]) < len(allpasses[satname])
+        rises = {apass[2]: apass for apass in allpasses[satname]}
+        orbital = Orbital(satname, tle_file=TLE_FILE)
+        for start, end, uptime in kept[satname]:
+            assert rises[uptime][0] < start < end < rises[uptime][1]
+            assert (end - start) >= timedelta(minutes=4)
+            assert orbital.get_observer_look(uptime, *NRK)[1] >= 10.
+
+    config = dataclasses.replace(TEST_CONFIG, station_visibility={'nrk': {'min_elevation': 10., 'min_duration': 4.}})
+    time_window = (START_TIME + timedelta(hours=1), START_TIME + timedelta(hours=23))
+    reception_list = CreateReceptionList(SATS, time_window, 'nrk', config=config)
+    reception_list.get_passes(TLE_FILE)
+    unlimited = CreateReceptionList(SATS, time_window, 'nrk', config=TEST_CONFIG)
+    unlimited.get_passes(TLE_FILE)
+
+    assert reception_list.location == NRK
+    assert 0 < len(reception_list.sorted_passlist) < len(unlimited.sorted_passlist)
+    assert set(apass[2] for apass in reception_list.sorted_passlist) <= set(SATS)
+
+
+def test_horizon_mask():
+    """Test trimming the passes to the time above an azimuth-dependent horizon mask."""
+    visibility = StationVisibility(horizon_mask=[(0, 0.), (90, 20.), (180, 0.), (270, 0.)])
+    np.testing.assert_allclose(visibility.get_min_elevations([0., 45., 90., 200., 315., 360., -45.]),
+                               [0., 10., 20., 0., 0., 0., 0.])
+    assert StationVisibility(min_elevation=5., horizon_mask=visibility.horizon_mask).get_min_elevations(45.) == 10.
+
+    orbital = Orbital('Metop-B', tle_file=TLE_FILE)
+    passlist = orbital.get_next_passes(START_TIME, 24, *NRK, horizon=0)
+    flat = get_pass_visibility(orbital, passlist, NRK)
+    masked = get_pass_visibility(orbital, passlist, NRK, visibility)
+
+    assert np.all(masked['usable_duration'] <= flat['usable_duration'] + 1e-6)
+    assert np.any(masked['usable_duration'] < flat['usable_duration'] - 0.5)
+    for idx in np.flatnonzero(masked['usable_duration'] > 0):
+        start = masked['usable_start'][idx].item()
+        end = masked['usable_end'][idx].item()
+        inside = [start + (end - start) * frac for frac in np.linspace(0.01, 0.99, 20)]
+        azimuths, elevations = orbital.get_observer_look(np.array(inside, dtype='datetime64[us]'), *NRK)
+        assert np.all(elevations >= visibility.get_min_elevations(azimuths) - 1e-3)
+        for edge in (start, end):
+            azimuth, elevation = orbital.get_observer_look(edge, *NRK)
+            assert abs(elevation - visibility.get_min_elevations(azimuth)) < 0.1
+
+    trimmed = get_visible_passes(['Metop-B'], START_TIME, forward=24, tle_filename=TLE_FILE, location=NRK,
+                                 visibility=visibility)['Metop-B']
+    assert len(trimmed) == np.count_nonzero(masked['usable_duration'] > 0)
+
+
+def test_mid_pass_mask_gap_is_usable():
+    """Test that a pass masked in the middle only, by a narrow high sector, is kept whole."""
+    orbital = Orbital('Metop-B', tle_file=TLE_FILE)
+    passlist = orbital.get_next_passes(START_TIME, 24, *NRK, horizon=0)
+    flat = get_pass_visibility(orbital, passlist, NRK)
+    apass = passlist[int(np.argmax(flat['max_elevation']))]
+    azimuth = float(orbital.get_observer_look(apass[2], *NRK)[0])
+    visibility = StationVisibility(horizon_mask=[(azimuth - 21, 0.), (azimuth - 20, 90.),
+                                                 (azimuth + 20, 90.), (azimuth + 21, 0.)])
+
+    times, _, _ = get_sample_times([apass])
+    azimuths, elevations = orbital.get_observer_look(times, *NRK)
+    hidden = elevations < visibility.get_min_elevations(azimuths) - 1e-3
+    assert np.count_nonzero(hidden) > 1 and not hidden[0] and not hidden[-1]
+
+    masked = get_pass_visibility(orbital, [apass], NRK, visibility)
+    whole = get_pass_visibility(orbital, [apass], NRK)
+    assert masked['usable_start'][0] == whole['usable_start'][0]
+    assert masked['usable_end'][0] == whole['usable_end'][0]
+    np.testing.assert_allclose(masked['usable_duration'], whole['duration'])
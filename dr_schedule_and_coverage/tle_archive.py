@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""An in-memory index of a TLE archive, kept current by watching the archive directory.
+
+:func:`dr_schedule_and_coverage.pmw_data_coverage.find_actual_tlefile`
+globs and parses the whole realtime archive on every call. For long running
+processes the archive is instead listed once into a :class:`TLEArchiveIndex`,
+sorted by time and searched with bisection, and a :class:`TLEArchiveWatcher`
+adds the new files landing in the archive as they come. The watcher uses
+inotify (through ctypes, on Linux) and falls back to polling the directory
+listing where inotify is not available. Listeners get the new files, to
+drop the cached results depending on the TLE file closest in time.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from trollsift import Parser
+
+from .pmw_data_coverage import tlepattern
+
+LOG = logging.getLogger(__name__)
+
+# From <sys/inotify.h>:
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class TLEArchiveIndex():
+    """The TLE files of an archive *directory* sorted by their time.
+
+    Only files matching the trollsift *pattern* are indexed. The index is
+    safe to search from one thread while another adds files.
+    """
+
+    def __init__(self, directory, pattern=tlepattern):
+        self.directory = directory
+        self._parser = Parser(pattern)
+        self._entries = []
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def files(self):
+        """The indexed files, oldest first."""
+        with self._lock:
+            return [filepath for _, filepath in self._entries]
+
+    def add(self, filepath):
+        """Add a file to the index. Return True if it is new and matches the pattern."""
+        filename = os.path.basename(filepath)
+        if filename in self._known:
+            return False
+        try:
+            obstime = self._parser.parse(filename)['time']
+        except ValueError:
+            return False
+        with self._lock:
+            insort(self._entries, (obstime, os.path.join(self.directory, filename)))
+            self._known.add(filename)
+        return True
+
+    def scan(self):
+        """List the archive directory and add the files not yet indexed. Return the new files."""
+        try:
+            filenames = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            LOG.warning("TLE archive %s does not exist", self.directory)
+            return []
+        return [os.path.join(self.directory, filename) for filename in filenames
+                if filename not in self._known and self.add(filename)]
+
+    def find(self, obstime, tol_sec=3600, max_distance=timedelta(days=10)):
+        """Find the TLE file for *obstime*, or None.
+
+        The same file as found by
+        :func:`dr_schedule_and_coverage.pmw_data_coverage.find_valid_file_from_list`
+        is returned: the newest file less than *tol_sec* seconds from
+        *obstime*, otherwise the closest file less than *max_distance* away,
+        the newer one if two are as close.
+        """
+        tolerance = timedelta(seconds=tol_sec)
+        with self._lock:
+            pos = bisect_left(self._entries, (obstime + tolerance, ))
+            before = self._entries[pos - 1] if pos > 0 else None
+            after = self._entries[pos] if pos < len(self._entries) else None
+
+        if before is not None and before[0] > obstime - tolerance:
+            return before[1]
+
+        candidates = [entry for entry in (after, before)
+                      if entry is not None and abs(entry[0] - obstime) < max_distance]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda entry: abs(entry[0] - obstime))[1]
+
+
+class _Inotify():
+    """Events of files written or moved into a directory, read from an inotify file descriptor."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "Can not watch %s" % directory)
+
+    def read_filenames(self):
+        """Get the names of the files of the pending events, without waiting."""
+        filenames = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return filenames
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                filenames.append(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+                offset += length
+
+    def wait(self, timeout):
+        """Wait up to *timeout* seconds for events."""
+        select.select([self.fd], [], [], timeout)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class TLEArchiveWatcher():
+    """Keep a :class:`TLEArchiveIndex` current with the files landing in its directory.
+
+    Inotify is used if *use_inotify* and available, otherwise the directory
+    listing is polled every *poll_interval* seconds.
+    """
+
+    def __init__(self, index, poll_interval=60., use_inotify=True):
+        self.index = index
+        self.poll_interval = poll_interval
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify(index.directory)
+            except (OSError, AttributeError, TypeError) as err:
+                LOG.info("Polling the TLE archive %s, no inotify: %s", index.directory, err)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def uses_inotify(self):
+        """Check if the archive is watched with inotify."""
+        return self._inotify is not None
+
+    def check(self):
+        """Add the new files of the archive to the index, without waiting. Return the new files."""
+        if self._inotify is None:
+            return self.index.scan()
+        return [os.path.join(self.index.directory, filename) for filename in self._inotify.read_filenames()
+                if self.index.add(filename)]
+
+    def _watch(self, callback):
+        """Check for new files until stopped, calling *callback* with them."""
+        while not self._stop.is_set():
+            if self._inotify is None:
+                self._stop.wait(self.poll_interval)
+            else:
+                self._inotify.wait(self.poll_interval)
+            if self._stop.is_set():
+                break
+            new_files = self.check()
+            if new_files:
+                LOG.info("New TLE files: %s", ', '.join(new_files))
+                callback(new_files)
+
+    def start(self, callback):
+        """Watch the archive in a background thread, calling *callback* with each batch of new files."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(callback, ), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the archive."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+def watch_tle_archive(directory, callback, poll_interval=60., use_inotify=True):
+    """Index the TLE archive *directory* and keep the index current in a background thread.
+
+    The *callback* is called from the thread with each batch of new files.
+    Return the index and the watcher, to be stopped when done.
+    """
+    index = TLEArchiveIndex(directory)
+    # Watch before listing, so no file landing in between is missed:
+    watcher = TLEArchiveWatcher(index, poll_interval=poll_interval, use_inotify=use_inotify)
+    index.scan()
+    watcher.start(callback)
+    return index, watcher
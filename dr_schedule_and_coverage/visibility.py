@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Adam Dybbroe
+
+# Author(s):
+
+#   Adam Dybbroe <Firstname.Lastname@smhi.se>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Elevation of the passes over a station, and trimming and pruning of the passes not worth receiving.
+
+The passes are predicted above the flat horizon, so grazing passes only a
+few degrees above it are kept, though hardly usable for reception. Here the
+maximum elevation of each pass (at the uptime of
+:meth:`pyorbital.orbital.Orbital.get_next_passes`) and the time it stays
+above a minimum elevation are computed with one
+:meth:`pyorbital.orbital.Orbital.get_observer_look` call per satellite, on
+sample times of all its passes at once. Passes below the limits of the
+station (see :class:`dr_schedule_and_coverage.stations.StationVisibility`)
+are dropped before the reception conflicts are resolved, and the others
+trimmed to the time above the terrain horizon of the station, looked up per
+sample with a vectorized interpolation of its azimuth-dependent horizon
+mask.
+"""
+
+import logging
+from datetime import timedelta
+
+import numpy as np
+from pyorbital.orbital import Orbital
+
+from .instrumentation import count
+from .pmw_data_coverage import get_sats_within_horizon
+from .stations import NRK, NO_LIMITS
+
+LOG = logging.getLogger(__name__)
+
+# Elevation (degrees) at the predicted rise and fall times is zero within this:
+ELEVATION_TOLERANCE = 1e-6
+
+
+def get_sample_times(passlist, step=timedelta(seconds=10)):
+    """Get sample times every *step* from the rise to the fall of each pass.
+
+    The last sample of each pass is at the fall time. Return the flat array
+    of sample times, the pass index of each sample and the index of the
+    first sample of each pass.
+    """
+    rises = np.array([apass[0] for apass in passlist], dtype='datetime64[us]')
+    falls = np.array([apass[1] for apass in passlist], dtype='datetime64[us]')
+    step = np.timedelta64(int(step.total_seconds() * 1e6), 'us')
+
+    nsamples = ((falls - rises) // step).astype(np.int64) + 2
+    firsts = np.cumsum(nsamples) - nsamples
+    pass_index = np.repeat(np.arange(len(passlist)), nsamples)
+    times = rises[pass_index] + (np.arange(nsamples.sum()) - firsts[pass_index]) * step
+    times[firsts + nsamples - 1] = falls
+
+    return times, pass_index, firsts
+
+
+def get_pass_visibility(orbital, passlist, location, visibility=NO_LIMITS, step=timedelta(seconds=10)):
+    """Get the maximum elevation and the usable part of the passes of one satellite.
+
+    The *passlist* holds passes of the satellite of *orbital* as returned by
+    :meth:`pyorbital.orbital.Orbital.get_next_passes`. The usable part of a
+    pass is the time above the lowest usable elevation of the station
+    *visibility* (its minimum elevation and horizon mask at the azimuth of
+    the satellite), with the crossing times interpolated between samples
+    every *step*. It runs from the first to the last visible sample, so a
+    pass going behind the horizon mask and out again is not split: the
+    masked gap in between counts as usable, the antenna tracking the
+    satellite through it as one reception.
+
+    Return a dict of arrays with, for each pass, the maximum elevation in
+    degrees, the start and end of the usable part (the rise time, for
+    passes never usable), and the duration and the usable duration in
+    minutes.
+    """
+    npasses = len(passlist)
+    if npasses == 0:
+        return {'max_elevation': np.zeros(0),
+                'usable_start': np.zeros(0, dtype='datetime64[us]'),
+                'usable_end': np.zeros(0, dtype='datetime64[us]'),
+                'duration': np.zeros(0), 'usable_duration': np.zeros(0)}
+
+    uptimes = np.array([apass[2] for apass in passlist], dtype='datetime64[us]')
+    _, max_elevation = orbital.get_observer_look(uptimes, *location)
+
+    times, pass_index, firsts = get_sample_times(passlist, step)
+    azimuths, elevations = orbital.get_observer_look(times, *location)
+    max_elevation = np.maximum(max_elevation, np.maximum.reduceat(elevations, firsts))
+
+    above = elevations - visibility.get_min_elevations(azimuths)
+    visible = above >= -ELEVATION_TOLERANCE
+    indices = np.arange(len(times))
+    first_visible = np.minimum.reduceat(np.where(visible, indices, len(times)), firsts)
+    last_visible = np.maximum.reduceat(np.where(visible, indices, -1), firsts)
+    lasts = np.append(firsts[1:], len(times)) - 1
+    has_visible = last_visible >= 0
+
+    start = np.where(has_visible, first_visible, firsts)
+    end = np.where(has_visible, last_visible, firsts)
+    usable_start = _interpolate_crossing(times, above, start, start > firsts)
+    usable_end = _interpolate_crossing(times, above, end, end < lasts, forward=True)
+
+    durations = (times[lasts] - times[firsts]) / np.timedelta64(1, 'm')
+    usable_durations = np.where(has_visible, (usable_end - usable_start) / np.timedelta64(1, 'm'), 0.)
+    count('pass_elevation_samples', len(times))
+
+    return {'max_elevation': max_elevation,
+            'usable_start': usable_start,
+            'usable_end': usable_end,
+            'duration': durations,
+            'usable_duration': usable_durations}
+
+
+def _interpolate_crossing(times, above, indices, inside, forward=False):
+    """Get the time the elevation crosses the minimum between the samples *indices* and the one before (or after).
+
+    Only for the samples *inside* the pass, the others keep their sample time.
+    """
+    crossing = times[indices].copy()
+    here = indices[inside]
+    other = here + 1 if forward else here - 1
+    fraction = above[here] / (above[here] - above[other])
+    crossing[inside] = times[here] + (fraction * (times[other] - times[here]).astype(np.float64)).astype('m8[us]')
+    return crossing
+
+
+def filter_passes(satpasses, location, tle_filename=None, visibility=NO_LIMITS, step=timedelta(seconds=10)):
+    """Trim the passes to their usable part and drop those below the station *visibility* limits.
+
+    The *satpasses* are a dict of satellite name and list of passes, as
+    returned by :func:`dr_schedule_and_coverage.pmw_data_coverage.get_sats_within_horizon`
+    for the station *location*. Return a dict of the same form with the
+    passes kept, with the rise and fall times moved to where the satellite
+    gets above and goes below the lowest usable elevation.
+    """
+    if not visibility.is_limited:
+        return satpasses
+
+    filtered = {}
+    for satname, passlist in satpasses.items():
+        orbital = Orbital(satname, tle_file=tle_filename)
+        pass_visibility = get_pass_visibility(orbital, passlist, location, visibility, step=step)
+        keep = ((pass_visibility['max_elevation'] >= visibility.min_elevation) &
+                (pass_visibility['usable_duration'] > 0) &
+                (pass_visibility['usable_duration'] >= visibility.min_duration))
+        filtered[satname] = [(start.item(), end.item(), apass[2]) for apass, start, end, keep_pass
+                             in zip(passlist, pass_visibility['usable_start'], pass_visibility['usable_end'], keep)
+                             if keep_pass]
+        count('passes_pruned', len(passlist) - len(filtered[satname]))
+        LOG.debug("%s: %d of %d passes kept", satname, len(filtered[satname]), len(passlist))
+
+    return filtered
+
+
+def get_visible_passes(satnames, obstime, forward=1, tle_filename=None, location=NRK, visibility=NO_LIMITS):
+    """Find the passes over a station, leaving out those below the station *visibility* limits."""
+    satpasses = get_sats_within_horizon(satnames, obstime, forward=forward, tle_filename=tle_filename,
+                                        location=location)
+    return filter_passes(satpasses, location, tle_filename=tle_filename, visibility=visibility)
@@ -76,8 +76,14 @@ setup(name=NAME,
                       'matplotlib': ['matplotlib'],
                       'pandas': ['pandas'],
                       'pytroll-schedule': ['pytroll-schedule'],
+                      'benchmark': ['pytest', 'pytest-benchmark'],
+                      'store': ['xarray', 'zarr', 'netCDF4'],
+                      'distributed': ['dask[distributed]'],
                       },
-      scripts=['bin/create_list_of_possible_sat_receptions.py'],
+      scripts=['bin/create_list_of_possible_sat_receptions.py',
+               'bin/compare_constellation_coverage.py',
+               'bin/compare_cycle_settings.py',
+               'bin/schedule_service.py'],
       test_suite='pyspectral.tests.suite',
       tests_require=test_requires,
       python_requires='>=3.8',